@@ -0,0 +1,49 @@
+"""Benchmark `import oursin` time and the cost of the first atlas access
+
+Each measurement runs in a fresh interpreter so that nothing is cached between runs.
+
+Usage: python benchmarks/bench_import.py [--repeat 10]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+IMPORT = "import time; t = time.perf_counter(); import oursin; print(time.perf_counter() - t)"
+FIRST_ACCESS = "import time, oursin; t = time.perf_counter(); oursin.ccf25; print(time.perf_counter() - t)"
+EAGER = ("import time; t = time.perf_counter(); import oursin; "
+         "[getattr(oursin, name) for name in oursin.atlas.atlas_names]; print(time.perf_counter() - t)")
+# the baseline Atlas.__init__: parse the JSON and build a StructureModel per area, for every atlas on import
+BASELINE = """
+import time; t = time.perf_counter()
+import json, oursin
+from vbl_aquarium.models.urchin import StructureModel
+for name in oursin.atlas.atlas_names:
+    with open(oursin.atlas.cache.data_dir / f'{name}.structures.json') as f:
+        areas = [StructureModel(name=area['name'], acronym=area['acronym'], atlas_id=area['id'],
+                                color=oursin.utils.formatted_color([x / 255 for x in area['rgb_triplet']]))
+                 for area in json.load(f)]
+print(time.perf_counter() - t)
+"""
+
+def measure(code, repeat):
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    for label, code in [("import oursin", IMPORT),
+                        ("first access of oursin.ccf25", FIRST_ACCESS),
+                        ("import + all atlases", EAGER),
+                        ("import + all atlases (baseline parse)", BASELINE)]:
+        times = measure(code, args.repeat)
+        print(f"{label:<42} median {statistics.median(times) * 1000:8.1f} ms   min {min(times) * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
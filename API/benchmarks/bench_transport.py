@@ -0,0 +1,193 @@
+"""Benchmark serialization and end-to-end emit cost of the hot paths against the local server
+
+Every case is timed from the first API call until the local stand-in server (oursin.server) has
+received all of its messages, and separately for serialization alone where that applies.
+
+Usage: python benchmarks/bench_transport.py [--repeat 5] [--quick] [--only particles]
+                                            [--json results.json] [--compare baseline.json]
+
+--compare exits with status 1 when a case is slower than the baseline by more than --threshold,
+so this can gate a release.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import oursin as urchin
+from oursin.server import Server
+
+def wait_for(server, event, count, timeout=120):
+    """Block until the server has received count messages on event"""
+    end = time.perf_counter() + timeout
+    while server.stats[event]['count'] < count:
+        if time.perf_counter() > end:
+            raise TimeoutError(f'server received {server.stats[event]["count"]}/{count} {event} messages')
+        time.sleep(0.0005)
+
+def timed(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+def particles_cases(server, sizes):
+    cases = {}
+    for n in sizes:
+        positions = np.random.rand(n, 3).astype(np.float32) * 10000
+
+        system = urchin.particles.ParticleSystem(n, binary=False)
+        cases[f'particles json serialize n={n}'] = system.data.to_json_string
+
+        def send_json(system=system, positions=positions):
+            count = server.stats['urchin-particles-update']['count']
+            system.set_positions(positions.tolist())
+            wait_for(server, 'urchin-particles-update', count + 1)
+        cases[f'particles json set_positions n={n}'] = send_json
+
+        binary_system = urchin.particles.ParticleSystem(n, binary=True)
+
+        def send_binary(system=binary_system, positions=positions):
+            count = server.stats['urchin-particles-positions-binary']['count']
+            system.set_positions(positions)
+            wait_for(server, 'urchin-particles-positions-binary', count + 1)
+        cases[f'particles binary set_positions n={n}'] = send_binary
+    return cases
+
+def meshes_cases(server, n):
+    meshes = urchin.meshes.create(n)
+    positions = (np.random.rand(n, 3) * 10000).tolist()
+
+    def send():
+        count = server.stats['urchin-meshes-positions']['count']
+        urchin.meshes.set_positions(meshes, positions)
+        wait_for(server, 'urchin-meshes-positions', count + 1)
+
+    def send_packed():
+        urchin.client.current().format = 'packed'
+        try:
+            send()
+        finally:
+            urchin.client.current().format = 'json'
+
+    def send_each():
+        count = server.stats['urchin-meshes-update']['count']
+        with urchin.batch():
+            for mesh, position in zip(meshes, positions):
+                mesh.set_position(position)
+        wait_for(server, 'urchin-meshes-update', count + n)
+
+    return {f'meshes.set_positions n={n}': send,
+            f'meshes.set_positions packed n={n}': send_packed,
+            f'Mesh.set_position batched n={n}': send_each}
+
+def volume_cases(server, shape):
+    data = np.random.randint(0, 254, size=shape, dtype=np.uint8)
+    n_voxels = int(np.prod(shape))
+
+    def upload(streaming):
+        def run():
+            urchin.volumes.streaming = streaming
+            event = 'urchin-volume-slab' if streaming else 'SetVolumeData'
+            count = server.stats[event]['count']
+            volume = urchin.volumes.Volume(data)
+            urchin.volumes.streaming = False
+
+            # wait until the last message arrives, see Volume._send and Volume._send_region
+            if streaming:
+                depth = max(1, urchin.volumes.CHUNK_LIMIT // (shape[1] * shape[2]))
+                wait_for(server, event, count + int(np.ceil(shape[0] / depth)))
+            else:
+                wait_for(server, event, count + int(np.ceil(volume.data.n_bytes / urchin.volumes.CHUNK_LIMIT)))
+        return run
+
+    return {f'Volume upload base64 {n_voxels} voxels': upload(False),
+            f'Volume upload streaming {n_voxels} voxels': upload(True)}
+
+def atlas_cases(server):
+    atlas = urchin.ccf25
+    areas = atlas.structures[:50]
+
+    def full():
+        count = server.stats['urchin-atlas-update']['count']
+        atlas.resync()
+        wait_for(server, 'urchin-atlas-update', count + 1)
+
+    def partial():
+        # the server reports 'atlas-delta', so only the changed areas are sent
+        count = server.stats['urchin-atlas-delta']['count']
+        atlas.set_visibilities(areas, [True] * len(areas))
+        wait_for(server, 'urchin-atlas-delta', count + 1)
+
+    return {f'atlas full push ({len(atlas.structures)} areas)': full,
+            f'atlas partial push ({len(areas)} areas)': partial}
+
+def screenshot_cases(size):
+    async def shoot():
+        return await urchin.camera.main.screenshot(size=size, filename='return')
+
+    return {f'screenshot round-trip {size[0]}x{size[1]}': lambda: asyncio.run(shoot())}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help='smaller sizes, for a fast smoke run')
+    parser.add_argument('--only', help='only run cases whose name contains this string')
+    parser.add_argument('--json', help='write median seconds per case to this file')
+    parser.add_argument('--compare', help='baseline file written by --json')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio that counts as a regression')
+    args = parser.parse_args()
+
+    server = Server(screenshots=True, features=['atlas-delta'])
+    url = server.start(port=0)
+    urchin.client.sio.connect(url, wait_timeout=5)
+    urchin.camera.setup()
+
+    if args.quick:
+        cases = {**particles_cases(server, [10000]),
+                 **meshes_cases(server, 1000),
+                 **volume_cases(server, (66, 40, 57)),
+                 **atlas_cases(server),
+                 **screenshot_cases([256, 256])}
+    else:
+        cases = {**particles_cases(server, [10000, 100000, 1000000]),
+                 **meshes_cases(server, 10000),
+                 # CCF at 25 um
+                 **volume_cases(server, (528, 320, 456)),
+                 **atlas_cases(server),
+                 **screenshot_cases([1024, 768])}
+
+    results = {}
+    for name, function in cases.items():
+        if args.only is not None and args.only not in name:
+            continue
+        function()  # warm up
+        times = timed(function, args.repeat)
+        results[name] = statistics.median(times)
+        print(f'{name:<52} median {results[name] * 1000:10.2f} ms   min {min(times) * 1000:10.2f} ms')
+
+    urchin.client.close()
+    server.stop()
+
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = [name for name in results
+                       if name in baseline and results[name] > baseline[name] * args.threshold]
+        for name in regressions:
+            print(f'REGRESSION {name}: {baseline[name] * 1000:.2f} ms -> {results[name] * 1000:.2f} ms')
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -6,10 +6,13 @@ Python library for connecting to and sending data to a Universal Renderer for Ne
 
 # load the client
 from . import client
+from .client import Session
 from .renderer import *
 
 # load sanitization
 from . import utils
+from . import metrics
+from . import serializers
 
 # load the scene controls
 from . import camera
@@ -29,4 +32,12 @@ from . import ui
 from . import colors
 
 # load the atlases
+from . import atlas
 from .atlas import *
+
+def __getattr__(name):
+	# atlases are loaded lazily, forward e.g. `urchin.ccf25` to the atlas module
+	if name in atlas.atlas_names:
+		return getattr(atlas, name)
+
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,13 +1,34 @@
 from .ontology import *
+from .aggregate import group_by_area, set_intensity_by_area
 
-ccf25 = Atlas('ccf25')
-ccf50 = Atlas('ccf50')
-ccf100 = Atlas('ccf100')
-waxholm39 = Atlas('waxholm39')
-waxholm78 = Atlas('waxholm78')
-princeton20 = Atlas('princeton20')
-azba8 = Atlas('azba8')
-human500 = Atlas('human500')
-cavefish2 = Atlas('cavefish2')
-prairie_vole25 = Atlas('prairie_vole25')
-bluebrain25 = Atlas('bluebrain25')
\ No newline at end of file
+# exported by `from .atlas import *` in the package. The atlases themselves are left out, listing them
+# would load every atlas on import, urchin.__getattr__ forwards them instead
+__all__ = ontology.__all__ + ['group_by_area', 'set_intensity_by_area']
+
+# Atlases are built on first access, see __getattr__
+atlas_names = ['ccf25', 'ccf50', 'ccf100', 'waxholm39', 'waxholm78', 'princeton20',
+               'azba8', 'human500', 'cavefish2', 'prairie_vole25', 'bluebrain25']
+
+def __getattr__(name):
+    """Parse an atlas the first time it is accessed, e.g. `urchin.ccf25`
+
+    The Atlas is cached in the module namespace, so later lookups don't come back here.
+    """
+    if name in atlas_names:
+        atlas = Atlas(name)
+        globals()[name] = atlas
+        return atlas
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def loaded():
+    """Atlases that were loaded in the current session's renderer, see client.Session.replay
+
+    Returns
+    -------
+    list of Atlas
+    """
+    return [globals()[name] for name in atlas_names if name in globals() and globals()[name].loaded]
+
+def __dir__():
+    return sorted(set(globals()) | set(atlas_names))
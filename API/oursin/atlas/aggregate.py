@@ -0,0 +1,102 @@
+"""Per-area statistics from per-cell or per-voxel data"""
+import numpy as np
+
+STATISTICS = ['mean', 'sum', 'count']
+
+def group_by_area(atlas, atlas_ids, values = None, statistic = 'mean', rollup = False):
+    """Group samples by the atlas area they belong to
+
+    Samples whose atlas id is not in the atlas (e.g. 0 for outside the brain) are ignored.
+
+    Parameters
+    ----------
+    atlas : Atlas
+    atlas_ids : array of int or string
+        atlas id (or acronym) of each sample
+    values : array of float, optional
+        value of each sample, by default None which counts samples
+    statistic : string, optional
+        'mean', 'sum', or 'count', by default 'mean'
+    rollup : bool, optional
+        include the samples of all descendants in each area, e.g. VISp1-6b roll up into VISp, by default False
+
+    Returns
+    -------
+    numpy array
+        (n_areas,) statistic for each area, in the order of atlas.data.areas. Areas without samples are
+        NaN for 'mean' and 0 otherwise.
+
+    Examples
+    --------
+    >>> means = urchin.atlas.group_by_area(urchin.ccf25, unit_ids, firing_rates, rollup=True)
+    """
+    counts, sums = _counts_and_sums(atlas, atlas_ids, values, rollup)
+
+    return _statistic(counts, sums, statistic)
+
+def set_intensity_by_area(atlas, atlas_ids, values = None, statistic = 'mean', rollup = False, push = True):
+    """Group samples by area and set the area intensities, see group_by_area
+
+    Only areas that have samples are changed.
+
+    Parameters
+    ----------
+    atlas : Atlas
+    atlas_ids : array of int or string
+    values : array of float, optional
+    statistic : string, optional
+    rollup : bool, optional
+    push : bool, optional
+
+    Returns
+    -------
+    numpy array
+        (n_areas,) statistic for each area
+
+    Examples
+    --------
+    >>> urchin.ccf25.set_colormap('cool', min(rates), max(rates))
+    >>> urchin.atlas.set_intensity_by_area(urchin.ccf25, unit_ids, rates, rollup=True)
+    """
+    counts, sums = _counts_and_sums(atlas, atlas_ids, values, rollup)
+    result = _statistic(counts, sums, statistic)
+    has_samples = counts > 0
+
+    atlas.set_color_intensity_array(atlas.ontology['id'][has_samples], result[has_samples], push=push)
+
+    return result
+
+def _counts_and_sums(atlas, atlas_ids, values, rollup):
+    """Sample count and value sum of each area, with np.bincount
+    """
+    atlas_ids = np.asarray(atlas_ids).ravel()
+    indexes, found = atlas._lookup(atlas_ids)
+    indexes = indexes[found]
+
+    n_areas = len(atlas.ontology['id'])
+    counts = np.bincount(indexes, minlength=n_areas).astype(np.float64)
+
+    if values is None:
+        sums = counts
+    else:
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.shape != atlas_ids.shape:
+            raise ValueError(f'Expected one value per sample, got {values.shape[0]} values for {atlas_ids.shape[0]} samples')
+        sums = np.bincount(indexes, weights=values[found], minlength=n_areas)
+
+    if rollup:
+        counts = atlas.tree.rollup(counts)
+        sums = atlas.tree.rollup(sums)
+
+    return counts, sums
+
+def _statistic(counts, sums, statistic):
+    if statistic == 'count':
+        return counts
+    elif statistic == 'sum':
+        return sums
+    elif statistic == 'mean':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / counts
+    else:
+        raise ValueError(f'Statistic {statistic} is not one of {STATISTICS}')
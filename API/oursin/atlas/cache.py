@@ -0,0 +1,112 @@
+"""Compiled, memory-mappable cache of the atlas structure files
+
+Each atlas ontology is stored as one .npy file per column:
+
+    acronym       (n,) unicode
+    id            (n,) int64
+    name          (n,) unicode
+    rgb           (n, 3) uint8
+    path          flattened structure_id_path of every area, int64
+    path_offsets  (n+1,) int64, area i has path[path_offsets[i]:path_offsets[i+1]]
+
+Cache folders are named by a hash of the structure file and the cache format version, so
+editing a structure file or changing the format rebuilds the cache automatically.
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+CACHE_VERSION = 1
+
+data_dir = Path(__file__).resolve().parent / 'data'
+cache_dir = Path(os.environ.get('OURSIN_CACHE_DIR', Path.home() / '.cache' / 'oursin')) / 'atlas'
+
+COLUMNS = ['acronym', 'id', 'name', 'rgb', 'path', 'path_offsets']
+
+def load_ontology(atlas_name):
+    """Load the ontology columns for an atlas, building the cache on first use
+
+    Parameters
+    ----------
+    atlas_name : string
+
+    Returns
+    -------
+    dict of numpy arrays
+        see module docstring for the columns, arrays are read-only memory maps when cached
+    """
+    raw = (data_dir / f'{atlas_name}.structures.json').read_bytes()
+    folder = cache_dir / f'{atlas_name}-{_hash(raw)}'
+
+    try:
+        return {column: np.load(folder / f'{column}.npy', mmap_mode='r') for column in COLUMNS}
+    except (OSError, ValueError):
+        pass
+
+    ontology = compile_ontology(json.loads(raw))
+
+    try:
+        _write(folder, ontology)
+    except OSError:
+        # read-only file system, fall back to the in-memory columns
+        pass
+
+    return ontology
+
+def compile_ontology(structures):
+    """Convert the list of structure dictionaries from a *.structures.json file to columns
+
+    Parameters
+    ----------
+    structures : list of dict
+        {"acronym": "root", "id": 997, "name": "root", "structure_id_path": [997], "rgb_triplet": [255, 255, 255]}
+
+    Returns
+    -------
+    dict of numpy arrays
+    """
+    paths = [structure['structure_id_path'] for structure in structures]
+
+    return {
+        'acronym': np.array([structure['acronym'] for structure in structures], dtype=str),
+        'id': np.array([structure['id'] for structure in structures], dtype=np.int64),
+        'name': np.array([structure['name'] for structure in structures], dtype=str),
+        'rgb': np.array([structure['rgb_triplet'] for structure in structures], dtype=np.uint8).reshape(-1, 3),
+        'path': np.array([atlas_id for path in paths for atlas_id in path], dtype=np.int64),
+        'path_offsets': np.cumsum([0] + [len(path) for path in paths], dtype=np.int64)
+    }
+
+def clear():
+    """Delete all cached atlas ontologies
+    """
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+def _hash(raw):
+    return hashlib.sha1(raw + str(CACHE_VERSION).encode()).hexdigest()[:16]
+
+def _write(folder, ontology):
+    """Write the columns to a temporary folder and move it into place, so readers never see a partial cache
+    """
+    atlas_name = folder.name.rsplit('-', 1)[0]
+
+    folder.parent.mkdir(parents=True, exist_ok=True)
+    temp_folder = folder.parent / f'{folder.name}.{os.getpid()}.tmp'
+    temp_folder.mkdir(exist_ok=True)
+
+    for column in COLUMNS:
+        np.save(temp_folder / f'{column}.npy', ontology[column])
+
+    # remove caches built from older versions of this structure file
+    for stale in folder.parent.glob(f'{atlas_name}-*'):
+        if stale.is_dir() and stale.name.rsplit('-', 1)[0] == atlas_name and not stale.name.endswith('.tmp'):
+            shutil.rmtree(stale, ignore_errors=True)
+
+    try:
+        os.replace(temp_folder, folder)
+    except OSError:
+        # another process finished first
+        shutil.rmtree(temp_folder, ignore_errors=True)
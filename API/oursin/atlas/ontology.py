@@ -1,11 +1,23 @@
 from .. import client
 from .. import utils
-from pathlib import Path
+from . import cache
+from .tree import OntologyTree
+
+import numpy as np
+import pydantic_core
+import weakref
+import functools
+from functools import cached_property
 
-import json
 from vbl_aquarium.models.urchin import AtlasModel, StructureModel, ColormapModel, CustomAtlasModel
 from vbl_aquarium.models.generic import *
 
+__all__ = ['CustomAtlas', 'Atlas', 'Structure']
+
+# JSON keys of AtlasModel.areas and of each StructureModel field, see Atlas._json
+_ATLAS_AREAS = AtlasModel.model_config['alias_generator']('areas')
+_AREA_KEYS = [field.alias for field in StructureModel.model_fields.values()]
+
 class CustomAtlas:
     def __init__(self, atlas_name, atlas_dimensions, atlas_resolution):
         self.atlas_name = atlas_name
@@ -16,47 +28,224 @@ class CustomAtlas:
             resolution= utils.formatted_vector3(atlas_resolution)
         )
 
-        client.sio.emit('CustomAtlas', data.to_json_string())
+        client.emit('CustomAtlas', data.to_json_string)
+
+class _AtlasState:
+    """What one session's renderer knows about an Atlas, and the state of its areas there"""
+    def __init__(self, rgb):
+        self.loaded = False
+        # indexes of areas that changed since the last push
+        self.dirty = set()
+        # each session starts from the default colors and keeps its own area state
+        self.values = _AtlasValues(rgb)
+
+class _AtlasValues:
+    """What is sent to the renderer about an Atlas, with one column per area field in the order of the ontology"""
+    def __init__(self, rgb):
+        n = len(rgb)
+        self.visible = np.zeros(n, dtype=bool)
+        self.side = np.zeros(n, dtype=np.int64)
+        # r, g, b, a in the range 0->1
+        self.color = np.ones((n, 4))
+        self.color[:, :3] = rgb / 255
+        self.intensity = np.full(n, -1.0)
+        self.material = np.full(n, 'default', dtype=object)
+
+        self.reference_coord = None
+        self.colormap = ColormapModel()
 
 class Atlas:
     def __init__(self, atlas_name):
-        # load the ontology structure file
-        self.loaded = False
-        self.data = AtlasModel(
-            name = atlas_name,
-            areas = [],
-            colormap=ColormapModel()
-        )
+        # atlases are shared between sessions, each one loads them in its own renderer and keeps its own
+        # area colors, visibility and intensities, see _AtlasState
+        self._states = weakref.WeakKeyDictionary()
+        self.name = atlas_name
 
-        current_script_directory = Path(__file__).resolve().parent
-        
-        data_file_path = f'{current_script_directory}/data/{self.data.name}.structures.json'
-        with open(data_file_path,'r') as f:
-            temp = json.load(f)
-
-        for i, structure_data in enumerate(temp):
-            # {"acronym": "root", "id": 997, "name": "root", "structure_id_path": [997], "rgb_triplet": [255, 255, 255]}
-            rgb_normalized = [x/255 for x in structure_data['rgb_triplet']]
-            area_data = StructureModel(
-                name = structure_data['name'],
-                acronym = structure_data['acronym'],
-                atlas_id = structure_data['id'],
-                color= utils.formatted_color(rgb_normalized)
-            )
-            self.data.areas.append(area_data)
-
-            area = Structure(
-                data=area_data,
-                index = i,
-                update_callback=self._update
-            )
-
-            setattr(self, structure_data['acronym'], area)
+        # columns are read from the compiled cache, see cache.py. Area models, Structure objects and
+        # lookup tables are built from them on first use, so accessing an atlas stays cheap
+        self.ontology = cache.load_ontology(atlas_name)
+
+    @property
+    def _values(self):
+        """Area state in the current session"""
+        return self._state().values
+
+    @property
+    def data(self):
+        """The state of this atlas and all its areas in the current session, as an AtlasModel
+
+        The model is built from the area columns on each access, changing it has no effect. Use the
+        Atlas and Structure setters instead.
+
+        Returns
+        -------
+        AtlasModel
+        """
+        return self._model(self._values)
+
+    def _columns(self, values, indexes):
+        """Python lists of each area field, in the order of StructureModel's fields
+        """
+        if indexes is None:
+            indexes = slice(None)
+
+        return zip(self.ontology['name'][indexes].tolist(), self.ontology['acronym'][indexes].tolist(),
+                   self.ontology['id'][indexes].tolist(), values.color[indexes].tolist(),
+                   values.visible[indexes].tolist(), values.intensity[indexes].tolist(),
+                   values.side[indexes].tolist(), values.material[indexes].tolist())
+
+    def _model(self, values, indexes = None):
+        """Build an AtlasModel from the area columns
+
+        Parameters
+        ----------
+        values : _AtlasValues
+            a session's area state
+        indexes : list of int, optional
+            areas to include, by default all of them
+        """
+        # the columns are validated by the setters, skip validating each area again
+        areas = [StructureModel.model_construct(name = name, acronym = acronym, atlas_id = atlas_id,
+                                                color = Color.model_construct(r = r, g = g, b = b, a = a),
+                                                visible = visible, color_intensity = intensity, side = side,
+                                                material = material)
+                 for name, acronym, atlas_id, (r, g, b, a), visible, intensity, side, material in self._columns(values, indexes)]
+
+        return AtlasModel.model_construct(name = self.name, reference_coord = values.reference_coord,
+                                          areas = areas, colormap = values.colormap)
+
+    def _json(self, values, indexes = None):
+        """The JSON of _model(values, indexes), written from the columns without building a model per area
+        """
+        data = AtlasModel.model_construct(name = self.name, reference_coord = values.reference_coord,
+                                          areas = [], colormap = values.colormap)
+        data = data.model_dump(by_alias = True, mode = 'json')
+        data[_ATLAS_AREAS] = [dict(zip(_AREA_KEYS, (name, acronym, atlas_id, dict(zip('rgba', color)),
+                                                    visible, intensity, side, material)))
+                              for name, acronym, atlas_id, color, visible, intensity, side, material
+                              in self._columns(values, indexes)]
+
+        return pydantic_core.to_json(data).decode()
+
+    @cached_property
+    def structures(self):
+        """Structure objects for every area, in the order of Atlas.data.areas
+
+        Returns
+        -------
+        list of Structure
+        """
+        return [Structure(self, i) for i in range(len(self.ontology['id']))]
+
+    def __getattr__(self, name):
+        # areas are attributes by acronym, e.g. urchin.ccf25.VISp
+        if not name.startswith('_') and 'ontology' in self.__dict__ and name in self._by_acronym:
+            return self.structures[self._by_acronym[name]]
+
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(self._by_acronym))
+
+    @cached_property
+    def _by_acronym(self):
+        # hash indexes for single lookups
+        return {acronym: i for i, acronym in enumerate(self.ontology['acronym'].tolist())}
+
+    @cached_property
+    def _by_id(self):
+        return {atlas_id: i for i, atlas_id in enumerate(self.ontology['id'].tolist())}
+
+    @cached_property
+    def _by_name(self):
+        return {name: i for i, name in enumerate(self.ontology['name'].tolist())}
+
+    @cached_property
+    def _id_order(self):
+        # sorted keys used to look up area indexes from arrays of atlas ids and acronyms
+        return np.argsort(self.ontology['id'], kind='stable')
+
+    @cached_property
+    def _sorted_ids(self):
+        return np.asarray(self.ontology['id'])[self._id_order]
+
+    @cached_property
+    def _acronym_order(self):
+        return np.argsort(self.ontology['acronym'], kind='stable')
+
+    @cached_property
+    def _sorted_acronyms(self):
+        return np.asarray(self.ontology['acronym'])[self._acronym_order]
+
+    def _state(self):
+        session = client.current()
+        if session not in self._states:
+            self._states[session] = _AtlasState(self.ontology['rgb'])
+        return self._states[session]
+
+    @property
+    def loaded(self):
+        """Whether this atlas was loaded in the current session's renderer"""
+        return self._state().loaded
+
+    @property
+    def dirty(self):
+        """Indexes of areas that changed since the last push in the current session"""
+        return self._state().dirty
+
+    @cached_property
+    def tree(self):
+        """Hierarchy of this atlas, built on first use
+
+        Returns
+        -------
+        OntologyTree
+        """
+        return OntologyTree(self.ontology['id'], self.ontology['path'], self.ontology['path_offsets'])
 
     def _update(self):
-        """Internal helper function, push data to Unity and update all values
+        """Internal helper function, push the areas that changed since the last push to Unity
+
+        Renderers that report the 'atlas-delta' feature (see client.Session.negotiate) get only the
+        changed areas on 'urchin-atlas-delta' and merge them into their atlas data. Other renderers
+        replace their atlas data on 'urchin-atlas-update', which is also what a saved scene keeps,
+        so they get the full state. The atlas name, reference coordinate, and colormap are always
+        included.
         """
-        client.sio.emit('urchin-atlas-update', self.data.to_json_string())
+        # built when the message is sent, so queued updates merge into one message. The session's
+        # state is bound now, the queue may be flushed from another context
+        state = self._state()
+        if 'atlas-delta' in client.current().features:
+            client.emit('urchin-atlas-delta', functools.partial(self._delta_json, state), id = self.name)
+        else:
+            client.emit('urchin-atlas-update', functools.partial(self._full_json, state), id = self.name)
+
+    def _delta_json(self, state):
+        indexes = sorted(state.dirty)
+        state.dirty.clear()
+
+        return self._json(state.values, indexes)
+
+    def _full_json(self, state):
+        state.dirty.clear()
+
+        return self._json(state.values)
+
+    def resync(self):
+        """Push the full state of every area to Unity
+
+        Use this if the renderer was restarted or has fallen out of sync.
+        """
+        self.dirty.clear()
+        client.emit('urchin-atlas-update', functools.partial(self._json, self._values))
+
+    def _replay(self, recreate):
+        """Re-send this atlas after reconnecting, see client.Session.replay
+        """
+        if recreate:
+            self.dirty.clear()
+            client.emit('urchin-atlas-load', functools.partial(self._json, self._values))
+        self.resync()
 
     def load(self):
         """Load this atlas
@@ -64,25 +253,25 @@ class Atlas:
         if self.loaded:
             print("(Warning) Atlas was already loaded, the renderer can have issues if you try to load an atlas twice.")
         
-        self.loaded = True
-        client.sio.emit('urchin-atlas-load', self.data.to_json_string())
+        self._state().loaded = True
+        self.dirty.clear()
+        client.emit('urchin-atlas-load', functools.partial(self._json, self._values))
 
     def clear(self):
         """Clear all visible areas
         """
 
         # update all areas to be not visible
-        for area in self.data.areas:
-            area.visible = False
+        self._values.visible[:] = False
 
-        client.sio.emit('Clear', 'area')
+        client.emit('Clear', 'area')
 
     def load_defaults(self):
         """Load the left and right areas
 
         Note that this function is not stateful, if you save the scene it will not be reloaded.
         """
-        client.sio.emit('urchin-atlas-defaults', "")
+        client.emit('urchin-atlas-defaults', "")
 
     def set_reference_coord(self, reference_coord):
         """Set the reference coordinate for the atlas (Bregma by default)
@@ -91,15 +280,117 @@ class Atlas:
         ----------
         reference_coord : list of float
         """
-        self.data.reference_coord = utils.formatted_vector3(utils.sanitize_vector3(reference_coord))
-        self._update
+        self._values.reference_coord = utils.formatted_vector3(utils.sanitize_vector3(reference_coord))
+        self._update()
+
+    def indexes(self, areas):
+        """Get the area indexes for an array of atlas ids or acronyms
+
+        Parameters
+        ----------
+        areas : array of int, array of string, or list of Structure
+            atlas ids (e.g. 385) or acronyms (e.g. "VISp")
+
+        Returns
+        -------
+        numpy array
+            int64 indexes into Atlas.data.areas
+
+        Raises
+        ------
+        KeyError
+            Some of the ids or acronyms are not in this atlas
+
+        Examples
+        --------
+        >>> urchin.ccf25.indexes(np.array([997, 385]))
+        >>> urchin.ccf25.indexes(["root", "VISp"])
+        """
+        if isinstance(areas, (list, tuple)) and len(areas) > 0 and isinstance(areas[0], Structure):
+            return np.array([area.index for area in areas], dtype=np.int64)
+
+        areas = np.atleast_1d(np.asarray(areas))
+        indexes, found = self._lookup(areas)
+
+        if not np.all(found):
+            raise KeyError(f"Areas {areas[~found].tolist()} couldn't be found in {self.name}")
+
+        return indexes
+
+    def _lookup(self, areas):
+        """Vectorized lookup of atlas ids or acronyms
+
+        Returns
+        -------
+        (indexes, found)
+            int64 indexes, and a bool mask which is False where the area doesn't exist (the index is then meaningless)
+        """
+        if areas.dtype.kind == 'O' and areas.size > 0:
+            # e.g. pandas string columns
+            areas = areas.astype(str) if all(isinstance(area, str) for area in areas.flat) else areas.astype(np.int64)
+
+        if areas.size == 0:
+            return np.zeros(areas.shape, dtype=np.int64), np.ones(areas.shape, dtype=bool)
+        elif areas.dtype.kind in 'iu':
+            keys, order = self._sorted_ids, self._id_order
+        elif areas.dtype.kind == 'U':
+            keys, order = self._sorted_acronyms, self._acronym_order
+        else:
+            raise TypeError(f'Areas must be atlas ids or acronyms, not {areas.dtype}')
+
+        positions = np.minimum(np.searchsorted(keys, areas), len(keys) - 1)
+
+        return order[positions].astype(np.int64), keys[positions] == areas
+
+    def _index(self, area):
+        """Get the index of a single area from its acronym, atlas id, name, or Structure
+
+        Raises
+        ------
+        KeyError
+        """
+        if isinstance(area, Structure):
+            return area.index
+        elif isinstance(area, (int, np.integer)):
+            return self._by_id[int(area)]
+        elif area in self._by_acronym:
+            return self._by_acronym[area]
+        else:
+            return self._by_name[area]
+
+    def get_area(self, area):
+        """Get a single area object
+
+        Parameters
+        ----------
+        area : string or int
+            acronym, full name, or atlas id
+
+        Returns
+        -------
+        Structure
+
+        Raises
+        ------
+        KeyError
+            The area is not in this atlas
+
+        Examples
+        --------
+        >>> urchin.ccf25.get_area("VISp")
+        >>> urchin.ccf25.get_area(385)
+        """
+        try:
+            return self.structures[self._index(area)]
+        except KeyError:
+            raise KeyError(f"Area {area} couldn't be found in {self.name}")
 
     def get_areas(self, area_list):
-        """Get the area objects given a list of area acronyms
+        """Get the area objects given a list of area acronyms, names, or atlas ids
 
         Parameters
         ----------
-        area_list : list of string
+        area_list : list of string or int
             List of acronyms to get objects for
 
         Returns
@@ -113,12 +404,89 @@ class Atlas:
         areas = []
         for name in area_list:
             try:
-                area = getattr(self, name)
-                areas.append(area)
-            except:
-                print(f'(Warning): Area {name} couldn''t be found in this atlas!')
+                areas.append(self.structures[self._index(name)])
+            except KeyError:
+                print(f"(Warning): Area {name} couldn't be found in this atlas!")
         return areas
 
+    def parent(self, area):
+        """Get the parent of an area
+
+        Parameters
+        ----------
+        area : string, int, or Structure
+            acronym, name, atlas id, or area object
+
+        Returns
+        -------
+        Structure, or None for the root
+        """
+        parent = self.tree.parents[self._index(area)]
+        return self.structures[parent] if parent >= 0 else None
+
+    def children(self, area):
+        """Get the direct children of an area
+
+        Parameters
+        ----------
+        area : string, int, or Structure
+
+        Returns
+        -------
+        list of Structure
+        """
+        return [self.structures[i] for i in self.tree.children[self._index(area)]]
+
+    def ancestors(self, area):
+        """Get all ancestors of an area, ordered from the root down to its parent
+
+        Parameters
+        ----------
+        area : string, int, or Structure
+
+        Returns
+        -------
+        list of Structure
+
+        Examples
+        --------
+        >>> urchin.ccf25.ancestors(385)
+        """
+        return [self.structures[i] for i in self.tree.ancestors(self._index(area))]
+
+    def descendants(self, area, include_self = False):
+        """Get all descendants of an area, in depth-first order
+
+        Parameters
+        ----------
+        area : string, int, or Structure
+        include_self : bool, optional
+            include the area itself as the first element, by default False
+
+        Returns
+        -------
+        list of Structure
+
+        Examples
+        --------
+        >>> urchin.ccf25.set_visibilities(urchin.ccf25.descendants("VISp"), True)
+        """
+        return [self.structures[i] for i in self.tree.descendants(self._index(area), include_self).tolist()]
+
+    def is_ancestor(self, ancestor, area):
+        """Check whether one area contains another, in constant time
+
+        Parameters
+        ----------
+        ancestor : string, int, or Structure
+        area : string, int, or Structure
+
+        Returns
+        -------
+        bool
+        """
+        return self.tree.is_ancestor(self._index(ancestor), self._index(area))
+
     def set_visibilities(self, area_list, area_visibility, side = utils.Side.FULL, push = True):
         """Set visibility of multiple areas at once
 
@@ -136,12 +504,7 @@ class Atlas:
         """
         area_visibility = utils.sanitize_list(area_visibility, len(area_list))
 
-        for i, area in enumerate(area_list):
-            self.data.areas[area.index].visible = area_visibility[i]
-            self.data.areas[area.index].side = side.value
-
-        if push:
-            self._update()
+        self._set_visibilities(self.indexes(area_list), area_visibility, side, push)
 
     def set_colors(self, area_list, area_colors, push = True):
         """Set color of multiple areas at once.
@@ -157,12 +520,8 @@ class Atlas:
         >>> urchin.ccf25.set_visibilities(urchin.ccf25.get_areas(["root", "VISp"]), [255, 255, 255])
         """
         area_colors = utils.sanitize_list(area_colors, len(area_list))
-        
-        for i, area in enumerate(area_list):
-            self.data.areas[area.index].color = utils.formatted_color(area_colors[i])
 
-        if push:
-            self._update()
+        self._set_colors(self.indexes(area_list), area_colors, push)
         
     def set_colormap(self, colormap_name, min = 0, max = 1):
         """Set colormap used for mapping area *intensity* values to colors
@@ -181,7 +540,7 @@ class Atlas:
         colormap_name : string
             colormap name
         """
-        self.data.colormap = ColormapModel(
+        self._values.colormap = ColormapModel(
             name = colormap_name,
             min = min,
             max = max
@@ -202,11 +561,7 @@ class Atlas:
         """
         area_intensities = utils.sanitize_list(area_intensities, len(area_list))
 
-        for i, area in enumerate(area_list):
-            self.data.areas[area.index].color_intensity = area_intensities[i]
-
-        if push:
-            self._update()
+        self._set_intensities(self.indexes(area_list), area_intensities, push)
 
     def set_alphas(self, area_list, area_alphas, push = True):
         """Set alpha values, without changing colors
@@ -218,11 +573,68 @@ class Atlas:
         """
         area_alphas = utils.sanitize_list(area_alphas, len(area_list))
 
-        for i, area in enumerate(area_list):
-            self.data.areas[area.index].color.a = area_alphas[i]
+        self._set_alphas(self.indexes(area_list), area_alphas, push)
 
-        if push:
-            self._update()
+    def set_visibilities_array(self, areas, visibilities, side = utils.Side.FULL, push = True):
+        """Set visibility of many areas at once from arrays
+
+        Parameters
+        ----------
+        areas : array of int or string
+            atlas ids or acronyms, see Atlas.indexes
+        visibilities : bool or (N,) array of bool
+        side : utils.Side, optional
+            Brain area side to load, default = FULL
+
+        Examples
+        --------
+        >>> urchin.ccf25.set_visibilities_array(np.array([997, 385]), True)
+        """
+        self._set_visibilities(self.indexes(areas), visibilities, side, push)
+
+    def set_colors_array(self, areas, colors, push = True):
+        """Set color of many areas at once from arrays
+
+        Parameters
+        ----------
+        areas : array of int or string
+            atlas ids or acronyms, see Atlas.indexes
+        colors : (N,3) or (N,4) array
+            RGB(A) colors in the range 0->1 (or 0->255), a single color is broadcast to all areas
+
+        Examples
+        --------
+        >>> urchin.ccf25.set_colors_array(["root", "VISp"], np.array([[1, 0, 0], [0, 1, 0]]))
+        """
+        self._set_colors(self.indexes(areas), colors, push)
+
+    def set_color_intensity_array(self, areas, intensities, push = True):
+        """Set intensity values of many areas at once from arrays, colors will be set according to the active colormap
+
+        Parameters
+        ----------
+        areas : array of int or string
+            atlas ids or acronyms, see Atlas.indexes
+        intensities : float or (N,) array
+            0->1
+
+        Examples
+        --------
+        >>> urchin.ccf25.set_color_intensity_array(ids, values)
+        """
+        self._set_intensities(self.indexes(areas), intensities, push)
+
+    def set_alphas_array(self, areas, alphas, push = True):
+        """Set alpha values of many areas at once from arrays, without changing colors
+
+        Parameters
+        ----------
+        areas : array of int or string
+            atlas ids or acronyms, see Atlas.indexes
+        alphas : float or (N,) array
+            0->1
+        """
+        self._set_alphas(self.indexes(areas), alphas, push)
 
     def set_materials(self, area_list, area_materials, push = True):
         """Set material of multiple areas at once.
@@ -245,12 +657,44 @@ class Atlas:
         """
         area_materials = utils.sanitize_list(area_materials, len(area_list))
 
-        for i, area in enumerate(area_list):
-            self.data.areas[area.index].material = area_materials[i]
+        self._set_materials(self.indexes(area_list), area_materials, push)
+
+    # Each setter writes one column for all areas at once, then marks them as changed
+
+    def _set_visibilities(self, indexes, visibilities, side, push):
+        self._values.visible[indexes] = np.broadcast_to(np.asarray(visibilities, dtype=bool), indexes.shape)
+        self._values.side[indexes] = side.value
+        self._changed(indexes, push)
+
+    def _set_colors(self, indexes, colors, push):
+        self._values.color[indexes] = _check_range(utils.sanitize_color_array(colors, len(indexes), dtype=np.float64))
+        self._changed(indexes, push)
+
+    def _set_intensities(self, indexes, intensities, push):
+        self._values.intensity[indexes] = utils.sanitize_float_array(intensities, len(indexes), dtype=np.float64)
+        self._changed(indexes, push)
+
+    def _set_alphas(self, indexes, alphas, push):
+        self._values.color[indexes, 3] = _check_range(utils.sanitize_float_array(alphas, len(indexes), dtype=np.float64))
+        self._changed(indexes, push)
+
+    def _set_materials(self, indexes, materials, push):
+        self._values.material[indexes] = [utils.sanitize_string(material) for material in materials]
+        self._changed(indexes, push)
+
+    def _changed(self, indexes, push):
+        self.dirty.update(indexes.tolist())
 
         if push:
             self._update()
 
+def _check_range(values):
+    """Raise a ValueError if any color or alpha value is outside 0->1
+    """
+    if values.size > 0 and (values.min() < 0 or values.max() > 1):
+        raise ValueError('Color and alpha values must be in the range 0->1')
+    return values
+
 class Structure:
     """Structure attributes can be accessed as
 
@@ -260,10 +704,21 @@ class Structure:
     >>> structure.rgb_triplet
     >>> structure.path
     """
-    def __init__(self, data, index, update_callback):
-        self.data = data
+    def __init__(self, atlas, index):
+        self.atlas = atlas
         self.index = index
-        self.update_callback = update_callback
+        # the setters write through the atlas columns
+        self._indexes = np.array([index], dtype=np.int64)
+
+    @property
+    def data(self):
+        """The state of this area, as a StructureModel
+
+        Returns
+        -------
+        StructureModel
+        """
+        return self.atlas._model(self.atlas._values, self._indexes).areas[0]
 
     def set_visibility(self, visibility, side = utils.Side.FULL, push = True):
         """Set area visibility
@@ -279,11 +734,7 @@ class Structure:
         >>> urchin.ccf25.root.set_visibility(True)
         >>> urchin.ccf25.root.set_visibility(True, urchin.utils.Side.LEFT)
         """
-        self.data.visible = visibility
-        self.data.side = side.value
-
-        if push:
-            self.update_callback()
+        self.atlas._set_visibilities(self._indexes, visibility, side, push)
 
     def set_color(self, color, push = True):
         """Set area color.
@@ -297,10 +748,7 @@ class Structure:
         >>> urchin.ccf25.root.set_color('#ff0000')
         >>> urchin.ccf25.root.set_color([255, 0, 0], "left")
         """
-        self.data.color = utils.formatted_color(utils.sanitize_color(color))
-
-        if push:
-            self.update_callback()
+        self.atlas._set_colors(self._indexes, [utils.sanitize_color(color)], push)
 
     def set_alpha(self, alpha, push = True):
         """Set area transparency.
@@ -313,10 +761,7 @@ class Structure:
         --------
         >>> urchin.ccf25.root.set_alpha(0.5)
         """
-        self.data.color.a = utils.sanitize_float(alpha)
-
-        if push:
-            self.update_callback()
+        self.atlas._set_alphas(self._indexes, utils.sanitize_float(alpha), push)
 
 
     def set_intensity(self, intensity, push = True):
@@ -331,10 +776,7 @@ class Structure:
         --------
         >>> urn.set_intensity(0.5)
         """
-        self.data.color_intensity = utils.sanitize_float(intensity)
-
-        if push:
-            self.update_callback()
+        self.atlas._set_intensities(self._indexes, utils.sanitize_float(intensity), push)
 
     def set_material(self, material, push = True):
         """Set material.
@@ -353,10 +795,7 @@ class Structure:
         ----------
         >>> urchin.ccf25.root.set_material('transparent-lit')
         """
-        self.data.material = utils.sanitize_string(material)
-
-        if push:
-            self.update_callback()
+        self.atlas._set_materials(self._indexes, [material], push)
 
     # def set_data(area_data):
     #     """Set the data array for each CCF area model
@@ -0,0 +1,113 @@
+"""Ontology hierarchy, precomputed from the structure_id_path of each area"""
+import numpy as np
+
+class OntologyTree:
+    """Parent/child structure of an atlas ontology
+
+    Nodes are area indexes (positions in Atlas.data.areas). The tree is flattened into an
+    Euler tour: each node gets an interval [tin, tout) of positions in `tour` and its
+    descendants are exactly the nodes inside that interval, so ancestor checks are O(1) and
+    descendants are a contiguous slice.
+
+    Attributes
+    ----------
+    parents : numpy array
+        (n,) parent index of each node, -1 for roots
+    children : list of list of int
+        child indexes of each node, in ontology order
+    depth : numpy array
+        (n,) number of ancestors of each node
+    tour : numpy array
+        (n,) node indexes in depth-first order
+    tin, tout : numpy array
+        (n,) Euler tour interval of each node
+    """
+    def __init__(self, ids, path, path_offsets):
+        """Build the tree from the ontology columns, see cache.py
+
+        Parameters
+        ----------
+        ids : (n,) array of atlas ids
+        path : flattened structure_id_path of every area
+        path_offsets : (n+1,) offsets into path
+        """
+        ids = np.asarray(ids)
+        n = len(ids)
+
+        # the parent id is the second to last entry of each path
+        lengths = np.diff(path_offsets)
+        parent_ids = np.where(lengths > 1, path[np.maximum(path_offsets[1:] - 2, 0)], -1)
+
+        order = np.argsort(ids, kind='stable')
+        positions = np.minimum(np.searchsorted(ids, parent_ids, sorter=order), n - 1)
+        found = (ids[order[positions]] == parent_ids) & (lengths > 1)
+        self.parents = np.where(found, order[positions], -1).astype(np.int64)
+
+        self.children = [[] for _ in range(n)]
+        for child, parent in enumerate(self.parents.tolist()):
+            if parent >= 0:
+                self.children[parent].append(child)
+
+        self.depth = np.zeros(n, dtype=np.int64)
+        self.tin = np.zeros(n, dtype=np.int64)
+        self.tout = np.zeros(n, dtype=np.int64)
+        tour = []
+
+        # iterative depth-first search, deep ontologies would hit the recursion limit
+        for root in np.flatnonzero(self.parents < 0).tolist():
+            stack = [(root, False)]
+            while stack:
+                node, finished = stack.pop()
+                if finished:
+                    self.tout[node] = len(tour)
+                    continue
+
+                self.tin[node] = len(tour)
+                tour.append(node)
+                stack.append((node, True))
+                for child in reversed(self.children[node]):
+                    self.depth[child] = self.depth[node] + 1
+                    stack.append((child, False))
+
+        self.tour = np.array(tour, dtype=np.int64)
+
+    def is_ancestor(self, ancestor, node):
+        """True if ancestor is a strict ancestor of node, O(1)
+        """
+        return bool(self.tin[ancestor] < self.tin[node] and self.tout[node] <= self.tout[ancestor])
+
+    def ancestors(self, node):
+        """Ancestor indexes of a node, ordered from the root down to its parent
+        """
+        ancestors = []
+        node = self.parents[node]
+        while node >= 0:
+            ancestors.append(int(node))
+            node = self.parents[node]
+        return ancestors[::-1]
+
+    def descendants(self, node, include_self = False):
+        """Descendant indexes of a node, in depth-first order
+        """
+        start = self.tin[node] if include_self else self.tin[node] + 1
+        return self.tour[start:self.tout[node]]
+
+    def rollup(self, values):
+        """Sum values over each node's subtree, so every node also includes its descendants
+
+        Uses prefix sums along the Euler tour, O(n) for all nodes at once.
+
+        Parameters
+        ----------
+        values : numpy array
+            (n,) or (n, ...) values per node
+
+        Returns
+        -------
+        numpy array
+            same shape as values
+        """
+        values = np.asarray(values)
+        cumulative = np.concatenate((np.zeros((1,) + values.shape[1:], dtype=values.dtype),
+                                     np.cumsum(values[self.tour], axis=0)))
+        return cumulative[self.tout] - cumulative[self.tin]
@@ -11,20 +11,44 @@ import numpy as np
 import io
 import json
 import asyncio
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from vbl_aquarium.models.urchin import CameraRotationModel, CameraModel
 from vbl_aquarium.models.generic import FloatData, IDData, Vector2Data
 			
+# screenshots being received, keyed by (session, camera name, request id)
 receive_totalBytes = {}
 receive_bytes = {}
+receive_count = {}
+# (height, width, channels) of screenshots received as raw pixels
+receive_shape = {}
+# requests waiting for an image keyed by (session, camera name), as a queue of
+# (camera, request id, future). Replies carry the request id, renderers that don't echo it answer
+# in order
 receive_camera = {}
-
-main = []
+# receive_camera is changed from the socket.io thread and from event loops
+_receive_lock = threading.Lock()
 
 PIL.Image.MAX_IMAGE_PIXELS = 22500000
 
-def _on_loaded():
-	main._update()
+# raw pixel formats a screenshot can be requested in, and their channels. 'png' is encoded
+PIXEL_FORMATS = {'rgba': 4, 'rgb': 3}
+
+def __getattr__(name):
+	# the cameras created in the current session, see client.Session
+	if name == 'cameras':
+		return client.current().objects['cameras']
+	if name == 'main':
+		return _main()
+	if name == 'counter':
+		return client.current().counters['cameras']
+
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _main():
+	return next((camera for camera in client.current().objects['cameras'] if camera.data.id == 'CameraMain'), [])
 
 # Handle receiving camera images back as screenshots
 def on_camera_img_meta(data_str):
@@ -33,47 +57,146 @@ def on_camera_img_meta(data_str):
 	Parameters
 	----------
 	data_str : string
-		JSON with two fields {"name":"", "totalBytes":""}
+		JSON {"name":"", "totalBytes":int}, and the "request" id when the renderer echoes it. Raw
+		pixel images also have "width", "height" and "format", see PIXEL_FORMATS
 	"""
 	global receive_totalBytes
 
 	data = json.loads(data_str)
 
-	name = data["name"]
+	name = (client.current(), data["name"], data.get("request"))
 	totalBytes = data["totalBytes"]
 
+	# chunks are written in place, see on_camera_img
 	receive_totalBytes[name] = totalBytes
-	receive_bytes[name] = bytearray()
+	receive_bytes[name] = bytearray(totalBytes)
+	receive_count[name] = 0
+	if "format" in data:
+		receive_shape[name] = (data["height"], data["width"], PIXEL_FORMATS[data["format"]])
 
-def on_camera_img(data_str):
+def on_camera_img(data_str, chunk = None):
 	"""Handler for receiving data about incoming images
 
 	Parameters
 	----------
 	data_str : string
-		JSON with two fields {"name":"", "bytes":""}
+		JSON {"name":"", "data":[bytes as ints]}, or with a binary chunk {"name":"", "offset":int}.
+		Without an offset, chunks are written in the order they arrive. Both can carry the
+		"request" id of the screenshot they belong to
+	chunk : bytes, optional
+		binary attachment with the chunk data, by default None
 	"""
 	global receive_totalBytes, receive_bytes, receive_camera
 
 	data = json.loads(data_str)
 
-	name = data["name"]
-	byte_data = bytes(data["data"])
+	name = (client.current(), data["name"], data.get("request"))
+	byte_data = chunk if chunk is not None else bytes(data["data"])
 
-	receive_bytes[name] = receive_bytes[name] + byte_data
+	offset = data.get("offset", receive_count[name])
+	receive_bytes[name][offset:offset + len(byte_data)] = byte_data
+	receive_count[name] += len(byte_data)
 	
-	if len(receive_bytes[name]) == receive_totalBytes[name]:
-		print(f'(Camera receive) Camera {name} received an image')
-		receive_camera[name].image_received = True
+	if receive_count[name] == receive_totalBytes[name]:
+		print(f'(Camera receive) Camera {name[1]} received an image')
+		requested = _pop_request(name)
+		image_bytes = receive_bytes.pop(name)
+		del receive_totalBytes[name]
+		del receive_count[name]
+		shape = receive_shape.pop(name, None)
+		if requested is None:
+			print(f'(Camera receive) Dropped an image from {name[1]}, no screenshot request is waiting for it')
+			return
+		camera, future = requested
+		if shape is not None:
+			# a view over the received buffer, rows top to bottom
+			image_bytes = np.frombuffer(image_bytes, dtype = np.uint8).reshape(shape)
+
+		camera.image_received = True
+		# this handler runs on the socket.io thread, resume screenshot() on its own loop
+		future.get_loop().call_soon_threadsafe(_complete, future, image_bytes)
+
+def _pop_request(name):
+	"""Remove the request an image answers, the oldest one for the camera without a request id
+
+	Returns
+	-------
+	(Camera, asyncio.Future), or None when no request is waiting for the image
+	"""
+	session, camera_name, request = name
+	key = (session, camera_name)
+
+	with _receive_lock:
+		queue = receive_camera.get(key, ())
+		if request is None:
+			entry = queue[0] if len(queue) > 0 else None
+		else:
+			entry = next((entry for entry in queue if entry[1] == request), None)
+		if entry is None:
+			return None
+		_remove_request(key, entry)
+
+	return entry[0], entry[2]
+
+def _forget_request(key, entry):
+	"""Done callback of a screenshot future, so cancelled or timed out requests stop waiting"""
+	with _receive_lock:
+		_remove_request(key, entry)
+
+def _remove_request(key, entry):
+	queue = receive_camera.get(key)
+	if queue is not None and entry in queue:
+		queue.remove(entry)
+		if len(queue) == 0:
+			del receive_camera[key]
+
+def _pixels(image, format):
+	"""Pixel array from a reply, decoding it when the renderer sent an encoded image instead
+
+	Parameters
+	----------
+	image : bytes or numpy array
+	format : string
+		see PIXEL_FORMATS
+
+	Returns
+	-------
+	numpy array
+		(height, width, channels) uint8
+	"""
+	if isinstance(image, np.ndarray):
+		return image
+	return np.asarray(Image.open(io.BytesIO(image)).convert(format.upper()))
+
+def _complete(future, result):
+	if not future.done():
+		future.set_result(result)
+
+def _fail(future, error):
+	if not future.done():
+		future.set_exception(error)
+
+def _fail_requests(session):
+	"""Fail every screenshot request of a session whose connection dropped
+
+	Messages are dropped while the session reconnects, so these images would never arrive.
+	"""
+	with _receive_lock:
+		entries = [entry for key, queue in receive_camera.items() if key[0] is session for entry in queue]
+	for name in [name for name in receive_bytes if name[0] is session]:
+		for buffers in (receive_bytes, receive_totalBytes, receive_count, receive_shape):
+			buffers.pop(name, None)
+
+	for camera, request, future in entries:
+		error = ConnectionError(f'(urchin.camera) Lost the connection to the renderer before the screenshot from {camera.data.id} arrived')
+		future.get_loop().call_soon_threadsafe(_fail, future, error)
 
 ## Camera renderer
-counter = 0
-cameras = []
 
 class Camera:
 	def __init__(self, main = False):	
-		global counter, cameras
-		counter += 1	
+		self.session = client.current()
+		counter = self.session.count('cameras')
 
 		self.data = CameraModel(
 			id = 'CameraMain' if main else f'Camera{counter}',
@@ -83,13 +206,14 @@ class Camera:
 		self._update()
 
 		self.in_unity = True
-		self.image_received_event = asyncio.Event()
-		self.loop = asyncio.get_event_loop()
+		self.image_received = False
+		# loop that last awaited a screenshot
+		self.loop = None
 		
-		cameras.append(self)
+		self.session.objects['cameras'].append(self)
 
 	def _update(self):
-		client.sio.emit('urchin-camera-update', self.data.to_json_string())
+		self.session.emit('urchin-camera-update', self.data.to_json_string, id = self.data.id)
 
 	def reset(self):
 		self.data = CameraModel(id = self.data.id, controllable=self.data.controllable)
@@ -105,7 +229,7 @@ class Camera:
 		if self.in_unity == False:
 			raise Exception("Camera is not created. Please create camera before calling method.")
 			
-		client.sio.emit('urchin-camera-delete', IDData(id = self.data.id).to_json_string())
+		self.session.emit('urchin-camera-delete', IDData(id = self.data.id).to_json_string)
 		self.in_unity = False
 
 	def set_target_coordinate(self,camera_target_coordinate):
@@ -271,7 +395,7 @@ class Camera:
 		self.data.controllable=True
 		self._update()
 		
-	async def screenshot(self, size=[1024,768], filename = 'return'):
+	async def screenshot(self, size=[1024,768], filename = 'return', format = 'png'):
 		"""Capture a screenshot, must be awaited
 
 		Parameters
@@ -280,52 +404,96 @@ class Camera:
 			Size of the screenshot, by default [1024,768]
 		filename: string, optional
 			Filename to save to, relative to local path
+		format : string, optional
+			'png' for an encoded image, or 'rgba'/'rgb' for raw pixels that skip encoding and
+			decoding, returned as a (height, width, channels) uint8 numpy array, by default 'png'
 			
 		Examples
 		--------
 		>>> await urchin.camera.main.screenshot()
+		>>> pixels = await urchin.camera.main.screenshot(format = 'rgb')
 		"""
-		global receive_totalBytes, receive_bytes, receive_camera
-		self.image_received_event.clear()
-		self.image_received = False
-		receive_camera[self.data.id] = self
+		image = await self._request(size, format = format)
+
+		# image is here, reconstruct it
+		img = _image(image, format)
+		
+		print(f'(Camera receive) {self.data.id} complete')
+
+		if not filename == 'return':
+			_save(img, filename)
+		else:
+			return img
 
+	def _request(self, size, flush = True, format = 'png'):
+		"""Send a screenshot request, from a running event loop
+
+		Parameters
+		----------
+		size : list
+		flush : bool, optional
+			send queued messages right away, by default True
+		format : string, optional
+			'png', or a raw format from PIXEL_FORMATS, by default 'png'
+
+		Returns
+		-------
+		asyncio.Future
+			resolves to the encoded image bytes, or to a pixel array when the renderer sent raw pixels
+		"""
 		if size[0] > 15000 or size[1] > 15000:
 			raise Exception('(urchin.camera) Screenshots can''t exceed 15000x15000')
+		if format != 'png' and format not in PIXEL_FORMATS:
+			raise ValueError(f'(urchin.camera) Unknown screenshot format {format}, should be png or one of {list(PIXEL_FORMATS)}')
+		if self.session._reconnecting:
+			# the request would be dropped, see client.Session._send
+			raise ConnectionError('(urchin.camera) The connection to the renderer is down, screenshots can be taken once it reconnects')
+
+		# created before the request, so the image can't arrive first. Several requests can be in
+		# flight, each one gets the next image the renderer sends for this camera
+		self.loop = asyncio.get_running_loop()
+		future = self.loop.create_future()
+		self.image_received = False
+		request = self.session.count('screenshots')
+		key = (self.session, self.data.id)
+		entry = (self, request, future)
+		with _receive_lock:
+			receive_camera.setdefault(key, collections.deque()).append(entry)
+		future.add_done_callback(lambda _: _forget_request(key, entry))
 			
 		data = Vector2Data(
 			id = self.data.id,
 			value= utils.formatted_vector2(size)
 		)
+		# renderers that don't know the request id ignore the extra field
+		data = {**data.model_dump(by_alias = True), 'Request': request}
+		if format != 'png':
+			data['Format'] = format
+		data = json.dumps(data)
 		
-		client.sio.emit('urchin-camera-screenshot-request', data.to_json_string())
+		self.session.emit('urchin-camera-screenshot-request', data)
+		if flush:
+			# the screenshot should include everything still queued
+			self.session.flush()
 
-		while not self.image_received:
-			await asyncio.sleep(0.1)
-		# await self.image_received_event.wait()
-
-		# image is here, reconstruct it
-		img = Image.open(io.BytesIO(receive_bytes[self.data.id]))
-		
-		print(f'(Camera receive) {self.data.id} complete')
-		del receive_totalBytes[self.data.id]
-		del receive_bytes[self.data.id]
-		del receive_camera[self.data.id]
-
-		if not filename == 'return':
-			img.save(filename)
-		else:
-			return img
+		return future
 		
 	async def capture_video(self, file_name, callback = None,
 						 start_rotation = None, end_rotation = None,
 						 frame_rate = 30, duration = 5,
 						 size = (1024,768),
-						 test = False):
+						 test = False, workers = 2):
 		"""Capture a video and save it to a file, must be awaited
 
 		Can be used in two modes, either by specifying a callback(frame#) or a start/end_rotation
 
+		Frames are requested as raw pixels, then converted and encoded on worker threads while the
+		renderer works on the next frame, and written to the video in order.
+
+		Each frame's screenshot request is sent only after the previous image arrived. The renderer
+		applies every message it has received and captures at the end of its frame, so requests
+		sent ahead would capture a later frame's camera state.
+
 		Parameters
 		----------
 		file_name : string
@@ -340,6 +508,8 @@ class Camera:
 			seconds, by default 5
 		size : tuple, optional
 			screenshot size, by default (1024,768)
+		workers : int, optional
+			threads converting frames, by default 2
 
 		Examples
 		--------
@@ -358,34 +528,104 @@ class Camera:
 		n_frames = frame_rate * duration
 
 		if start_rotation is not None:
-			client.sio.emit('urchin-camera-lerp-set', CameraRotationModel(
+			self.session.emit('urchin-camera-lerp-set', CameraRotationModel(
 				start_rotation=utils.formatted_vector3(start_rotation),
 				end_rotation=utils.formatted_vector3(end_rotation)
-			).to_json_string())
+			).to_json_string)
 
-		for frame in range(n_frames):
+		def decode(image):
+			return cv2.cvtColor(_pixels(image, 'rgb'), cv2.COLOR_RGB2BGR)
 
-			if callback is not None:
-				callback(frame)
+		def write(decoded):
+			out.write(decoded.result())
 
-			if start_rotation is not None:
-				perc = frame / n_frames
+		decoders = ThreadPoolExecutor(workers)
+		# a single writer thread keeps the frames in order
+		writer = ThreadPoolExecutor(1)
+		writes = []
+
+		try:
+			for frame in range(n_frames):
+
+				if callback is not None:
+					callback(frame)
+
+				if start_rotation is not None:
+					perc = frame / n_frames
+
+					self.session.emit('urchin-camera-lerp', FloatData(
+						id=self.data.id,
+						value=perc
+					).to_json_string)
+				
+				if not test:
+					# sent right away, after this frame's updates
+					# raw pixels, the renderer doesn't encode frames that are only decoded again
+					image = await self._request([size[0], size[1]], format = 'rgb')
+					writes.append(writer.submit(write, decoders.submit(decode, image)))
+
+			# surface encoding errors
+			for future in writes:
+				await asyncio.wrap_future(future)
+		finally:
+			decoders.shutdown()
+			writer.shutdown()
+			out.release()
 
-				client.sio.emit('urchin-camera-lerp', FloatData(
-					id=self.data.id,
-					value=perc
-				).to_json_string())
-			
-			if not test:
-				img = await self.screenshot([size[0], size[1]])
-				image_array = np.array(img)
-				image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
-				out.write(image_array)
-		
-		out.release()
 		print(f'Video captured on {self.data.id} saved to {file_name}')
 
 
+def _image(image, format):
+	"""PIL image for format 'png', else a pixel array, see Camera.screenshot"""
+	if format == 'png':
+		return Image.open(io.BytesIO(image))
+	return _pixels(image, format)
+
+def _save(img, filename):
+	if isinstance(img, np.ndarray):
+		img = Image.fromarray(img)
+	img.save(filename)
+
+async def screenshot_many(cameras, size=[1024,768], filenames = None, format = 'png'):
+	"""Capture screenshots from several cameras at once, must be awaited
+
+	The requests are sent together, so the renderer captures every camera in the same frame.
+
+	Parameters
+	----------
+	cameras : list of Camera
+	size : list, optional
+		Size of every screenshot, by default [1024,768]
+	filenames : list of string, optional
+		Filenames to save to, relative to local path, by default None to return the images
+	format : string, optional
+		'png', or 'rgba'/'rgb' for raw pixel arrays, see Camera.screenshot, by default 'png'
+
+	Returns
+	-------
+	list of PIL.Image, or of numpy arrays for raw formats, when filenames is None
+
+	Examples
+	--------
+	>>> top, side, front = await urchin.camera.screenshot_many([c1, c2, c3])
+	"""
+	if filenames is not None and len(filenames) != len(cameras):
+		raise ValueError('(urchin.camera) Need one filename per camera')
+
+	session = client.current()
+	requests = [camera._request(size, flush = False, format = format) for camera in cameras]
+	session.flush()
+
+	images = []
+	for i, image in enumerate(await asyncio.gather(*requests)):
+		img = _image(image, format)
+		if filenames is not None:
+			_save(img, filenames[i])
+		images.append(img)
+
+	if filenames is None:
+		return images
+
 def set_light_rotation(angles):
 	"""Override the rotation of the main camera light
 
@@ -397,7 +637,7 @@ def set_light_rotation(angles):
 	angles = utils.sanitize_vector3(angles)
 	print(angles)
 	print(isinstance(angles,list))
-	client.sio.emit('SetLightRotation', angles)
+	client.emit('SetLightRotation', angles, id = '')
 
 def set_light_camera(camera_name = None):
 	"""Change the camera that the main light is linked to (the light will rotate the camera)
@@ -408,9 +648,9 @@ def set_light_camera(camera_name = None):
 		Name of camera to attach light to, by default None
 	"""
 	if (camera_name is None):
-		client.sio.emit('ResetLightLink')
+		client.emit('ResetLightLink', id = '')
 	else:
-		client.sio.emit('SetLightLink', camera_name)
+		client.emit('SetLightLink', camera_name, id = '')
 
 def set_brain_rotation(yaw):
 	"""Set the brain's rotation, independent of the camera. This is useful when you want to animate
@@ -423,17 +663,14 @@ def set_brain_rotation(yaw):
 		Yaw angle for the brain, independent of the camera
 	"""
 
-	client.sio.emit('urchin-brain-yaw', FloatData(id='', value=yaw).to_json_string())
+	client.emit('urchin-brain-yaw', FloatData(id='', value=yaw).to_json_string, id = '')
 
 def clear():
-	global cameras
-	
-	for camera in cameras:
+	for camera in client.current().objects['cameras']:
 		if camera.data.id == "CameraMain":
 			camera.reset()
 		else:
 			camera.delete()
 
 def setup():
-	global main
-	main = Camera(main = True)
\ No newline at end of file
+	Camera(main = True)
\ No newline at end of file
@@ -2,80 +2,785 @@
 import socketio
 import uuid
 import asyncio
+import threading
+import time
+import collections
+import contextvars
+import json
+from contextlib import contextmanager
+
+from pydantic import BaseModel
 
 from . import camera
 from . import volumes
 from . import meshes
 from . import dock
+from . import metrics
+from . import serializers
 
 from vbl_aquarium.models.logging import *
 
+# seconds before the first reconnection attempt, doubling up to the maximum, see socketio.Client
+RECONNECT_DELAY = 1
+RECONNECT_DELAY_MAX = 30
+
 class bcolors:
     WARNING = '\033[93m'
     FAIL = '\033[91m'
 
-ID = str(uuid.uuid1())[:8]
-
-sio = socketio.Client()
-@sio.event
 def connect():
 	print("(URN) connected to server")
-	change_id(ID)
+	session = current()
+	reconnected = session._reconnecting
+	session._reconnecting = False
+
+	change_id(session.ID)
+	session.negotiate()
+
+	# messages sent while the connection was down were dropped
+	if reconnected:
+		session.replay()
+	session._connected_once = True
 
-@sio.event
 def disconnect():
-    print("(URN) disconnected from server")
+	session = current()
+	if session._closing:
+		print("(URN) disconnected from server")
+	else:
+		print("(URN) lost connection to server, reconnecting")
+		session._reconnecting = True
+		# their requests or images are lost with the connection
+		camera._fail_requests(session)
 
-@sio.on('log')
-def message(data):
+def log(data):
 	print(data)
 	out = Log.model_validate_json(data)
 	print('(Renderer) ' + out.msg)
 
-@sio.on('log-warning')
-def message(data):
+def log_warning(data):
 	out = LogWarning.model_validate_json(data)
 	print('(Renderer) ' + bcolors.WARNING + out.msg)
 
-@sio.on('log-error')
-def message(data):
+def log_error(data):
 	out = LogError.model_validate_json(data)
 	print('(Renderer) ' + bcolors.FAIL + out.msg)
 
 ###### CALLBACKS #######
 
-@sio.on('CameraImgMeta')
 def receive_camera_img_meta(data):
 	camera.on_camera_img_meta(data)
-	
-@sio.on('CameraImg')
-def receive_camera_img(data):
-	camera.on_camera_img(data)
 
-@sio.on('VolumeClick')
+def receive_camera_img(data, chunk = None):
+	camera.on_camera_img(data, chunk)
+
 def receive_volume_click(data):
 	volumes._volume_click(data)
 
-@sio.on('NeuronCallback')
 def receive_neuron_callback(data):
 	meshes._neuron_callback(data)
 
-@sio.on('urchin-dock-callback')
 def receive_dock_callback(data):
 	dock._save_callback(data)
 
-@sio.on('urchin-loaded-callback')
 def urchin_loaded_callback(data):
-	camera._on_loaded()
-	
-# Helper functions
+	# the renderer (re)loaded with an empty scene
+	current().replay(recreate = True)
+
+def receive_capabilities(data):
+	current()._on_capabilities(data)
+
+_handlers = {
+	'connect': connect,
+	'disconnect': disconnect,
+	'log': log,
+	'log-warning': log_warning,
+	'log-error': log_error,
+	'CameraImgMeta': receive_camera_img_meta,
+	'CameraImg': receive_camera_img,
+	'VolumeClick': receive_volume_click,
+	'NeuronCallback': receive_neuron_callback,
+	'urchin-dock-callback': receive_dock_callback,
+	'urchin-loaded-callback': urchin_loaded_callback,
+	'urchin-capabilities': receive_capabilities,
+}
+
+###### SESSIONS #######
+
+class Session:
+	"""A connection to one renderer, with its own ID, outgoing queue, and objects
+
+	Every module sends through the current session. This is the default session unless another
+	one is activated with `with session:`, which is local to the thread or asyncio task. Objects
+	keep sending to the session they were created in.
+
+	Examples
+	--------
+	>>> sessions = [urchin.Session() for _ in range(4)]
+	>>> for session in sessions:
+	>>> 	with session:
+	>>> 		urchin.setup(localhost = True, standalone = True)
+	>>> 		urchin.meshes.create(10)
+	"""
+	def __init__(self, id = None):
+		"""Create a disconnected session
+
+		Parameters
+		----------
+		id : string, optional
+			ID the renderer connects with, by default a random ID
+		"""
+		self.ID = str(uuid.uuid4())[:8] if id is None else id
+
+		# reconnects with exponential backoff when the connection drops, then replays the scene
+		self.sio = socketio.Client(reconnection_delay = RECONNECT_DELAY,
+								   reconnection_delay_max = RECONNECT_DELAY_MAX)
+		for event, handler in _handlers.items():
+			self.sio.on(event, self._bind(handler))
+
+		# objects created in this session by each module, and the counters used for their ids
+		self.objects = collections.defaultdict(list)
+		self.counters = collections.defaultdict(int)
+		# latest scene-wide settings, sent with id '', e.g. the light rotation
+		self.settings = {}
+
+		self._connected_once = False
+		self._reconnecting = False
+		self._closing = False
+
+		# When queueing is on, emit() buffers messages until flush(). Messages for the same (event, object id)
+		# replace each other, so only the latest state of each object is sent
+		self.queueing = False
+		# seconds between automatic flushes while queueing, None to only flush when asked
+		self.tick = None
+		# send the JSON messages of each flush as 'urchin-batch' events, requires a renderer that handles them
+		self.batch_packets = False
+
+		self._queue = {}
+		# bumped by every bulk message and most messages without an id, so later states never replace
+		# ones queued before such a message, see emit
+		self._generation = 0
+		self._queue_lock = threading.Lock()
+		self._flush_timer = None
+		self._batch_depth = 0
+
+		# socketio.AsyncClient set by connect_async, None when using the blocking client
+		self.async_sio = None
+		# packets waiting to be written to the socket before emit_async waits for the server
+		self.max_in_flight = 64
+
+		self._loop = None
+		# messages from synchronous setters, sent in order by a single task, see _send_later
+		self._outbox = collections.deque()
+		self._outbox_room = threading.Condition()
+		self._sender = None
+		self._waiters = {}
+		self._watched = set()
+
+		# wire format for bulk list models, see serializers. Stays 'json' unless the renderer
+		# reports that it understands another format, see negotiate()
+		self.format = 'json'
+		# optional renderer features, e.g. 'atlas-delta', reported with the formats
+		self.features = set()
+
+	def __enter__(self):
+		# the token stack is context-local too, handler threads enter the same session
+		_tokens.set(_tokens.get() + (_current.set(self),))
+		return self
+
+	def __exit__(self, *exc):
+		tokens = _tokens.get()
+		_tokens.set(tokens[:-1])
+		_current.reset(tokens[-1])
+
+	def count(self, kind):
+		"""Increment and return the object counter for a module, used to build object ids
+		"""
+		self.counters[kind] += 1
+		return self.counters[kind]
+
+	###### OUTGOING QUEUE #######
+
+	def emit(self, event, data = None, id = None, barrier = True):
+		"""Send a message to the renderer, or queue it when queueing is on
+
+		Parameters
+		----------
+		event : string
+		data : any, optional
+			message payload, a callable is called when the message is sent so that superseded
+			states are never serialized. Models are serialized in the negotiated format
+		id : string, optional
+			object id, queued messages with the same (event, id) replace each other. Only pass this
+			when the message carries the full state for that object and event. '' marks scene-wide
+			settings, which are re-sent by replay(), by default None
+		barrier : bool, optional
+			for messages without an id, e.g. deletes or screenshot requests: queued messages with an
+			id are not replaced by ones sent after this message. Pass False for messages that don't
+			change any object's state, e.g. data chunks following their object's metadata, by default True
+		"""
+		if id == '':
+			self.settings.pop(event, None)
+			self.settings[event] = data
+
+		if not self.queueing:
+			self._send(event, data)
+			return
+
+		with self._queue_lock:
+			if id is not None:
+				# replaced in place, the latest state keeps the position of the first one so it can't
+				# move past messages that depend on it, e.g. a volume's data chunks
+				self._queue[(event, id, self._generation)] = (event, data)
+			else:
+				self._queue[object()] = (event, data)
+				if barrier:
+					self._generation += 1
+
+			self._schedule_flush()
+
+	def emit_list(self, event, data):
+		"""Send a bulk ids/values message, e.g. an IDListVector3List
+
+		While queueing, bulk messages for the same event are merged into one message. Messages
+		queued before a bulk message stay before it, so objects are created before bulk messages
+		that target them.
+
+		Parameters
+		----------
+		event : string
+		data : vbl_aquarium model or serializers.ArrayList
+			model whose list fields line up, e.g. ids and values
+		"""
+		if not self.queueing:
+			self._send(event, data)
+			return
+
+		with self._queue_lock:
+			previous = self._queue.pop((event, _BULK), None)
+			merged = None if previous is None else _merge(previous[1], data)
+			if merged is not None:
+				data = merged
+			elif previous is not None:
+				# can't be merged, send the old message first
+				self._queue[object()] = previous
+
+			# the merged message moves to the end of the queue, after the creates of all its objects
+			self._queue[(event, _BULK)] = (event, data)
+			# later per-object messages can't replace anything queued before this one
+			self._generation += 1
+
+			self._schedule_flush()
+
+	def flush(self):
+		"""Send all queued messages, in the order they were queued, see emit
+		"""
+		with self._queue_lock:
+			messages = list(self._queue.values())
+			self._queue.clear()
+			if self._flush_timer is not None:
+				self._flush_timer.cancel()
+				self._flush_timer = None
+
+		if len(messages) == 0:
+			return
+
+		if self.batch_packets and len(messages) > 1:
+			self._send_batched(messages)
+		else:
+			for event, data in messages:
+				self._send(event, data)
+
+	def _send_batched(self, messages):
+		"""Send runs of JSON messages as single 'urchin-batch' events
+
+		The renderer dispatches batched JSON strings by event. Other payloads, e.g. binary buffers or
+		lists, are sent on their own between the batches, so the order is kept.
+		"""
+		batch = []
+		for event, data in messages:
+			data = self._serialize(data)
+			if isinstance(data, str):
+				batch.append([event, data])
+				continue
+
+			self._send_batch(batch)
+			batch = []
+			self._send(event, data)
+		self._send_batch(batch)
+
+	def _send_batch(self, batch):
+		if len(batch) == 1:
+			self._send(*batch[0])
+		elif len(batch) > 1:
+			self._send('urchin-batch', batch)
+
+	@contextmanager
+	def batch(self):
+		"""Queue every message sent inside the block and flush them when it exits, see urchin.batch
+		"""
+		was_queueing = self.queueing
+
+		with self._queue_lock:
+			self._batch_depth += 1
+			self.queueing = True
+			# no automatic flushes until the outermost block exits
+			if self._flush_timer is not None:
+				self._flush_timer.cancel()
+				self._flush_timer = None
+
+		try:
+			yield
+		finally:
+			with self._queue_lock:
+				self._batch_depth -= 1
+				outermost = self._batch_depth == 0
+				if outermost:
+					self.queueing = was_queueing
+			if outermost:
+				self.flush()
+
+	def set_queue(self, enabled = True, tick_rate = None):
+		"""Turn the outgoing queue on or off, turning it off flushes anything still queued
+
+		Parameters
+		----------
+		enabled : bool, optional
+			by default True
+		tick_rate : float, optional
+			seconds between automatic flushes, None to only send on flush(), by default None
+		"""
+		self.tick = tick_rate
+		self.queueing = enabled
+
+		if not enabled:
+			self.flush()
+
+	def _schedule_flush(self):
+		if self.tick is not None and self._flush_timer is None and self._batch_depth == 0:
+			self._flush_timer = threading.Timer(self.tick, self._bind(self.flush))
+			self._flush_timer.daemon = True
+			self._flush_timer.start()
+
+	def _serialize(self, data):
+		data = data() if callable(data) else data
+		if isinstance(data, (BaseModel, serializers.ArrayList)):
+			return serializers.encode(data, self.format)
+		# socket.io only attaches bytes, so buffers are copied once, when they are actually sent
+		if isinstance(data, memoryview):
+			return bytes(data)
+		if isinstance(data, tuple) and any(isinstance(item, memoryview) for item in data):
+			return tuple(bytes(item) if isinstance(item, memoryview) else item for item in data)
+		return data
+
+	def _send(self, event, data):
+		if self._reconnecting:
+			# dropped, replay() re-sends the scene once the connection is back. Screenshot requests
+			# fail instead, see camera._fail_requests
+			return
+
+		if self.async_sio is not None:
+			self._send_later(event, data)
+			return
+
+		if metrics.enabled:
+			start = time.perf_counter()
+		data = self._serialize(data)
+		if metrics.enabled:
+			serialized = time.perf_counter()
+
+		try:
+			if data is None:
+				self.sio.emit(event)
+			else:
+				self.sio.emit(event, data)
+		except socketio.exceptions.BadNamespaceError:
+			# the connection dropped before the disconnect handler ran
+			if not self._connected_once:
+				raise
+			return
+
+		if metrics.enabled:
+			metrics.record(event, data, serialized - start, time.perf_counter() - serialized)
+
+	###### ASYNCIO #######
+
+	async def connect_async(self, url, max_pending = 64):
+		"""Connect with a socketio.AsyncClient running on the current event loop
+
+		After this, every message is sent from the event loop. Synchronous setters queue their
+		messages for a single sender task, use `await drain()` to wait for them.
+
+		Parameters
+		----------
+		url : string
+		max_pending : int, optional
+			number of packets that can wait to be written before emits wait, and of queued messages
+			before synchronous setters on other threads wait, by default 64
+		"""
+		self.max_in_flight = max_pending
+		self._loop = asyncio.get_running_loop()
+
+		self.async_sio = socketio.AsyncClient(reconnection_delay = RECONNECT_DELAY,
+											  reconnection_delay_max = RECONNECT_DELAY_MAX)
+		# same callbacks as the blocking client
+		for event, handler in self.sio.handlers.get('/', {}).items():
+			self.async_sio.on(event, handler)
+		self._watched.clear()
+
+		await self.async_sio.connect(url)
+
+	async def emit_async(self, event, data = None):
+		"""Send a message and wait until there is room in the send queue
+
+		Parameters
+		----------
+		event : string
+		data : any, optional
+			message payload, a callable is called first
+		"""
+		if metrics.enabled:
+			start = time.perf_counter()
+		data = self._serialize(data)
+		if metrics.enabled:
+			serialized = time.perf_counter()
+
+		try:
+			if data is None:
+				await self.async_sio.emit(event)
+			else:
+				await self.async_sio.emit(event, data)
+		except socketio.exceptions.BadNamespaceError:
+			if not self._connected_once:
+				raise
+			return
+
+		if metrics.enabled:
+			metrics.record(event, data, serialized - start, time.perf_counter() - serialized)
+
+		# the engine.io send queue holds packets that haven't been written to the socket yet
+		send_queue = self.async_sio.eio.queue
+		if send_queue is not None and send_queue.qsize() > self.max_in_flight:
+			await send_queue.join()
+
+	async def drain(self):
+		"""Wait until every scheduled message has been written to the socket
+		"""
+		while self._sender is not None and not self._sender.done():
+			await self._sender
+
+		if self.async_sio is not None and self.async_sio.eio.queue is not None:
+			await self.async_sio.eio.queue.join()
+
+	def expect(self, event):
+		"""Get a future for the next message the renderer sends on an event
+
+		Create the future before sending the message that triggers the reply, so the reply can't be missed.
+
+		Parameters
+		----------
+		event : string
+
+		Returns
+		-------
+		asyncio.Future
+			resolves to the message data
+
+		Examples
+		--------
+		>>> reply = client.expect('urchin-loaded-callback')
+		>>> await client.emit_async('urchin-load', data)
+		>>> await reply
+		"""
+		loop = self._loop if self.async_sio is not None else asyncio.get_event_loop()
+		future = loop.create_future()
+
+		active = self.async_sio if self.async_sio is not None else self.sio
+		if (id(active), event) not in self._watched:
+			self._watched.add((id(active), event))
+			self._watch(active, event)
+
+		self._waiters.setdefault(event, []).append((loop, future))
+		return future
+
+	async def request(self, event, data, reply_event, timeout = None):
+		"""Send a message and wait for the renderer's reply
+
+		Parameters
+		----------
+		event : string
+		data : any
+		reply_event : string
+			event the renderer replies on
+		timeout : float, optional
+			seconds to wait, by default None (wait forever)
+
+		Returns
+		-------
+		reply data
+		"""
+		reply = self.expect(reply_event)
+		if self.async_sio is not None:
+			await self.emit_async(event, data)
+		else:
+			self._send(event, data)
+		return await asyncio.wait_for(reply, timeout)
+
+	def _watch(self, active, event):
+		"""Wrap the handler for an event so that it also resolves futures from expect()
+		"""
+		handler = active.handlers.get('/', {}).get(event)
+
+		def watched(*args):
+			data = args[0] if len(args) == 1 else args
+			for loop, future in self._waiters.pop(event, []):
+				loop.call_soon_threadsafe(_resolve, future, data)
+			if handler is not None:
+				return handler(*args)
+
+		active.on(event, watched)
+
+	def _send_later(self, event, data):
+		"""Queue a message for the asyncio client, from any thread
+
+		Callers on other threads wait while max_in_flight messages are queued. The event loop thread
+		can't wait for itself, so there the queue grows until the loop runs, see drain().
+		"""
+		try:
+			on_loop = asyncio.get_running_loop() is self._loop
+		except RuntimeError:
+			on_loop = False
+
+		with self._outbox_room:
+			if not on_loop:
+				self._outbox_room.wait_for(lambda: len(self._outbox) < self.max_in_flight)
+			self._outbox.append((event, data))
+
+		if on_loop:
+			self._start_sender()
+		else:
+			self._loop.call_soon_threadsafe(self._start_sender)
+
+	def _start_sender(self):
+		if self._sender is None or self._sender.done():
+			self._sender = self._loop.create_task(self._send_outbox())
+
+	async def _send_outbox(self):
+		while True:
+			with self._outbox_room:
+				if len(self._outbox) == 0:
+					return
+				event, data = self._outbox.popleft()
+				self._outbox_room.notify_all()
+			# waits while the engine.io send queue is full
+			await self.emit_async(event, data)
+
+	###### RECONNECTING #######
+
+	def replay(self, recreate = False):
+		"""Re-send the whole scene in one batch
+
+		Runs automatically after a dropped connection comes back, and when the renderer reloads.
+		Every object this session created that wasn't deleted sends its full state, along with the
+		loaded atlases and scene-wide settings.
+
+		Parameters
+		----------
+		recreate : bool, optional
+			the renderer lost its scene, objects that can't be updated in place are created again,
+			by default False
+		"""
+		from . import atlas
+
+		with self, self.batch():
+			for loaded in atlas.loaded():
+				loaded._replay(recreate)
+
+			for event, data in list(self.settings.items()):
+				self.emit(event, data, id = '')
+
+			for objects in list(self.objects.values()):
+				for obj in list(objects):
+					if not getattr(obj, 'in_unity', True):
+						continue
+					if hasattr(obj, '_replay'):
+						obj._replay(recreate)
+					else:
+						obj._update()
+
+	###### CONNECTION #######
+
+	def connected(self):
+		if self.async_sio is not None:
+			return self.async_sio.connected
+		return self.sio.connected
+
+	def close(self):
+		"""Disconnect from the echo server
+		"""
+		self.flush()
+		self._closing = True
+		self.sio.disconnect()
+		self._closing = False
+
+	async def close_async(self):
+		"""Send everything still scheduled, then disconnect the asyncio client
+		"""
+		self.flush()
+		await self.drain()
+		self._closing = True
+		await self.async_sio.disconnect()
+		self._closing = False
+		self.async_sio = None
+
+	def negotiate(self, formats = None):
+		"""Tell the renderer which wire formats this client can send
+
+		The renderer replies on 'urchin-capabilities' with the formats it understands, and the
+		preferred common format is used from then on. Renderers that don't reply keep receiving JSON.
+		A renderer that connects later announces its formats itself. The reply can also list optional
+		features the renderer supports, e.g. 'atlas-delta' (see atlas.Atlas._update).
+
+		Parameters
+		----------
+		formats : list of string, optional
+			formats to offer, by default every format this install can encode, see serializers.available
+		"""
+		self._offered = serializers.available() if formats is None else formats
+		self._send('urchin-capabilities', json.dumps({'role': 'client', 'formats': self._offered}))
+
+	def _on_capabilities(self, data):
+		capabilities = json.loads(data) if isinstance(data, str) else data
+		# other Python clients logged in with the same ID receive our announcement too
+		if capabilities.get('role') != 'renderer':
+			return
+
+		offered = getattr(self, '_offered', None)
+		formats = [format for format in capabilities.get('formats', ['json'])
+				   if offered is None or format in offered]
+		self.format = serializers.choose(formats)
+		self.features = set(capabilities.get('features', []))
+
+	def change_id(self, newID):
+		"""Change the ID used to connect to the echo server
+
+		Parameters
+		----------
+		newID : string
+			New ID to connect with
+		"""
+		self.ID = newID
+		self._send('ID',[newID,"send"])
+		print(f'Login sent with ID: {newID}, copy this ID into the renderer to connect.')
+
+	def _bind(self, handler):
+		"""Run a handler with this session as the current session
+		"""
+		def bound(*args):
+			with self:
+				return handler(*args)
+		return bound
+
+# queue key for merged bulk messages, see Session.emit_list
+_BULK = object()
+
+def _merge(previous, data):
+	"""Concatenate two bulk messages, or None if they can't be merged"""
+	if isinstance(previous, serializers.ArrayList):
+		return previous.merge(data)
+	if type(previous) is type(data):
+		return previous.model_copy(update = {
+			name: getattr(previous, name) + value
+			for name, value in data if isinstance(value, list)
+		})
+	return None
+
+def _resolve(future, data):
+	if not future.done():
+		future.set_result(data)
+
+default = Session()
+_current = contextvars.ContextVar('urchin_session', default = None)
+_tokens = contextvars.ContextVar('urchin_session_tokens', default = ())
+
+def current():
+	"""The session that modules send to, see Session
+	"""
+	session = _current.get()
+	return default if session is None else session
+
+def session_of(objects):
+	"""The session that created a list of objects, which their bulk setters send to
+
+	Parameters
+	----------
+	objects : list
+		objects with a session attribute, e.g. meshes.Mesh
+
+	Returns
+	-------
+	Session
+		current() for an empty list
+
+	Raises
+	------
+	ValueError
+		The objects were created in different sessions
+	"""
+	sessions = {obj.session for obj in objects}
+	if len(sessions) > 1:
+		raise ValueError('Objects created in different sessions must be set separately')
+	return sessions.pop() if sessions else current()
+
+# Attributes of the current session, e.g. `client.sio` and `client.ID`
+_session_attributes = ['ID', 'sio', 'queueing', 'tick', 'batch_packets', 'async_sio', 'max_in_flight', 'format', 'features']
+
+def __getattr__(name):
+	if name in _session_attributes:
+		return getattr(current(), name)
+
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Helper functions, for the current session
+def emit(event, data = None, id = None, barrier = True):
+	current().emit(event, data, id, barrier)
+
+def emit_list(event, data):
+	current().emit_list(event, data)
+
+def flush():
+	current().flush()
+
+def batch():
+	return current().batch()
+
+def set_queue(enabled = True, tick_rate = None):
+	current().set_queue(enabled, tick_rate)
+
+async def connect_async(url, max_pending = 64):
+	await current().connect_async(url, max_pending)
+
+async def emit_async(event, data = None):
+	await current().emit_async(event, data)
+
+async def drain():
+	await current().drain()
+
+def expect(event):
+	return current().expect(event)
+
+async def request(event, data, reply_event, timeout = None):
+	return await current().request(event, data, reply_event, timeout)
+
 def connected():
-	return sio.connected
+	return current().connected()
 
 def close():
 	"""Disconnect from the echo server
 	"""
-	sio.disconnect()
+	current().close()
+
+async def close_async():
+	await current().close_async()
 
 def change_id(newID):
 	"""Change the ID used to connect to the echo server
@@ -85,5 +790,4 @@ def change_id(newID):
 	newID : string
 		New ID to connect with
 	"""
-	sio.emit('ID',[newID,"send"])
-	print(f'Login sent with ID: {newID}, copy this ID into the renderer to connect.')
+	current().change_id(newID)
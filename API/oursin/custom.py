@@ -7,8 +7,14 @@ import json
 from vbl_aquarium.models.urchin import CustomMeshModel
 from vbl_aquarium.models.generic import IDData
 
-counter = 0
-customs = []
+def __getattr__(name):
+    # the custom meshes created in the current session, see client.Session
+    if name == 'customs':
+        return client.current().objects['customs']
+    if name == 'counter':
+        return client.current().counters['customs']
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class CustomMesh:
     """Custom 3D object
@@ -28,8 +34,8 @@ class CustomMesh:
         normals : list of vector3, optional
             Normal directions, by default None
         """
-        global counter
-        counter += 1
+        self.session = client.current()
+        counter = self.session.count('customs')
 
         self.data = CustomMeshModel(
             id = str(counter),
@@ -41,10 +47,10 @@ class CustomMesh:
         self._update()
         self.in_unity = True
 
-        customs.append(self)
+        self.session.objects['customs'].append(self)
 
     def _update(self):
-        client.sio.emit('urchin-custommesh-update', self.data.to_json_string())
+        self.session.emit('urchin-custommesh-update', self.data.to_json_string, id = self.data.id)
 
     def delete(self):
         """Destroy this object in the renderer scene
@@ -54,7 +60,7 @@ class CustomMesh:
             id = self.data.id
         )
 
-        client.sio.emit('urchin-custommesh-delete', data.to_json_string())
+        self.session.emit('urchin-custommesh-delete', data.to_json_string)
         self.in_unity = False
 
     def set_position(self, position = [0,0,0], use_reference = True):
@@ -96,9 +102,9 @@ class CustomMesh:
 def clear():
     """Clear all custom meshes
     """
-    global customs
+    customs = client.current().objects['customs']
 
     for custom in customs:
         custom.delete()
 
-    customs = []
\ No newline at end of file
+    customs.clear()
\ No newline at end of file
@@ -7,18 +7,24 @@ from . import utils
 from vbl_aquarium.models.urchin import LineModel
 from vbl_aquarium.models.generic import IDData
 
-counter = 0
-lines = []
+def __getattr__(name):
+  # the lines created in the current session, see client.Session
+  if name == 'lines':
+    return client.current().objects['lines']
+  if name == 'counter':
+    return client.current().counters['lines']
+
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def clear():
     """Clear all custom meshes
     """
-    client.sio.emit('Clear','lines')
+    client.emit('Clear','lines')
 
 class Line:
   def __init__(self, positions= [[0.0,0.0,0.0]], color= [1, 1, 1]):
-    global counter
-    counter += 1
+    self.session = client.current()
+    counter = self.session.count('lines')
 
     self.data = LineModel(
       id = f'l{counter}',
@@ -29,10 +35,12 @@ class Line:
     self._update()
     self.in_unity = True
 
+    self.session.objects['lines'].append(self)
+
     lines.append(line)
 
   def _update(self):
-    client.sio.emit('urchin-line-update', self.data.to_json_string())
+    self.session.emit('urchin-line-update', self.data.to_json_string, id = self.data.id)
 
   def delete(self):
     """Deletes lines
@@ -40,7 +48,7 @@ class Line:
     Examples
     >>>l1.delete()
     """
-    client.sio.emit('urchin-line-delete', IDData(id=self.data.id).to_json_string())
+    self.session.emit('urchin-line-delete', IDData(id=self.data.id).to_json_string)
     self.in_unity = False
 
   def set_positions(self, positions):
@@ -118,9 +126,9 @@ def delete (lines_list):
 def clear():
   """Clear all Line objects that have been created
   """
-  global line
+  lines = client.current().objects['lines']
 
   for line in lines:
     line.delete()
 
-  lines = []
\ No newline at end of file
+  lines.clear()
\ No newline at end of file
@@ -3,6 +3,8 @@
 from . import client
 import warnings
 from . import utils
+from . import serializers
+import numpy as np
 
 from vbl_aquarium.models.urchin import *
 from vbl_aquarium.models.generic import *
@@ -13,8 +15,14 @@ def _neuron_callback(callback_data):
   if callback is not None:
     callback(callback_data)
 
-counter = 0
-meshes = []
+def __getattr__(name):
+  # the meshes created in the current session, see client.Session
+  if name == 'meshes':
+    return client.current().objects['meshes']
+  if name == 'counter':
+    return client.current().counters['meshes']
+
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 ## Primitive Mesh Renderer
 class Mesh:
@@ -38,10 +46,10 @@ class Mesh:
     material : str, optional
         by default 'default'
     """
-    global counter
+    self.session = client.current()
 
     self.data = MeshModel(
-      id = str(counter),
+      id = str(self.session.counters['meshes']),
       shape = 'sphere',
       position = utils.formatted_vector3([x/1000 for x in position]),
       color = utils.formatted_color(color),
@@ -50,17 +58,17 @@ class Mesh:
       interactive = interactive
     )
 
-    counter += 1
+    self.session.count('meshes')
 
     self._update()
     self.in_unity = True
 
-    meshes.append(self)
+    self.session.objects['meshes'].append(self)
 
   def _update(self):
     """Serialize and update the data in the Urchin Renderer
     """
-    client.sio.emit('urchin-meshes-update', self.data.to_json_string())
+    self.session.emit('urchin-meshes-update', self.data.to_json_string, id = self.data.id)
 
   def delete(self):
     """Deletes meshes
@@ -74,10 +82,9 @@ class Mesh:
 	  >>> cube_obj.delete() 
     """
 
-    data = IDData
-    data.id = self.data.id
+    data = IDData(id = self.data.id)
 
-    client.sio.emit('urchin-meshes-delete', data.to_json_string())
+    self.session.emit('urchin-meshes-delete', data.to_json_string)
     self.in_unity = False
   
   def set_position(self, position):
@@ -166,12 +173,12 @@ class Mesh:
 def clear():
   """Clear all Mesh objects that have been created
   """
-  global meshes
+  meshes = client.current().objects['meshes']
 
   for mesh in meshes:
     mesh.delete()
 
-  meshes = []
+  meshes.clear()
 
 def create(num_objects, position= [0.0,0.0,0.0], scale= [1,1,1], color=[1,1,1],
                material = 'default', interactive = False):
@@ -215,12 +222,18 @@ def delete(meshes_list):
 	>>> urchin.meshes.delete(meshes)
   """
   meshes_list = utils.sanitize_list(meshes_list)
+  session = client.session_of(meshes_list)
 
   data = IDList(
     ids = [x.data.id for x in meshes_list]
   )
 
-  client.sio.emit('urchin-meshes-deletes', data.to_json_string())
+  session.emit_list('urchin-meshes-deletes', data)
+
+  # deleted meshes are not replayed after a reconnect
+  for mesh in meshes_list:
+    mesh.in_unity = False
+  session.objects['meshes'][:] = [mesh for mesh in session.objects['meshes'] if mesh.in_unity]
 
 def set_positions(meshes_list, positions_list):
   """Set the positions of mesh renderers
@@ -229,7 +242,7 @@ def set_positions(meshes_list, positions_list):
   ----------
   meshes_list : list of mesh objects
 	  list of meshes being set
-  positions_list : list of list of three floats
+  positions_list : list of list of three floats, or (n, 3) numpy array
     vertex positions of each mesh in um
       
 	Examples
@@ -237,14 +250,17 @@ def set_positions(meshes_list, positions_list):
 	>>> urchin.primitives.set_positions(cubes,[[3,3,3],[2,2,2]])
   """
   meshes_list = utils.sanitize_list(meshes_list)
-  positions_list = utils.sanitize_list(positions_list)
+  session = client.session_of(meshes_list)
+  # validated as a whole, instead of building a Vector3 per mesh
+  positions = utils.sanitize_float_array(positions_list, len(meshes_list), 3, np.float64) / 1000
 
-  data = IDListVector3List(
-    ids = [x.data.id for x in meshes_list],
-    values = [utils.formatted_vector3(utils.sanitize_vector3([x[0]/1000, x[1]/1000, x[2]/1000])) for x in positions_list]
-  )
+  # kept on each mesh, so that a replay sends the current state
+  for mesh, (x, y, z) in zip(meshes_list, positions.tolist()):
+    mesh.data.position = Vector3.model_construct(x = x, y = y, z = z)
+
+  data = serializers.ArrayList(IDListVector3List, [x.data.id for x in meshes_list], positions)
 
-  client.sio.emit('urchin-meshes-positions', data.to_json_string())
+  session.emit_list('urchin-meshes-positions', data)
 
 def set_scales(meshes_list, scales_list):
   """Set scale of mesh renderers
@@ -253,7 +269,7 @@ def set_scales(meshes_list, scales_list):
   ----------
   meshes_list : list of mesh objects
 	  list of meshes being scaled
-  scales_list : list of list of three floats
+  scales_list : list of list of three floats, or (n, 3) numpy array
     new scales of each mesh
       
 	Examples
@@ -261,14 +277,15 @@ def set_scales(meshes_list, scales_list):
 	>>> urchin.primitives.set_scales(cubes,[[3,3,3],[2,2,2]])
   """
   meshes_list = utils.sanitize_list(meshes_list)
-  scales_list = utils.sanitize_list(scales_list)
+  session = client.session_of(meshes_list)
+  scales = utils.sanitize_float_array(scales_list, len(meshes_list), 3, np.float64)
 
-  data = IDListVector3List(
-    ids = [x.data.id for x in meshes_list],
-    values = [utils.formatted_vector3(utils.sanitize_vector3(x)) for x in scales_list]
-  )
+  for mesh, (x, y, z) in zip(meshes_list, scales.tolist()):
+    mesh.data.scale = Vector3.model_construct(x = x, y = y, z = z)
+
+  data = serializers.ArrayList(IDListVector3List, [x.data.id for x in meshes_list], scales)
 
-  client.sio.emit('urchin-meshes-scales', data.to_json_string())
+  session.emit_list('urchin-meshes-scales', data)
 
 def set_colors(meshes_list, colors_list):
   """Sets colors of mesh renderers
@@ -277,7 +294,7 @@ def set_colors(meshes_list, colors_list):
   ----------
   meshes_list : list of mesh objects
 	  list of meshes undergoing color change
-  colors_list : list of string hex colors
+  colors_list : list of string hex colors, or (n, 3)/(n, 4) numpy array
       new hex colors for each mesh
       
 	Examples
@@ -286,14 +303,15 @@ def set_colors(meshes_list, colors_list):
 	
   """
   meshes_list = utils.sanitize_list(meshes_list)
-  colors_list = utils.sanitize_list(colors_list)
+  session = client.session_of(meshes_list)
+  colors = utils.sanitize_color_array(colors_list, len(meshes_list), np.float64)
 
-  data = IDListColorList(
-    ids = [x.data.id for x in meshes_list],
-    values = [utils.formatted_color(x) for x in colors_list]
-  )
+  for mesh, (r, g, b, a) in zip(meshes_list, colors.tolist()):
+    mesh.data.color = Color.model_construct(r = r, g = g, b = b, a = a)
+
+  data = serializers.ArrayList(IDListColorList, [x.data.id for x in meshes_list], colors)
 
-  client.sio.emit('urchin-meshes-colors', data.to_json_string())
+  session.emit_list('urchin-meshes-colors', data)
 
 def set_materials(meshes_list, materials_list):
   """Sets materials of mesh renderers
@@ -311,11 +329,15 @@ def set_materials(meshes_list, materials_list):
 	
   """
   meshes_list = utils.sanitize_list(meshes_list)
+  session = client.session_of(meshes_list)
   materials_list = utils.sanitize_list(materials_list)
 
   data = IDListStringList(
     ids = [x.data.id for x in meshes_list],
     values = [utils.sanitize_material(x) for x in materials_list]
   )
+
+  for mesh, material in zip(meshes_list, data.values):
+    mesh.data.material = material
       
-  client.sio.emit('urchin-meshes-materials', data.to_json_string()) 
\ No newline at end of file
+  session.emit_list('urchin-meshes-materials', data) 
\ No newline at end of file
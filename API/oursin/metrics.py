@@ -0,0 +1,188 @@
+"""Opt-in instrumentation of the messages sent to the renderer
+
+When enabled, every message records its size, the time spent serializing it, and the time spent
+handing it to the socket. Other stages (e.g. volume compression) can be timed with `measure`.
+
+Examples
+--------
+>>> urchin.metrics.enable()
+>>> urchin.meshes.create(1000)
+>>> urchin.stats()['urchin-meshes-update']
+{'count': 1000, 'bytes': 183000, 'serialize': {...}, 'emit': {...}}
+"""
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+enabled = False
+
+# histogram bucket upper edges in seconds, 1 us to 10 s with 4 buckets per decade
+BUCKETS = [10 ** (exponent / 4) for exponent in range(-24, 5)]
+
+_lock = threading.Lock()
+_events = {}
+_stages = {}
+_callbacks = []
+
+class Histogram:
+	"""Log-spaced histogram of durations, see BUCKETS"""
+	def __init__(self):
+		self.counts = [0] * (len(BUCKETS) + 1)
+		self.total = 0.0
+		self.max = 0.0
+		self.n = 0
+
+	def add(self, seconds):
+		self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+		self.total += seconds
+		self.max = max(self.max, seconds)
+		self.n += 1
+
+	def quantile(self, q):
+		"""Upper bucket edge that contains quantile q"""
+		if self.n == 0:
+			return 0.0
+		target = q * self.n
+		cumulative = 0
+		for i, count in enumerate(self.counts):
+			cumulative += count
+			if cumulative >= target:
+				return BUCKETS[i] if i < len(BUCKETS) else self.max
+		return self.max
+
+	def summary(self):
+		return {
+			'total': self.total,
+			'mean': self.total / self.n if self.n > 0 else 0.0,
+			'p50': self.quantile(0.5),
+			'p99': self.quantile(0.99),
+			'max': self.max,
+			'histogram': list(self.counts)
+		}
+
+def enable(on = True):
+	"""Turn metrics on or off
+
+	Parameters
+	----------
+	on : bool, optional
+		by default True
+	"""
+	global enabled
+	enabled = on
+
+def reset():
+	"""Clear all recorded metrics
+	"""
+	with _lock:
+		_events.clear()
+		_stages.clear()
+
+def add_callback(callback):
+	"""Call a function for every message sent, e.g. to export to a metrics system
+
+	Parameters
+	----------
+	callback : function
+		callback(event, n_bytes, serialize_seconds, emit_seconds), called from the sending thread
+	"""
+	_callbacks.append(callback)
+
+def remove_callback(callback):
+	_callbacks.remove(callback)
+
+def record(event, data, serialize_seconds, emit_seconds):
+	"""Record one sent message
+
+	Parameters
+	----------
+	event : string
+	data : payload as it was sent
+	serialize_seconds : float
+	emit_seconds : float
+	"""
+	n_bytes = payload_size(data)
+
+	with _lock:
+		if event not in _events:
+			_events[event] = {'count': 0, 'bytes': 0, 'serialize': Histogram(), 'emit': Histogram()}
+		stat = _events[event]
+		stat['count'] += 1
+		stat['bytes'] += n_bytes
+		stat['serialize'].add(serialize_seconds)
+		stat['emit'].add(emit_seconds)
+
+	for callback in _callbacks:
+		callback(event, n_bytes, serialize_seconds, emit_seconds)
+
+@contextmanager
+def measure(stage):
+	"""Time a block of code as a named stage, when metrics are enabled
+
+	Parameters
+	----------
+	stage : string
+
+	Examples
+	--------
+	>>> with metrics.measure('volume-compress'):
+	>>> 	compressed = zlib.compress(data)
+	"""
+	if not enabled:
+		yield
+		return
+
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		elapsed = time.perf_counter() - start
+		with _lock:
+			if stage not in _stages:
+				_stages[stage] = Histogram()
+			_stages[stage].add(elapsed)
+
+def stats(clear = False):
+	"""Summary of everything recorded since metrics were enabled or reset
+
+	Parameters
+	----------
+	clear : bool, optional
+		reset the metrics after reading them, by default False
+
+	Returns
+	-------
+	dict
+		{event: {'count', 'bytes', 'serialize', 'emit'}} with a timing summary for serialize and
+		emit, plus {'stages': {stage: timing summary}}
+	"""
+	with _lock:
+		summary = {event: {
+			'count': stat['count'],
+			'bytes': stat['bytes'],
+			'serialize': stat['serialize'].summary(),
+			'emit': stat['emit'].summary()
+		} for event, stat in _events.items()}
+		summary['stages'] = {stage: histogram.summary() for stage, histogram in _stages.items()}
+
+	if clear:
+		reset()
+
+	return summary
+
+def payload_size(data):
+	"""Approximate payload size in bytes, as it would be sent"""
+	if isinstance(data, (bytes, bytearray)):
+		return len(data)
+	if isinstance(data, memoryview):
+		return data.nbytes
+	if isinstance(data, str):
+		# UTF-8 bytes, so text is comparable with binary payloads
+		return len(data.encode())
+	if isinstance(data, (list, tuple)):
+		return sum(payload_size(x) for x in data)
+	if data is None:
+		return 0
+	return len(json.dumps(data))
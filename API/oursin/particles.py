@@ -3,14 +3,26 @@
 from . import client
 import warnings
 from . import utils
+from . import serializers
+import numpy as np
 
 from vbl_aquarium.models.unity import Vector3, Color
 from vbl_aquarium.models.generic import IDData, FloatList, ColorList
 from vbl_aquarium.models.urchin import ParticleSystemModel
 
 ## Particle system
-counter = 0
-systems = []
+def __getattr__(name):
+	# the particle systems created in the current session, see client.Session
+	if name == 'systems':
+		return client.current().objects['particles']
+	if name == 'counter':
+		return client.current().counters['particles']
+
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Default for new particle systems: send positions, sizes, and colors as raw float32 buffers
+# instead of JSON, requires a renderer with binary support. See ParticleSystem(binary=...)
+binary = False
 
 class ParticleSystem:
 	"""Particle system
@@ -22,40 +34,69 @@ class ParticleSystem:
 	Create separate particle systems when you need to use different materials
 	"""
 	
-	def __init__(self, n, material = 'circle', positions = None, sizes = None, colors = None):
+	def __init__(self, n, material = 'circle', positions = None, sizes = None, colors = None, binary = None):
 		"""Initialize particle system
 
 		Parameters
 		----------
 		n : int
 				Number of particles
+		binary : bool, optional
+				send positions, sizes, and colors as raw float32 buffers, requires a renderer with
+				binary support, by default urchin.particles.binary
 		"""
-		global counter, systems
-		counter += 1
-
-		self.data = ParticleSystemModel(
-			id= f'psystem{counter}',
-			n = n,
-			material= material,
-			positions = [Vector3()] * n if positions is None else [utils.formatted_vector3(pos) for pos in utils.sanitize_list(positions, n)],
-			sizes = [0.1] * n if sizes is None else utils.sanitize_list(sizes, n),
-			colors = [Color()] * n if sizes is None else utils.sanitize_list(colors, n)
-		)
+		self.session = client.current()
+		counter = self.session.count('particles')
+
+		self.binary = globals()['binary'] if binary is None else binary
+
+		if self.binary:
+			self.data = ParticleSystemModel(
+				id= f'psystem{counter}',
+				n = n,
+				material= material
+			)
+			self.positions = utils.sanitize_float_array(0 if positions is None else positions, n, 3)
+			self.sizes = utils.sanitize_float_array(0.1 if sizes is None else sizes, n)
+			self.colors = utils.sanitize_color_array([1, 1, 1, 1] if colors is None else colors, n)
+		else:
+			self.data = ParticleSystemModel(
+				id= f'psystem{counter}',
+				n = n,
+				material= material,
+				positions = [Vector3()] * n if positions is None else utils.vector3_list(utils.sanitize_float_array(positions, n, 3, np.float64)),
+				sizes = [0.1] * n if sizes is None else utils.sanitize_list(sizes, n),
+				colors = [Color()] * n if colors is None else utils.color_list(utils.sanitize_color_array(colors, n, np.float64))
+			)
+
+		# colors sent with the efficient code, converted to models only when a full update needs them
+		self._stale_colors = None
 
-		self._update()
 		self.in_unity = True
+		self._update()
 		
-		systems.append(self)
+		self.session.objects['particles'].append(self)
 
 	def _update(self):
 		"""Push data to Urchin renderer
+
+		In binary mode the model is sent without its lists, followed by one buffer per attribute
 		"""
-		client.sio.emit('urchin-particles-update', self.data.to_json_string())
+		if self._stale_colors is not None:
+			self.data.colors = utils.color_list(self._stale_colors)
+			self._stale_colors = None
+
+		self.session.emit('urchin-particles-update', self.data.to_json_string, id = self.data.id)
+
+		if self.binary:
+			self._set_positions_binary(self.positions)
+			self._set_sizes_binary(self.sizes)
+			self._set_colors_binary(self.colors)
 
 	def delete(self):
 		"""Delete this particle system and all its particles
 		"""
-		client.sio.emit('urchin-particles-delete', IDData(id= self.data.id).to_json_string())
+		self.session.emit('urchin-particles-delete', IDData(id= self.data.id).to_json_string)
 		self.in_unity = False
 
 	def set_material(self, material):
@@ -88,9 +129,12 @@ class ParticleSystem:
 	def set_positions(self, positions):
 		"""Set the positions of particles relative to the reference coordinate
 		
+		Binary particle systems (see ParticleSystem(binary=True)) send the positions as one float32
+		buffer, without building a JSON list.
+
 		Parameters
 		---------- 
-		position : list of three floats
+		position : list of three floats, or (n, 3) numpy array
 			(ap, ml, dv) coordinates in um
 
 		Examples
@@ -100,8 +144,14 @@ class ParticleSystem:
 		if self.in_unity == False:
 			raise Exception("Particle system was deleted")
 		
-		positions = utils.sanitize_list(positions, self.data.n)
-		self.data.positions = [utils.formatted_vector3([pos[0]/1000, pos[1]/1000, pos[2]/1000]) for pos in positions]
+		if self.binary:
+			self.positions = np.multiply(utils.sanitize_float_array(positions, self.data.n, 3), 1/1000, dtype=np.float32)
+			self._set_positions_binary(self.positions)
+			return
+
+		# validated as a whole, then converted in one pass instead of per particle
+		positions = utils.sanitize_float_array(positions, self.data.n, 3, np.float64) / 1000
+		self.data.positions = utils.vector3_list(positions)
 		
 		self._update()
 
@@ -120,14 +170,34 @@ class ParticleSystem:
 		if self.in_unity == False:
 			raise Exception("Particle system was deleted")
 		
-		client.sio.emit('urchin-particles-positions', positions.to_json_string())
+		self.session.emit('urchin-particles-positions', positions, id = self.data.id)
+
+	def _set_positions_binary(self, positions):
+		"""Efficient binary position setting, for real-time applications
+
+		float32 C-contiguous arrays are queued as a view, without a copy. Don't modify them until
+		they have been sent
+
+		Parameters
+		----------
+		positions : numpy array
+				(n, 3) AP/ML/DV positions in *mm*
+		"""
+		if self.in_unity == False:
+			raise Exception("Particle system was deleted")
+
+		positions = np.ascontiguousarray(positions, dtype=np.float32)
+		self.session.emit('urchin-particles-positions-binary', (self.data.id, memoryview(positions)), id = self.data.id)
 
 	def set_sizes(self, sizes):
 		"""Set the sizes of particles in um
 		
+		Binary particle systems (see ParticleSystem(binary=True)) send the sizes as one float32
+		buffer, without building a JSON list.
+
 		Parameters
 		---------- 
-		size : float
+		size : float, or (n,) numpy array
 
 		Examples
 		--------
@@ -135,19 +205,20 @@ class ParticleSystem:
 		"""
 		if self.in_unity == False:
 				raise Exception("Particle system was deleted")
+
+		if self.binary:
+			self.sizes = np.multiply(utils.sanitize_float_array(sizes, self.data.n), 1/1000, dtype=np.float32)
+			self._set_sizes_binary(self.sizes)
+			return
 		
-		sizes = utils.sanitize_list(sizes, self.data.n)
-		sizes = [utils.sanitize_float(size)/1000 for size in sizes]
+		sizes = (utils.sanitize_float_array(sizes, self.data.n, dtype=np.float64) / 1000).tolist()
 		self.data.sizes = sizes
 		
 		if self.data.n < 100000:
 				self._update()
 		else:
 				# use the efficient code
-				data = FloatList(
-					id= self.data.id,
-					values= sizes
-				)
+				data = serializers.ArrayList(FloatList, self.data.id, np.asarray(sizes))
 
 				self._set_sizes(data)
 
@@ -158,20 +229,37 @@ class ParticleSystem:
 
 		Parameters
 		----------
-		sizes : FloatList
+		sizes : FloatList or serializers.ArrayList
 				Sizes of particles in *mm*
 		"""
 		if self.in_unity == False:
 			raise Exception("Particle system was deleted")
 		
-		client.sio.emit('urchin-particles-sizes', sizes.to_json_string())
+		self.session.emit('urchin-particles-sizes', sizes, id = self.data.id)
+
+	def _set_sizes_binary(self, sizes):
+		"""Efficient binary size setting, for real-time applications
+
+		Parameters
+		----------
+		sizes : numpy array
+				(n,) sizes of particles in *mm*
+		"""
+		if self.in_unity == False:
+			raise Exception("Particle system was deleted")
+
+		sizes = np.ascontiguousarray(sizes, dtype=np.float32)
+		self.session.emit('urchin-particles-sizes-binary', (self.data.id, memoryview(sizes)), id = self.data.id)
 	
 	def set_colors(self, colors):
 		"""Set the colors of particles
 		
+		Binary particle systems (see ParticleSystem(binary=True)) send the colors as one float32
+		buffer, without building a JSON list.
+
 		Parameters
 		---------- 
-		colors : list
+		colors : list, or (n, 3)/(n, 4) numpy array
 			hex or [r,g,b] colors
 
 		Examples
@@ -180,20 +268,21 @@ class ParticleSystem:
 		"""
 		if self.in_unity == False:
 			raise Exception("Particle system was deleted")
-		
-		colors = utils.sanitize_list(colors, self.data.n)
-		colors = [utils.formatted_color(color) for color in colors]
-		self.data.colors = colors
 
+		if self.binary:
+			self.colors = utils.sanitize_color_array(colors, self.data.n)
+			self._set_colors_binary(self.colors)
+			return
+		
+		colors = utils.sanitize_color_array(colors, self.data.n, np.float64)
 		
 		if self.data.n < 100000:
+				self.data.colors = utils.color_list(colors)
 				self._update()
 		else:
-				# use the efficient code
-				data = ColorList(
-					id= self.data.id,
-					values= colors
-				)
+				# use the efficient code, skipping a Color model per particle
+				self._stale_colors = colors
+				data = serializers.ArrayList(ColorList, self.data.id, colors)
 
 				self._set_colors(data)
 	
@@ -204,19 +293,33 @@ class ParticleSystem:
 
 		Parameters
 		----------
-		colors : ColorList
+		colors : ColorList or serializers.ArrayList
 				Colors of particles
 		"""
 		if self.in_unity == False:
 			raise Exception("Particle system was deleted")
 		
-		client.sio.emit('urchin-particles-colors', colors.to_json_string())
+		self.session.emit('urchin-particles-colors', colors, id = self.data.id)
+
+	def _set_colors_binary(self, colors):
+		"""Efficient binary color setting, for real-time applications
+
+		Parameters
+		----------
+		colors : numpy array
+				(n, 4) RGBA colors of particles in the range 0->1
+		"""
+		if self.in_unity == False:
+			raise Exception("Particle system was deleted")
+
+		colors = np.ascontiguousarray(colors, dtype=np.float32)
+		self.session.emit('urchin-particles-colors-binary', (self.data.id, memoryview(colors)), id = self.data.id)
 
 def clear():
 	"""Clear all particle systems
 	"""
-	global systems
+	systems = client.current().objects['particles']
 	for system in systems:
 		system.delete()
 
-	systems = []
\ No newline at end of file
+	systems.clear()
\ No newline at end of file
@@ -1,27 +1,36 @@
 from . import client
 import warnings
 from . import utils
+from . import serializers
+import numpy as np
 
 from vbl_aquarium.models.urchin import ProbeModel
-from vbl_aquarium.models.generic import IDData, IDListVector3List, IDListColorList, IDListStringList
+from vbl_aquarium.models.generic import IDData, IDListVector3List, IDListColorList, IDListStringList, Vector3, Color
 
 ##Probes Renderer
-counter = 0
-probes = []
+def __getattr__(name):
+	# the probes created in the current session, see client.Session
+	if name == 'probes':
+		return client.current().objects['probes']
+	if name == 'counter':
+		return client.current().counters['probes']
+
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def clear():
 		"""Clear all Probe objects
 		"""
+		probes = client.current().objects['probes']
 		for probe in probes:
 			probe.delete()
 		
-		probes = []
+		probes.clear()
 
 class Probe:
 	def __init__(self, color = 'FFFFFF', position = [0,0,0], angle = [0,0,0], style = 'line', scale = [0.070, 3.840, 0.020]):
 		
-		global counter, probes
-		counter +=1
+		self.session = client.current()
+		counter = self.session.count('probes')
 		
 		self.data = ProbeModel(
 			id = f'p{counter}',
@@ -35,10 +44,10 @@ class Probe:
 		self._update()
 		self.in_unity = True
 		
-		probes.append(self)
+		self.session.objects['probes'].append(self)
 
 	def _update(self):
-		client.sio.emit('urchin-probe-update', self.data.to_json_string())
+		self.session.emit('urchin-probe-update', self.data.to_json_string, id = self.data.id)
 
 	def delete(self):
 		"""Delete probe objects
@@ -51,7 +60,7 @@ class Probe:
 		--------
 		>>> p1.delete()
 		"""
-		client.sio.emit('urchin-probe-delete', IDData(id=self.data.id).to_json_string())
+		self.session.emit('urchin-probe-delete', IDData(id=self.data.id).to_json_string)
 		self.in_unity = False
 
 	def set_color(self,color):
@@ -181,8 +190,15 @@ def delete(probes_list):
 	>>> probes.delete([p1,p2])
 	"""
 	probes_list = utils.sanitize_list(probes_list)
-	probe_ids = [x.id for x in probes_list]
-	client.sio.emit('DeleteProbes', probe_ids)
+	session = client.session_of(probes_list)
+
+	# the renderer has no bulk delete for probes
+	for probe in probes_list:
+		if probe.in_unity:
+			probe.delete()
+
+	# deleted probes are not replayed after a reconnect
+	session.objects['probes'][:] = [probe for probe in session.objects['probes'] if probe.in_unity]
 
 def set_colors(probes_list, colors_list):
 	"""Set colors of probe objects
@@ -191,21 +207,23 @@ def set_colors(probes_list, colors_list):
 	----------
 	probes_list: list of probe objects
 		list of probe objects to be colored
-	colors_list : list of string hex colors
+	colors_list : list of string hex colors, or (n, 3)/(n, 4) numpy array
 		new hex colors for each probe
 
 	Examples
 	--------
 	>>> urchin.probes.set_colors(probes,['#FFFFFF','#000000'])
 	"""
-	colors_list = utils.sanitize_list(colors_list, len(probes_list))
+	session = client.session_of(probes_list)
+	colors = utils.sanitize_color_array(colors_list, len(probes_list), np.float64)
 
-	data = IDListColorList(
-		ids = [x.data.id for x in probes_list],
-		values= [utils.formatted_color(x) for x in colors_list]
-	)
+	# kept on each probe, so that a replay sends the current state
+	for probe, (r, g, b, a) in zip(probes_list, colors.tolist()):
+		probe.data.color = Color.model_construct(r = r, g = g, b = b, a = a)
 
-	client.sio.emit('urchin-probe-colors', data.to_json_string())
+	data = serializers.ArrayList(IDListColorList, [x.data.id for x in probes_list], colors)
+
+	session.emit_list('urchin-probe-colors', data)
 
 def set_positions(probes_list, positions_list):
 	"""Set probe tip positions in AP/ML/DV coordinates in um relative to the zero point (front, left, top)
@@ -213,21 +231,22 @@ def set_positions(probes_list, positions_list):
 	Parameters
 	----------
 	probes_list : list of Probe
-	positions_list : list of vector3
+	positions_list : list of vector3, or (n, 3) numpy array
 		tip coordinate in AP/ML/DV in um
 			
 	Examples
 	--------
 	>>> urchin.probes.set_positions(probes,[[1000,2000,1000],[2000,2000,2000]])
 	"""
-	positions_list = utils.sanitize_list(positions_list, len(probes_list))
+	session = client.session_of(probes_list)
+	positions = utils.sanitize_float_array(positions_list, len(probes_list), 3, np.float64) / 1000
+
+	for probe, (x, y, z) in zip(probes_list, positions.tolist()):
+		probe.data.position = Vector3.model_construct(x = x, y = y, z = z)
 
-	data = IDListVector3List(
-		ids = [x.data.id for x in probes_list],
-		values= [utils.formatted_vector3([pos[0]/1000, pos[1]/1000, pos[2]/1000]) for pos in positions_list]
-	)
+	data = serializers.ArrayList(IDListVector3List, [x.data.id for x in probes_list], positions)
 
-	client.sio.emit('urchin-probe-positions', data.to_json_string())
+	session.emit_list('urchin-probe-positions', data)
 
 def set_angles(probes_list, angles_list):
 	"""Set probe azimuth/elevation/spin angles in degrees
@@ -239,21 +258,22 @@ def set_angles(probes_list, angles_list):
 	----------
 	probes_list : list of probe objects
 		list of probes being set
-	probe_angles : list of list of three floats
+	probe_angles : list of list of three floats, or (n, 3) numpy array
 		value is list of floats in az/elev/spin	
 		
 	Examples
 	--------
 	>>> urchin.probes.set_angles(probes,[[-90,0,0],[0,30,0]])
 	"""
-	angles_list = utils.sanitize_list(angles_list, len(probes_list))
+	session = client.session_of(probes_list)
+	angles = utils.sanitize_float_array(angles_list, len(probes_list), 3, np.float64)
 
-	data = IDListVector3List(
-		ids = [x.data.id for x in probes_list],
-		values= [utils.formatted_vector3(angle) for angle in angles_list]
-	)
+	for probe, (x, y, z) in zip(probes_list, angles.tolist()):
+		probe.data.angles = Vector3.model_construct(x = x, y = y, z = z)
 
-	client.sio.emit('urchin-probe-angles', data.to_json_string())
+	data = serializers.ArrayList(IDListVector3List, [x.data.id for x in probes_list], angles)
+
+	session.emit_list('urchin-probe-angles', data)
 
 # def set_probe_styles(probes_list,styles_list):
 # 	"""Set probe rendering style
@@ -294,18 +314,19 @@ def set_scales(probes_list, scales_list):
 	----------
 	probes_list: list of probe objects
 		list of probe sizes being set
-	scales_list: list of list of three floats
+	scales_list: list of list of three floats, or (n, 3) numpy array
 		list of floats for width, height, depth for each probe
 		
 	Examples
 	--------
 	>>> urchin.probes.set_scales(probes,[[0.070, 3.840, 0.020],[0.070, 3.840, 0.020]])
 	"""
-	scales_list = utils.sanitize_list(scales_list, len(probes_list))
+	session = client.session_of(probes_list)
+	scales = utils.sanitize_float_array(scales_list, len(probes_list), 3, np.float64)
+
+	for probe, (x, y, z) in zip(probes_list, scales.tolist()):
+		probe.data.scale = Vector3.model_construct(x = x, y = y, z = z)
 
-	data = IDListVector3List(
-		ids = [x.data.id for x in probes_list],
-		values= [utils.formatted_vector3(scale) for scale in scales_list]
-	)
+	data = serializers.ArrayList(IDListVector3List, [x.data.id for x in probes_list], scales)
 
-	client.sio.emit('urchin-probe-scales', data.to_json_string())
\ No newline at end of file
+	session.emit_list('urchin-probe-scales', data)
\ No newline at end of file
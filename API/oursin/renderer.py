@@ -11,7 +11,7 @@ except ImportError:
 	# You are not running in a Jupyter Notebook
 	pass
 
-from . import camera, client, custom, lines, meshes, particles, probes, text, texture, ui, utils, volumes
+from . import camera, client, custom, lines, meshes, metrics, particles, probes, text, texture, ui, utils, volumes
 
 def is_running_in_colab():
 	return notebook and 'google.colab' in str(get_ipython())
@@ -32,13 +32,69 @@ def setup(localhost = False, standalone = False, id = None):
 		return
 	
 	if id is not None:
-		client.ID = id
+		client.current().ID = id
 
 	if localhost:
 		client.sio.connect('http://localhost:5000')
 	else:
 		client.sio.connect('https://urchin-commserver.herokuapp.com/')
 
+	_open_viewer(standalone)
+
+	# Set up the main camera
+	camera.setup()
+
+async def setup_async(localhost = False, standalone = False, id = None, max_pending = 64):
+	"""Connect to the renderer with an asyncio client, for use inside an event loop
+
+	Messages are sent from the event loop instead of blocking the caller. Synchronous setters
+	queue their messages for a single sender task. Called from other threads they wait while
+	max_pending messages are queued. Called from the event loop they can't wait, so call
+	`await urchin.drain()` regularly to keep memory bounded when the server is slower than your
+	data pipeline.
+
+	Parameters
+	----------
+	localhost : bool, optional
+		connect to a local development server rather than the remote server, by default False
+	standalone : bool, optional
+		connect to a standalone Desktop build rather than the web-based Brain Viewer, by default False
+	id : string, optional
+		ID to connect with, by default a random ID
+	max_pending : int, optional
+		messages that can wait to be sent before senders wait, by default 64
+
+	Examples
+	--------
+	>>> await urchin.setup_async()
+	>>> async for frame in pipeline():
+	>>> 	particles.set_positions(frame)
+	>>> 	await urchin.drain()
+	"""
+	if client.connected():
+		print(f'(urchin) Client is already connected. Use ID: {client.ID}')
+		return
+
+	if id is not None:
+		client.current().ID = id
+
+	if localhost:
+		await client.connect_async('http://localhost:5000', max_pending)
+	else:
+		await client.connect_async('https://urchin-commserver.herokuapp.com/', max_pending)
+
+	_open_viewer(standalone)
+
+	# Set up the main camera
+	camera.setup()
+
+async def drain():
+	"""Wait until every message has been sent, when connected with urchin.setup_async
+	"""
+	client.flush()
+	await client.drain()
+
+def _open_viewer(standalone):
 	if not standalone:
 		#To open browser window:
 		url = f'https://data.virtualbrainlab.org/Urchin/?ID={client.ID}'
@@ -52,8 +108,77 @@ def setup(localhost = False, standalone = False, id = None):
 			# Display the JavaScript code to open the new window
 			display(Javascript(javascript_code))
 
-	# Set up the main camera
-	camera.setup()
+######################
+# QUEUE #
+######################
+
+def queue(enabled = True, tick = 1/30):
+	"""Queue outgoing messages instead of sending each one immediately
+
+	While queueing, repeated changes to the same object are merged and only its latest state is sent.
+	Messages are sent every tick, or when calling urchin.flush()
+
+	Parameters
+	----------
+	enabled : bool, optional
+		by default True, set to False to send messages immediately again
+	tick : float, optional
+		seconds between automatic flushes, None to only send on urchin.flush(), by default 1/30
+
+	Examples
+	--------
+	>>> urchin.queue(tick = None)
+	>>> for i in range(100):
+	>>> 	mesh.set_position([i, 0, 0])
+	>>> urchin.flush() # sends a single position update
+	"""
+	client.set_queue(enabled, tick)
+
+def flush():
+	"""Send all queued messages now, see urchin.queue
+	"""
+	client.flush()
+
+def batch():
+	"""Defer every change made inside a `with` block and send them together when it exits
+
+	Each object sends its latest state once, and bulk setters (e.g. urchin.meshes.set_positions)
+	called several times are merged into a single message per endpoint.
+
+	Examples
+	--------
+	>>> with urchin.batch():
+	>>> 	neurons = urchin.meshes.create(1000)
+	>>> 	urchin.meshes.set_positions(neurons, positions)
+	>>> 	urchin.meshes.set_colors(neurons, colors)
+	"""
+	return client.batch()
+
+######################
+# METRICS #
+######################
+
+def stats(clear = False):
+	"""Message counts, bytes, and serialize/emit timing per event, see urchin.metrics
+
+	Metrics are only recorded after calling urchin.metrics.enable()
+
+	Parameters
+	----------
+	clear : bool, optional
+		reset the metrics after reading them, by default False
+
+	Returns
+	-------
+	dict
+
+	Examples
+	--------
+	>>> urchin.metrics.enable()
+	>>> urchin.meshes.create(1000)
+	>>> urchin.stats()['urchin-meshes-update']['serialize']['mean']
+	"""
+	return metrics.stats(clear)
 
 ######################
 # CLEAR #
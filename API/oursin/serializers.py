@@ -0,0 +1,222 @@
+"""Wire formats for messages sent to the renderer
+
+'json'      vbl_aquarium JSON, understood by every renderer
+'packed'    bulk ids/values models as little-endian binary, see pack()
+'msgpack'   bulk ids/values models as MessagePack, requires `pip install msgpack`
+
+Only the bulk list models (e.g. IDListVector3List, ColorList) change format, every other model is
+always sent as JSON. The formats a renderer understands are negotiated when connecting, see
+client.Session. Hot bulk setters send an ArrayList instead of a model, which encodes the same
+payload straight from a validated array.
+"""
+import struct
+
+import numpy as np
+import pydantic_core
+from vbl_aquarium.models.generic import (IDListVector3List, IDListVector2List, IDListColorList,
+                                         IDListFloatList, FloatList, ColorList, Vector3List)
+
+# preferred first
+FORMATS = ['packed', 'msgpack', 'json']
+
+# floats per value for the bulk list models
+WIDTHS = {
+    IDListVector3List: 3,
+    IDListVector2List: 2,
+    IDListColorList: 4,
+    IDListFloatList: 1,
+    Vector3List: 3,
+    ColorList: 4,
+    FloatList: 1,
+}
+
+_FIELDS = {1: None, 2: 'xy', 3: 'xyz', 4: 'rgba'}
+
+MAGIC = b'URNP'
+
+def available():
+    """Formats this install can encode
+
+    Returns
+    -------
+    list of string
+        in order of preference
+    """
+    formats = ['packed']
+    try:
+        import msgpack
+        formats.append('msgpack')
+    except ImportError:
+        pass
+    formats.append('json')
+    return formats
+
+def choose(formats):
+    """Pick the preferred format that both sides support
+
+    Parameters
+    ----------
+    formats : list of string
+        formats the renderer reported
+
+    Returns
+    -------
+    string
+    """
+    for format in available():
+        if format in formats:
+            return format
+    return 'json'
+
+def encode(model, format = 'json'):
+    """Serialize a model in a wire format
+
+    Parameters
+    ----------
+    model : vbl_aquarium model
+    format : string, optional
+        see FORMATS, by default 'json'
+
+    Returns
+    -------
+    str for JSON, bytes for the binary formats
+    """
+    if format == 'json' or type(model) not in WIDTHS and not isinstance(model, ArrayList):
+        return model.to_json_string()
+
+    if format == 'packed':
+        if isinstance(model, ArrayList):
+            return pack_arrays(model.ids, model.values)
+        return pack(model)
+
+    if format == 'msgpack':
+        import msgpack
+        payload = model.payload() if isinstance(model, ArrayList) else model.model_dump(by_alias = True)
+        return msgpack.packb(payload, use_single_float = True)
+
+    raise ValueError(f'Unknown format {format}, should be one of {FORMATS}')
+
+class ArrayList:
+    """Bulk list message built from an array that was validated as a whole
+
+    Serializes exactly like the model it stands in for, e.g. IDListVector3List(ids, values), without
+    building and validating a Vector3/Color per element.
+    """
+    def __init__(self, model, ids, values):
+        """
+        Parameters
+        ----------
+        model : type
+            bulk list model this stands in for, see WIDTHS
+        ids : list of string
+            ids, or a single id for models like ColorList
+        values : numpy array
+            (n,) or (n, width) float64 values, see utils.sanitize_float_array
+        """
+        self.model = model
+        self.ids = ids
+        self.values = values
+
+    def merge(self, other):
+        """Concatenate another ArrayList of the same model, see client.Session.emit_list
+
+        Returns
+        -------
+        ArrayList, or None if the two can't be merged
+        """
+        if not isinstance(other, ArrayList) or other.model is not self.model or 'ids' not in self.model.model_fields:
+            return None
+        return ArrayList(self.model, self.ids + other.ids, np.concatenate((self.values, other.values)))
+
+    def payload(self):
+        """Same dict as model.model_dump(by_alias = True)"""
+        width = WIDTHS[self.model]
+        values = self.values.tolist()
+        # literal dicts are about twice as fast as dict(zip(fields, value))
+        if width == 2:
+            values = [{'x': x, 'y': y} for x, y in values]
+        elif width == 3:
+            values = [{'x': x, 'y': y, 'z': z} for x, y, z in values]
+        elif width == 4:
+            values = [{'r': r, 'g': g, 'b': b, 'a': a} for r, g, b, a in values]
+
+        if 'ids' in self.model.model_fields:
+            return {'IDs': self.ids, 'Values': values}
+        return {'ID': self.ids, 'Values': values}
+
+    def to_json_string(self):
+        return pydantic_core.to_json(self.payload()).decode()
+
+def pack(model):
+    """Pack a bulk list model as binary
+
+    Layout, little-endian:
+
+        4s      magic 'URNP'
+        uint32  number of ids
+        uint32  floats per value
+        uint32  length of the ids block in bytes
+        bytes   ids as UTF-8, separated by newlines
+        float32 values, row-major
+
+    Single-id models (e.g. FloatList) have one id.
+
+    Parameters
+    ----------
+    model : bulk list model, see WIDTHS
+
+    Returns
+    -------
+    bytes
+    """
+    width = WIDTHS[type(model)]
+    ids = model.ids if hasattr(model, 'ids') else [model.id]
+    values = values_array(model.values, width)
+
+    return pack_arrays(ids, values)
+
+def pack_arrays(ids, values):
+    """Pack ids and a float array directly, without building a model
+
+    Parameters
+    ----------
+    ids : list of string, or string for single-id models
+    values : numpy array
+        (n,) or (n, width) values
+
+    Returns
+    -------
+    bytes
+    """
+    if isinstance(ids, str):
+        ids = [ids]
+    values = np.ascontiguousarray(values, dtype = np.float32)
+    width = 1 if values.ndim == 1 else values.shape[1]
+    id_bytes = '\n'.join(ids).encode('utf-8')
+
+    return b''.join((struct.pack('<4sIII', MAGIC, len(ids), width, len(id_bytes)), id_bytes, values.tobytes()))
+
+def unpack(data):
+    """Inverse of pack
+
+    Returns
+    -------
+    (list of string, numpy array)
+        ids, and an (n,) or (n, width) float32 array of values
+    """
+    magic, n_ids, width, n_id_bytes = struct.unpack_from('<4sIII', data)
+    if magic != MAGIC:
+        raise ValueError('Not a packed message')
+
+    start = struct.calcsize('<4sIII')
+    ids = data[start:start + n_id_bytes].decode('utf-8').split('\n') if n_ids > 0 else []
+    values = np.frombuffer(data, dtype = np.float32, offset = start + n_id_bytes)
+
+    return ids, values if width == 1 else values.reshape(-1, width)
+
+def values_array(values, width):
+    """Convert a list of floats or Vector2/Vector3/Color models to a float32 array"""
+    fields = _FIELDS[width]
+    if fields is None:
+        return np.asarray(values, dtype = np.float32)
+    return np.array([[getattr(value, field) for field in fields] for value in values], dtype = np.float32).reshape(-1, width)
@@ -0,0 +1,253 @@
+"""Local stand-in for the Urchin comm server
+
+Relays messages between clients that log in with the same ID, like the comm server, and records
+the size and arrival time of every message. Optionally answers screenshot requests with synthetic
+images, so the API can be benchmarked and tested without a network or a Unity build.
+
+	python -m oursin.server --port 5000 --screenshots --record messages.jsonl
+
+then connect with `urchin.setup(localhost = True, standalone = True)`.
+"""
+import argparse
+import collections
+import io
+import json
+import socketserver
+import threading
+import time
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+import numpy as np
+import socketio
+from engineio.payload import Payload
+from PIL import Image
+
+from .metrics import payload_size
+
+# a long-polling request can carry many queued messages
+Payload.max_decode_packets = 100000
+
+# bytes per CameraImg message when answering screenshot requests
+SCREENSHOT_CHUNK = 100000
+
+class Server:
+	"""Socket.io relay and recorder
+
+	Attributes
+	----------
+	stats : dict
+		{event: {'count': int, 'bytes': int}} for every message received
+	records : list of tuple
+		(time, event, n_bytes) for every message received, when record is True
+	"""
+	def __init__(self, screenshots = False, record = False, verbose = False, formats = None, binary_images = False, features = None):
+		"""
+		Parameters
+		----------
+		screenshots : bool, optional
+			answer 'urchin-camera-screenshot-request' with a synthetic PNG, by default False
+		record : bool, optional
+			keep a (time, event, n_bytes) record of every message, by default False
+		verbose : bool, optional
+			print every message, by default False
+		formats : list of string, optional
+			answer 'urchin-capabilities' like a renderer that understands these wire formats, see
+			oursin.serializers, by default None (don't answer, clients keep sending JSON)
+		binary_images : bool, optional
+			send screenshot chunks as binary attachments instead of JSON lists of ints, by default False
+		features : list of string, optional
+			optional renderer features to report with the formats, e.g. 'atlas-delta', by default None
+		"""
+		self.screenshots = screenshots
+		self.formats = formats
+		self.features = features
+		self.binary_images = binary_images
+		self.record = record
+		self.verbose = verbose
+
+		self.stats = collections.defaultdict(lambda: {'count': 0, 'bytes': 0})
+		self.records = []
+		self.ids = {}
+		self._lock = threading.Lock()
+		self._httpd = None
+
+		# websocket upgrades need a server with raw socket access, the wsgiref server uses long-polling
+		self.sio = socketio.Server(async_mode = 'threading', allow_upgrades = False,
+								   max_http_buffer_size = 1 << 30)
+		self.app = socketio.WSGIApp(self.sio)
+
+		self.sio.on('connect', self._on_connect)
+		self.sio.on('disconnect', self._on_disconnect)
+		self.sio.on('ID', self._on_id)
+		self.sio.on('*', self._on_message)
+
+	def start(self, host = '127.0.0.1', port = 5000):
+		"""Serve from a background thread
+
+		Parameters
+		----------
+		host : string, optional
+			by default '127.0.0.1'
+		port : int, optional
+			0 picks a free port, by default 5000
+
+		Returns
+		-------
+		string
+			url to connect to
+		"""
+		self._httpd = make_server(host, port, self.app, server_class = _ThreadingWSGIServer,
+								  handler_class = _QuietHandler)
+		threading.Thread(target = self._httpd.serve_forever, daemon = True).start()
+		return f'http://{host}:{self._httpd.server_port}'
+
+	def stop(self):
+		"""Stop serving, open connections are dropped like a network failure so clients try to reconnect
+		"""
+		for socket in list(self.sio.eio.sockets.values()):
+			socket.close(wait = False, abort = True)
+
+		if self._httpd is not None:
+			self._httpd.shutdown()
+			self._httpd.server_close()
+			self._httpd = None
+
+	def serve_forever(self, host = '127.0.0.1', port = 5000):
+		self._httpd = make_server(host, port, self.app, server_class = _ThreadingWSGIServer,
+								  handler_class = _QuietHandler)
+		self._httpd.serve_forever()
+
+	def summary(self):
+		"""Message counts and sizes per event, largest first
+
+		Returns
+		-------
+		string
+		"""
+		lines = [f'{"event":40s} {"count":>10s} {"bytes":>14s}']
+		for event, stat in sorted(self.stats.items(), key = lambda item: -item[1]['bytes']):
+			lines.append(f'{event:40s} {stat["count"]:10d} {stat["bytes"]:14d}')
+		return '\n'.join(lines)
+
+	def _on_connect(self, sid, environ):
+		if self.verbose:
+			print(f'(server) {sid} connected')
+
+	def _on_disconnect(self, sid):
+		self.ids.pop(sid, None)
+		if self.verbose:
+			print(f'(server) {sid} disconnected')
+
+	def _on_id(self, sid, data):
+		"""Login handshake, see client.change_id: [ID, "send"] from Python, [ID, "receive"] from a renderer
+		"""
+		self._count('ID', data)
+
+		for room in self.sio.rooms(sid):
+			if room != sid:
+				self.sio.leave_room(sid, room)
+
+		self.ids[sid] = data[0]
+		self.sio.enter_room(sid, data[0])
+		if self.verbose:
+			print(f'(server) {sid} logged in to {data[0]} as {data[1]}')
+
+	def _on_message(self, event, sid, *args):
+		"""Relay to every other client with the same ID
+		"""
+		self._count(event, args)
+
+		if self.screenshots and event == 'urchin-camera-screenshot-request':
+			self._screenshot(sid, args[0])
+
+		if (self.formats is not None or self.features is not None) and event == 'urchin-capabilities':
+			self.sio.emit('urchin-capabilities', json.dumps({'role': 'renderer', 'formats': self.formats or ['json'],
+															 'features': self.features or []}), to = sid)
+
+		if sid in self.ids:
+			data = args[0] if len(args) == 1 else args
+			self.sio.emit(event, data, room = self.ids[sid], skip_sid = sid)
+
+	def _count(self, event, data):
+		n_bytes = payload_size(data)
+		with self._lock:
+			stat = self.stats[event]
+			stat['count'] += 1
+			stat['bytes'] += n_bytes
+			if self.record:
+				self.records.append((time.perf_counter(), event, n_bytes))
+
+		if self.verbose:
+			print(f'(server) {event} {n_bytes} bytes')
+
+	def _screenshot(self, sid, request):
+		"""Send a gradient PNG back the same way the renderer sends screenshots, or raw pixels
+		when the request asks for a "Format" like 'rgba'
+		"""
+		request = json.loads(request)
+		name = request['ID']
+		width, height = int(request['Value']['x']), int(request['Value']['y'])
+
+		gradient = np.linspace(0, 255, max(width, 1), dtype = np.uint8)
+		image = Image.fromarray(np.ascontiguousarray(np.broadcast_to(gradient, (height, width))))
+		meta = {}
+		if 'Format' in request:
+			# rows top to bottom
+			png = image.convert(request['Format'].upper()).tobytes()
+			meta = {'width': width, 'height': height, 'format': request['Format']}
+		else:
+			buffer = io.BytesIO()
+			image.save(buffer, format = 'PNG')
+			png = buffer.getvalue()
+
+		# echo the request id, when the client sent one
+		reply = {'name': name}
+		if 'Request' in request:
+			reply['request'] = request['Request']
+
+		self.sio.emit('CameraImgMeta', json.dumps({**reply, **meta, 'totalBytes': len(png)}), to = sid)
+		for start in range(0, len(png), SCREENSHOT_CHUNK):
+			chunk = png[start:start + SCREENSHOT_CHUNK]
+			if self.binary_images:
+				self.sio.emit('CameraImg', (json.dumps({**reply, 'offset': start}), chunk), to = sid)
+			else:
+				self.sio.emit('CameraImg', json.dumps({**reply, 'data': list(chunk)}), to = sid)
+
+class _ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+	# long-polling holds a request open while the client posts on another
+	daemon_threads = True
+
+class _QuietHandler(WSGIRequestHandler):
+	def log_message(self, format, *args):
+		pass
+
+def main():
+	parser = argparse.ArgumentParser(description = 'Local stand-in for the Urchin comm server')
+	parser.add_argument('--host', default = '127.0.0.1')
+	parser.add_argument('--port', type = int, default = 5000)
+	parser.add_argument('--screenshots', action = 'store_true', help = 'answer screenshot requests with synthetic images')
+	parser.add_argument('--binary-images', action = 'store_true', help = 'send screenshot chunks as binary attachments')
+	parser.add_argument('--record', help = 'write a JSON line per message (time, event, bytes) to this file on exit')
+	parser.add_argument('--verbose', action = 'store_true', help = 'print every message')
+	parser.add_argument('--formats', help = 'comma-separated wire formats to report, e.g. packed,json')
+	parser.add_argument('--features', help = 'comma-separated renderer features to report, e.g. atlas-delta')
+	args = parser.parse_args()
+
+	formats = None if args.formats is None else args.formats.split(',')
+	features = None if args.features is None else args.features.split(',')
+	server = Server(screenshots = args.screenshots, record = args.record is not None, verbose = args.verbose,
+					formats = formats, binary_images = args.binary_images, features = features)
+	print(f'(server) listening on http://{args.host}:{args.port}')
+	try:
+		server.serve_forever(args.host, args.port)
+	except KeyboardInterrupt:
+		pass
+
+	print(server.summary())
+	if args.record is not None:
+		with open(args.record, 'w') as file:
+			for t, event, n_bytes in server.records:
+				file.write(json.dumps({'time': t, 'event': event, 'bytes': n_bytes}) + '\n')
+
+if __name__ == '__main__':
+	main()
@@ -7,22 +7,28 @@ from vbl_aquarium.models.generic import IDData, IDListStringList, IDListColorLis
 
 ## Text renderer
 
-counter = 0
-texts = []
+def __getattr__(name):
+  # the text objects created in the current session, see client.Session
+  if name == 'texts':
+    return client.current().objects['texts']
+  if name == 'counter':
+    return client.current().counters['texts']
+
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def clear():
     """Clear all custom meshes
     """
-    global texts
+    texts = client.current().objects['texts']
     for text in texts:
       text.delete()
 
-    texts = []
+    texts.clear()
 
 class Text:
   def __init__(self, text = "", color = [1, 1, 1], font_size = 12, position = [0,0]):
-    global counter, texts
-    counter +=1
+    self.session = client.current()
+    counter = self.session.count('texts')
 
     self.data = TextModel(
       id = f't{counter}',
@@ -35,12 +41,12 @@ class Text:
     self._update()
     self.in_unity = True
 
-    texts.append(self)
+    self.session.objects['texts'].append(self)
 
   def _update(self):
     """Send serialized data to update this text object in Urchin
     """
-    client.sio.emit('urchin-text-update', self.data.to_json_string())
+    self.session.emit('urchin-text-update', self.data.to_json_string, id = self.data.id)
   
   def delete(self):
     """Delete a text object
@@ -49,7 +55,7 @@ class Text:
     --------
     >>> t1.delete()
     """
-    client.sio.emit('urchin-text-delete', IDData(id=self.data.id).to_json_string())
+    self.session.emit('urchin-text-delete', IDData(id=self.data.id).to_json_string)
     self.in_unity = False
 
   def set_text(self, text):
@@ -151,6 +157,7 @@ def set_texts(text_list, str_list):
   str_list : _type_
       _description_
   """
+  session = client.session_of(text_list)
   str_list = utils.sanitize_list(str_list, len(text_list))
 
   for text, str, in zip(text_list, str_list):
@@ -161,7 +168,7 @@ def set_texts(text_list, str_list):
     values= [string for string in str_list]
   )
 
-  client.sio.emit('urchin-text-texts', data.to_json_string())
+  session.emit_list('urchin-text-texts', data)
 
 def set_positions(text_list, pos_list):
   """Set the positions of multiple text objects
@@ -175,6 +182,7 @@ def set_positions(text_list, pos_list):
   pos_list : list of float
       [0,0] top left [1,1] bottom right
   """
+  session = client.session_of(text_list)
   pos_list = utils.sanitize_list(pos_list, len(text_list))
   
   for text, pos, in zip(text_list, pos_list):
@@ -185,7 +193,7 @@ def set_positions(text_list, pos_list):
     values = [text.data.position for text in text_list]
   )
 
-  client.sio.emit('urchin-text-positions', data.to_json_string())
+  session.emit_list('urchin-text-positions', data)
 
 def set_font_sizes(text_list, font_size_list):
   """_summary_
@@ -197,6 +205,7 @@ def set_font_sizes(text_list, font_size_list):
   font_size_list : _type_
       _description_
   """
+  session = client.session_of(text_list)
 
   font_size_list = utils.sanitize_list(font_size_list, len(text_list))
   
@@ -208,7 +217,7 @@ def set_font_sizes(text_list, font_size_list):
     values= [text.data.font_size for text in text_list]
   )
   
-  client.sio.emit('urchin-text-sizes', data.to_json_string())
+  session.emit_list('urchin-text-sizes', data)
 
 def set_colors(text_list, color_list):
   """_summary_
@@ -220,6 +229,7 @@ def set_colors(text_list, color_list):
   color_list : _type_
       _description_
   """
+  session = client.session_of(text_list)
   color_list = utils.sanitize_list(color_list, len(text_list))
 
   for text, color, in zip(text_list, color_list):
@@ -230,4 +240,4 @@ def set_colors(text_list, color_list):
     values= [text.data.color for text in text_list]
   )
   
-  client.sio.emit('urchin-text-colors', data.to_json_string())
\ No newline at end of file
+  session.emit_list('urchin-text-colors', data)
\ No newline at end of file
@@ -12,30 +12,39 @@ receive_data = []
 
 CHUNK_SIZE = 100000000
 
-counter = 0
-textures = []
+def __getattr__(name):
+    # the textures created in the current session, see client.Session
+    if name == 'textures':
+        return client.current().objects['textures']
+    if name == 'counter':
+        return client.current().counters['textures']
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def clear():
     """Clear all custom meshes
     """
-    global textures
+    textures = client.current().objects['textures']
 
     for texture in textures:
         texture.delete()
 
-    textures = []
+    textures.clear()
 
 class Texture:
     def __init__(self, position=None, offset=None, texture_file=None):
-        global textures 
-        
+        self.session = client.current()
+        self.position = None
+        self.offset = None
+        self.image = None
+
         self.create()
 
         if position: self.set_position(position)
         if offset: self.set_offset(offset)
         if texture_file: self.set_image(texture_file)
 
-        textures.append(self)
+        self.session.objects['textures'].append(self)
 
     def create(self):
         """Creates Textures
@@ -47,10 +56,8 @@ class Texture:
         Examples
         >>> tex = urchin.texture.Texture()
         """
-        global counter
-        counter += 1
-        self.id = 'tex' + str(counter)
-        client.sio.emit('CreateFOV',[self.id])
+        self.id = 'tex' + str(self.session.count('textures'))
+        self.session.emit('CreateFOV',[self.id])
         self.in_unity = True
 
     def delete(self):
@@ -63,9 +70,23 @@ class Texture:
         Examples
         >>> tex.delete()
         """
-        client.sio.emit('DeleteFOV',[self.id])
+        self.session.emit('DeleteFOV',[self.id])
         self.in_unity = False
 
+    def _replay(self, recreate):
+        """Re-send this texture after reconnecting, see client.Session.replay
+
+        The renderer can't create an FOV twice, so it is only created again when the renderer lost its scene.
+        """
+        if recreate:
+            self.session.emit('CreateFOV',[self.id])
+        if self.position is not None:
+            self.session.emit('SetFOVPos',{self.id: self.position}, id = self.id)
+        if self.offset is not None:
+            self.session.emit('SetFOVOffset', {self.id: self.offset}, id = self.id)
+        if self.image is not None:
+            self._send_image(self.image)
+
     def set_position(self,positions):
         """Set the position of fov in ap/ml/dv coordinates relative to the CCF (0,0,0) point
 
@@ -88,7 +109,7 @@ class Texture:
             positions[i] = utils.sanitize_vector3(pos)
 
         self.position = utils.sanitize_list(positions)
-        client.sio.emit('SetFOVPos',{self.id: positions})
+        self.session.emit('SetFOVPos',{self.id: positions}, id = self.id)
     
     def set_image(self, array):
         """Set the image data for texture
@@ -105,6 +126,10 @@ class Texture:
         if self.in_unity == False:
             raise Exception("Texture does not exist in Unity, call create method first.")
 
+        self.image = array
+        self._send_image(array)
+
+    def _send_image(self, array):
         # texture_file = utils.sanitize_string(texture_file)
         # self.texture_file=texture_file
 
@@ -115,14 +140,14 @@ class Texture:
         # Split bytes into chunks
         chunks = [img_bytes]
             
-        client.sio.emit('SetFOVTextureDataMetaInit', [self.id, len(chunks), array.shape[0], array.shape[1], 'array'])
+        self.session.emit('SetFOVTextureDataMetaInit', [self.id, len(chunks), array.shape[0], array.shape[1], 'array'])
 
         # Send img by chunk
         # [TODO: Replace with a data structure]
         for i,chunk in enumerate(chunks):
             immediate_apply = True if i==len(chunks)-1 else False
-            client.sio.emit('SetFOVTextureDataMeta', [self.id,i,immediate_apply])
-            client.sio.emit('SetFOVTextureData',chunk)
+            self.session.emit('SetFOVTextureDataMeta', [self.id,i,immediate_apply])
+            self.session.emit('SetFOVTextureData',chunk)
 
     def set_offset(self, offset):
         """Set the vertical offset for this texture
@@ -132,7 +157,8 @@ class Texture:
         offset : float
             Vertical offset in mm
         """
-        client.sio.emit('SetFOVOffset', {self.id: offset})
+        self.offset = offset
+        self.session.emit('SetFOVOffset', {self.id: offset}, id = self.id)
 
 
 def create(N):
@@ -166,6 +192,7 @@ def delete(textures_list):
     >>> urchin.fovs.delete(textures_list)
     """
     textures_list = utils.sanitize_list(textures_list)
+    session = client.session_of(textures_list)
     for tex in textures_list:
         if tex.in_unity:
             tex.delete()
@@ -173,7 +200,7 @@ def delete(textures_list):
             warnings.warn(f"fov with id {tex.id} does not exist in Unity, call create method first.")
 
     fovs_ids = [x.id for x in textures_list]
-    client.sio.emit('DeleteFOVs', fovs_ids)
+    session.emit('DeleteFOVs', fovs_ids)
 
 def set_positions(textures_list, positions_list):
     """Set the positions of textures in ap/ml/dv coordinates relative to the CCF (0,0,0) point
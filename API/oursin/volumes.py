@@ -1,20 +1,41 @@
 """Volumetric datasets (x*y*z matrix)"""
 
 from . import client
+from . import metrics
 from . import utils
 import numpy as np
 import zlib
 import json
 import csv
 import base64
+import collections
+import os
+from concurrent.futures import ThreadPoolExecutor
 
+from vbl_aquarium.models.unity import Color
 from vbl_aquarium.models.urchin import VolumeMetaModel, VolumeDataChunk
 
-counter = 0
-volumes = []
+def __getattr__(name):
+	# the volumes created in the current session, see client.Session
+	if name == 'volumes':
+		return client.current().objects['volumes']
+	if name == 'counter':
+		return client.current().counters['volumes']
+
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 CHUNK_LIMIT = 1000000
 
+# Upload volumes as independently compressed binary slabs, requires a renderer with streaming support
+streaming = False
+# Streaming codec: 'zlib', 'lz4', 'zstd', or 'none'. lz4 and zstd need `pip install lz4` / `pip install zstandard`,
+# and a renderer that decodes them, the Unity renderer decodes zlib and none
+codec = 'zlib'
+# Compression level, lower is faster. None uses the codec default
+level = 1
+# Number of compression threads, None uses the number of processors
+n_workers = None
+
 click_list = []
 verbose = False
 
@@ -60,12 +81,12 @@ def save_clicks(fpath):
 def clear():
 		"""Clear all custom meshes
 		"""
-		global volumes
+		volumes = client.current().objects['volumes']
 		
 		for volume in volumes:
 			volume.delete()
 
-		volumes = []
+		volumes.clear()
 
 class Volume:
 	"""Volumetric dataset represented in a compressed format by using a colormap to translate
@@ -74,35 +95,54 @@ class Volume:
 	Volumes should be created in (AP, ML, DV)
 	"""
 	def __init__(self, volume_data, colormap = None):
-		"""_summary_
+		"""Create a volume and upload its data
+
+		The input array is not modified.
 
 		Parameters
 		----------
-		volume_data : _type_
-			_description_
-		colormap : _type_, optional
-			_description_, by default None
+		volume_data : numpy array
+			(AP, ML, DV) uint8 data, NaN values are sent as 255 (transparent)
+		colormap : list of colors or numpy array, optional
+			colors used to map the uint8 data, see urchin.volumes.colormap and colormap_lut, by default all black
 		"""
-		global counter, volumes
-		self.id = f'volume{counter}'
-		counter += 1
-
-		volume_data[np.isnan(volume_data)] = 255
-
-		flattened_data = volume_data.flatten().astype(np.uint8).tobytes()
-		compressed_data = zlib.compress(flattened_data)
-		compressed_data = base64.b64encode(compressed_data).decode('utf-8')
+		self.session = client.current()
+		self.id = f'volume{self.session.count("volumes")}'
 
 		if colormap is None:
 			colormap = ['#000000'] * 255
-		
+
 		self.data = VolumeMetaModel(
-			name = f'volume{counter}',
-			n_bytes = len(compressed_data),
-			colormap = [utils.formatted_color(color) for color in colormap],
+			name = self.id,
+			n_bytes = 0,
+			colormap = _format_colormap(colormap),
 			visible = True
 		)
 
+		self.shape = np.shape(volume_data)
+		# current uint8 data, kept up to date by update_region and re-sent by _replay
+		self._volume = _to_uint8(volume_data)
+		if np.may_share_memory(self._volume, volume_data):
+			self._volume = self._volume.copy()
+		self._streamed = streaming
+		self.in_unity = True
+
+		if streaming:
+			self._stream(self._volume)
+		else:
+			self._send(self._volume)
+			
+		self.session.objects['volumes'].append(self)
+
+	def _send(self, volume_data):
+		"""Send the whole volume as one base64 zlib stream, split into 1MB messages
+		"""
+		with metrics.measure('volume-compress'):
+			compressed_data = zlib.compress(_to_uint8(volume_data).tobytes())
+		with metrics.measure('volume-base64'):
+			compressed_data = base64.b64encode(compressed_data).decode('utf-8')
+
+		self.data.n_bytes = len(compressed_data)
 		self.update()
 
 		# send data packets
@@ -116,47 +156,251 @@ class Volume:
 
 			chunk_data = VolumeDataChunk(
 				name = self.data.name,
-				# bytes = base64.b64encode(compressed_data[offset : offset + chunk_size]).decode('utf-8')
 				bytes = compressed_data[offset : offset + chunk_size]
-
 			)
-			client.sio.emit('SetVolumeData', chunk_data.to_json_string())
+			self.session.emit('SetVolumeData', chunk_data.to_json_string, barrier = False)
 
 			offset += chunk_size
-			
-		volumes.append(self)
+
+	def _stream(self, volume_data):
+		"""Send the volume as slabs along the AP axis, compressed in parallel and sent as raw binary
+
+		Each slab is converted to uint8 and compressed on its own, so at most a few slabs are held in
+		memory at once. Slabs are sent in order as soon as they are ready.
+		"""
+		self.data.n_bytes = int(np.size(volume_data))
+		self.update()
+
+		self._send_region((0, 0, 0), volume_data)
+
+	def _send_region(self, offset, region):
+		"""Split a box of data into slabs along the AP axis, then compress and send them
+
+		Parameters
+		----------
+		offset : (ap, ml, dv) int
+			position of the box in the volume
+		region : numpy array
+		"""
+		region = np.asarray(region)
+		plane_bytes = int(np.prod(region.shape[1:]))
+		depth = max(1, CHUNK_LIMIT // max(plane_bytes, 1))
+
+		slabs = (((offset[0] + start, offset[1], offset[2]), region[start:start + depth])
+			for start in range(0, region.shape[0], depth))
+		for slab_offset, shape, compressed in _compress_slabs(slabs):
+			self._emit_slab(slab_offset, shape, compressed)
+
+	def _emit_slab(self, offset, shape, compressed):
+		header = json.dumps({
+			'Name': self.data.name,
+			'Offset': [int(x) for x in offset],
+			'Shape': [int(x) for x in shape],
+			'Codec': codec
+		})
+		self.session.emit('urchin-volume-slab', (header, compressed), barrier = False)
 
 	def update(self):
-		client.sio.emit('UpdateVolume', self.data.to_json_string())
+		self.session.emit('UpdateVolume', self.data.to_json_string, id = self.id)
+
+	def update_region(self, slices, data):
+		"""Replace part of the volume, only the changed box is compressed and sent
+
+		Works for streamed and non-streamed volumes, but requires a renderer with streaming support.
+		The input array is not modified.
+
+		Parameters
+		----------
+		slices : tuple of slice
+			(ap, ml, dv) box to replace, with a step of 1, e.g. np.s_[100:104, :, :]
+		data : numpy array
+			new uint8 data for the box, NaN values are sent as 255 (transparent). Broadcast to the box shape.
+
+		Examples
+		--------
+		>>> vol.update_region(np.s_[100:104, :, :], new_planes)
+		"""
+		if not isinstance(slices, tuple):
+			slices = (slices,)
+		if len(slices) > len(self.shape):
+			raise IndexError(f'Too many slices for a volume with {len(self.shape)} dimensions')
+		slices = slices + (slice(None),) * (len(self.shape) - len(slices))
+
+		offset = []
+		box_shape = []
+		for axis_slice, size in zip(slices, self.shape):
+			if isinstance(axis_slice, (int, np.integer)):
+				axis_slice = slice(axis_slice % size, axis_slice % size + 1)
+			start, stop, step = axis_slice.indices(size)
+			if step != 1:
+				raise ValueError('Volume regions must be contiguous (step 1)')
+			if stop <= start:
+				raise ValueError(f'Volume region {slices} is empty')
+			offset.append(start)
+			box_shape.append(stop - start)
+
+		box = tuple(slice(start, start + size) for start, size in zip(offset, box_shape))
+		self._volume[box] = _to_uint8(np.broadcast_to(np.asarray(data), box_shape))
+		self._send_region(offset, self._volume[box])
+
+	def _replay(self, recreate):
+		"""Re-send this volume and its current data after reconnecting, see client.Session.replay
+
+		Regions replaced with update_region are already part of the data, so the replay costs the
+		same as the first upload no matter how many updates were sent.
+		"""
+		if self._streamed:
+			self._stream(self._volume)
+		else:
+			self._send(self._volume)
 
 	def delete(self):
-		client.sio.emit('DeleteVolume', self.id)
+		self.session.emit('DeleteVolume', self.id)
+		self.in_unity = False
+		self._volume = None
 
-def compress_volume(volume_data, n_colors=254):
+def compress_volume(volume_data, n_colors=254, method='exact', n_samples=1000000):
 	"""Compress a volume of float data into a uint8 volume by quantiles.
 
 	NaN values are mapped to 255 (transparent) for Urchin.
 
 	This is required for use with the urchin.volume.Volume object type.
 
+	The volume is digitized slab by slab, so apart from the output only a small working copy is
+	held in memory. For multi-gigabyte volumes use the 'sample' or 'histogram' methods to
+	estimate the quantiles in bounded time and memory.
+
 	Parameters
 	----------
 	volume_data : float volume
 		3D matrix of float data
 	n_colors : int (optional)
 		Default to 254, number of un-reserved colors. 255 must always be reserved for NaN / transparency
+	method : string (optional)
+		How the quantiles are computed, by default 'exact'
+		- 'exact': np.quantile over all valid values
+		- 'sample': np.quantile over n_samples randomly chosen voxels
+		- 'histogram': inverse CDF of a 65536-bin histogram, built slab by slab
+	n_samples : int (optional)
+		Number of voxels used by the 'sample' method, by default 1000000
 
 	Returns
 	-------
 	(uint8 volume, float[] map)
 	"""
-	valid_values = volume_data[~np.isnan(volume_data)]
-	quantiles = np.quantile(valid_values.flatten(), np.linspace(0,1,n_colors))
+	volume_data = np.asarray(volume_data)
+	probabilities = np.linspace(0, 1, n_colors)
+
+	if method == 'exact' or (method == 'sample' and n_samples >= volume_data.size):
+		valid_values = volume_data[~np.isnan(volume_data)]
+		quantiles = np.quantile(valid_values, probabilities)
+	elif method == 'sample':
+		samples = volume_data.reshape(-1)[np.random.default_rng(0).integers(0, volume_data.size, n_samples)]
+		quantiles = np.quantile(samples[~np.isnan(samples)], probabilities)
+	elif method == 'histogram':
+		quantiles = _histogram_quantiles(volume_data, probabilities)
+	else:
+		raise Exception(f'Method {method} is not one of exact, sample, histogram')
+
+	# np.digitize(x, bins, right=True) is np.searchsorted(bins, x, side='left')
+	out = np.empty(volume_data.shape, dtype=np.uint8)
+	for sl in _slab_slices(volume_data):
+		slab = volume_data[sl]
+		out[sl] = np.where(np.isnan(slab), 255, np.searchsorted(quantiles, slab, side='left'))
+
+	return out, quantiles
+
+HISTOGRAM_BINS = 65536
+
+def _histogram_quantiles(volume_data, probabilities):
+	"""Estimate quantiles of the non-NaN values from a histogram, in two passes over the volume
+	"""
+	vmin = min(np.nanmin(volume_data[sl]) for sl in _slab_slices(volume_data))
+	vmax = max(np.nanmax(volume_data[sl]) for sl in _slab_slices(volume_data))
+
+	edges = np.linspace(vmin, vmax, HISTOGRAM_BINS + 1)
+	counts = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+	for sl in _slab_slices(volume_data):
+		slab = volume_data[sl]
+		# an int bin count with a range takes NumPy's fast path for uniform bins
+		counts += np.histogram(slab[~np.isnan(slab)], bins=HISTOGRAM_BINS, range=(vmin, vmax))[0]
+
+	cdf = np.concatenate(([0], np.cumsum(counts))) / counts.sum()
+	return np.interp(probabilities, cdf, edges)
+
+def _slab_slices(volume_data, max_elements = 16000000):
+	"""Slices along the first axis with at most max_elements each
+	"""
+	plane_size = max(int(np.prod(volume_data.shape[1:])), 1)
+	depth = max(1, max_elements // plane_size)
+	return [slice(start, start + depth) for start in range(0, volume_data.shape[0], depth)]
 
-	out = np.digitize(volume_data, quantiles, right=True).astype(np.uint8)
-	out[np.isnan(volume_data)] = 255
+def colormap_lut(colormap_name='greens', reserved_colors=[], datapoints=None):
+	"""Build the full 256 entry colormap lookup table as one array
+
+	indexes: 	[0->253-n_reserved, 	reserved colors, 	254: black, 	255: transparent]
+
+	Parameters
+	----------
+	colormap_name : str, list of colors, or callable, optional
+		- 'reds', 'greens', 'blues': 0->255 on one channel, by default 'greens'
+		- any matplotlib colormap name, e.g. 'viridis' (requires matplotlib)
+		- a list of hex or RGB colors, interpolated evenly from first to last
+		- a callable mapping an array of positions 0->1 to (n, 4) RGBA floats, e.g. a matplotlib Colormap
+	reserved_colors : list of colors, optional
+		colors placed after the colormap, by default []
+	datapoints : array of float, optional
+		non-uniform colormap positions, e.g. the quantiles from compress_volume, rescaled to 0->1
+
+	Returns
+	-------
+	numpy array
+		(256, 4) uint8 RGBA
+	"""
+	n_unreserved = 254 - len(reserved_colors)
 
-	return out.astype(np.uint8), quantiles
+	if datapoints is not None:
+		datapoints = np.asarray(datapoints, dtype=np.float64)
+		if len(datapoints) < n_unreserved:
+			raise Exception(f'Expected at least {n_unreserved} datapoints, got {len(datapoints)}')
+		span = np.max(datapoints) - np.min(datapoints)
+		positions = (datapoints[:n_unreserved] - np.min(datapoints)) / (span if span > 0 else 1)
+	else:
+		positions = np.arange(n_unreserved) / n_unreserved
+
+	if callable(colormap_name):
+		rgba = np.asarray(colormap_name(positions), dtype=np.float64)
+	elif isinstance(colormap_name, str) and colormap_name in _CHANNELS:
+		rgba = np.zeros((n_unreserved, 4))
+		rgba[:, _CHANNELS[colormap_name]] = positions
+		rgba[:, 3] = 1
+	elif isinstance(colormap_name, str):
+		rgba = np.asarray(_matplotlib_colormap(colormap_name)(positions), dtype=np.float64)
+	else:
+		anchors = utils.sanitize_color_array(colormap_name, len(colormap_name))
+		anchor_positions = np.linspace(0, 1, len(anchors))
+		rgba = np.stack([np.interp(positions, anchor_positions, anchors[:, channel]) for channel in range(4)], axis=1)
+
+	lut = np.zeros((256, 4), dtype=np.uint8)
+	lut[:n_unreserved] = np.round(rgba * 255)
+	if len(reserved_colors) > 0:
+		lut[n_unreserved:254] = np.round(utils.sanitize_color_array(reserved_colors, len(reserved_colors)) * 255)
+	lut[254] = (0, 0, 0, 255)
+
+	return lut
+
+_CHANNELS = {'reds': 0, 'greens': 1, 'blues': 2}
+
+def _matplotlib_colormap(colormap_name):
+	try:
+		import matplotlib
+	except ImportError:
+		raise Exception(f'{colormap_name} is not a valid colormap option, install matplotlib by running `pip install matplotlib` to use matplotlib colormaps')
+
+	try:
+		return matplotlib.colormaps[colormap_name]
+	except KeyError:
+		raise Exception(f'{colormap_name} is not a valid colormap option')
 
 def colormap(colormap_name='greens', reserved_colors=[], datapoints=None):
 	"""Build a colormap
@@ -172,46 +416,94 @@ def colormap(colormap_name='greens', reserved_colors=[], datapoints=None):
 	indexes: 	[0->252, 	253->254, 				255]
 	colors: 	[greens, 	your reserved colors, 	transparent]
 
-	Colormap options
-	----------
-		reds: 0->255 R channel
-		greens: 0->255 G channel
-		blues: 0->255 B channel
+	See colormap_lut for the colormap options, and to get the colormap as a NumPy array.
 
 	Parameters
 	----------
-	colormap_name : str, optional
-		_description_, by default 'greens'
-	reserved_colors : _type_, optional
-		_description_, by default None
+	colormap_name : str, list of colors, or callable, optional
+		by default 'greens'
+	reserved_colors : list of colors, optional
+		by default []
+	datapoints : array of float, optional
+		non-uniform colormap positions, by default None
 
 	Returns
 	-------
 	list of string
 		List of colormap hex colors in Urchin-compatible format
 	"""
-	colormap = []
+	lut = colormap_lut(colormap_name, reserved_colors, datapoints)
 
-	n_unreserved = 254 - len(reserved_colors)
+	return ['#%02x%02x%02x%02x' % tuple(color) for color in lut[:254 - len(reserved_colors)].tolist()] + list(reserved_colors)
 
-	datapoints = (datapoints - np.min(datapoints)) / (np.max(datapoints) - np.min(datapoints))
-	datapoints = datapoints / np.max(datapoints)
+def _format_colormap(colormap):
+	"""Convert a list of colors or a (n, 4) uint8 lookup table from colormap_lut to Color objects
+	"""
+	if isinstance(colormap, np.ndarray):
+		colors = utils.sanitize_color_array(colormap.astype(np.float32) / 255 if colormap.dtype == np.uint8 else colormap, len(colormap))
+		return [Color(r = r, g = g, b = b, a = a) for r, g, b, a in colors.tolist()]
 
-	for i in range(0, n_unreserved):
-		if datapoints is not None:
-			v = int(np.round(datapoints[i] * 255))
-		else:
-			v = int(np.round(i / n_unreserved * 255))
-
-		if colormap_name == 'reds':
-			colormap.append(utils.rgba_to_hex((v,0,0,255)))
-		elif colormap_name == 'greens':
-			colormap.append(utils.rgba_to_hex((0,v,0,255)))
-		elif colormap_name == 'blues':
-			colormap.append(utils.rgba_to_hex((0,0,v,255)))
-		else:
-			raise Exception(f'{colormap_name} is not a valid colormap option')
+	return [utils.formatted_color(color) for color in colormap]
 
-	colormap.extend(reserved_colors)
+def _to_uint8(volume_data):
+	"""Copy volume data to uint8, mapping NaN to 255, without modifying the input
+	"""
+	volume_data = np.asarray(volume_data)
+	if volume_data.dtype == np.uint8:
+		return np.ascontiguousarray(volume_data)
 
-	return colormap
\ No newline at end of file
+	return np.where(np.isnan(volume_data), 255, volume_data).astype(np.uint8)
+
+def _compressor():
+	"""Get a function that compresses bytes with the active codec and level
+	"""
+	if codec == 'zlib':
+		return lambda data: zlib.compress(data, 6 if level is None else level)
+	elif codec == 'lz4':
+		try:
+			import lz4.frame
+		except ImportError:
+			raise Exception('Please install lz4 by running `pip install lz4` in your terminal to use the lz4 codec')
+		return lambda data: lz4.frame.compress(data, compression_level=0 if level is None else level)
+	elif codec == 'zstd':
+		try:
+			import zstandard
+		except ImportError:
+			raise Exception('Please install zstandard by running `pip install zstandard` in your terminal to use the zstd codec')
+		zstd_level = 3 if level is None else level
+		# ZstdCompressor objects can't be shared across threads
+		return lambda data: zstandard.ZstdCompressor(level=zstd_level).compress(data)
+	elif codec == 'none':
+		return lambda data: data
+	else:
+		raise Exception(f'Codec {codec} is not one of zlib, lz4, zstd, none')
+
+def _compress_slabs(slabs):
+	"""Convert and compress slabs on a thread pool, in order
+
+	No more than 2 * n_workers slabs are in flight, bounding memory use when the socket is slower
+	than compression. zlib, lz4, and zstd all release the GIL while compressing.
+
+	Parameters
+	----------
+	slabs : iterable of (offset, numpy array)
+
+	Yields
+	------
+	(offset, shape, bytes)
+	"""
+	compress = _compressor()
+	workers = n_workers if n_workers is not None else (os.cpu_count() or 1)
+
+	def work(offset, slab):
+		with metrics.measure('volume-compress'):
+			return offset, slab.shape, compress(_to_uint8(slab).tobytes())
+
+	with ThreadPoolExecutor(max_workers=workers) as executor:
+		pending = collections.deque()
+		for offset, slab in slabs:
+			pending.append(executor.submit(work, offset, slab))
+			if len(pending) >= 2 * workers:
+				yield pending.popleft().result()
+		while pending:
+			yield pending.popleft().result()
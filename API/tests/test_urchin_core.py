@@ -1,5 +1,17 @@
 from unittest import TestCase
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
+from pathlib import Path
+import tempfile
+import json
+import asyncio
+import collections
+import io
+import zlib
+import base64
+import time
+
+import numpy as np
+from PIL import Image
 
 import oursin as urchin
 
@@ -17,4 +29,635 @@ class TestClass(TestCase):
         
         self.assertEqual(urchin.utils.sanitize_vector3((1,2,3)), [1,2,3])
         
-        self.assertRaises(Exception, urchin.utils.sanitize_vector3, (1,2))
\ No newline at end of file
+        self.assertRaises(Exception, urchin.utils.sanitize_vector3, (1,2))
+    def test_sanitize_arrays(self):
+        positions = urchin.utils.sanitize_float_array([1,2,3], 4, 3)
+        self.assertEqual(positions.shape, (4,3))
+        self.assertEqual(positions.dtype, np.float32)
+
+        colors = urchin.utils.sanitize_color_array(['#ff0000', [0, 0, 255]], 2)
+        np.testing.assert_allclose(colors, [[1,0,0,1],[0,0,1,1]])
+        # 0->1 and 0->255 colors are told apart per color
+        colors = urchin.utils.sanitize_color_array([[0.5, 0.5, 0.5], [255, 0, 0], '#0000ff'], 3)
+        np.testing.assert_allclose(colors, [[0.5,0.5,0.5,1],[1,0,0,1],[0,0,1,1]])
+
+        self.assertRaises(ValueError, urchin.utils.sanitize_float_array, [1,2], 4, 3)
+
+    def test_ontology_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir, \
+             patch.object(urchin.atlas.cache, 'cache_dir', Path(temp_dir)):
+            built = urchin.atlas.cache.load_ontology('cavefish2')
+            cached = urchin.atlas.cache.load_ontology('cavefish2')
+
+            self.assertIsInstance(cached['id'], np.memmap)
+            for column in urchin.atlas.cache.COLUMNS:
+                np.testing.assert_array_equal(built[column], cached[column])
+
+            # area models and structures are only built when they're used
+            atlas = urchin.atlas.Atlas('cavefish2')
+            self.assertNotIn('data', vars(atlas))
+            root = atlas.root
+            self.assertEqual(root.data.acronym, 'root')
+            self.assertEqual(root.data.color.a, 1)
+            self.assertIn('root', dir(atlas))
+
+    def test_atlas_delta_update(self):
+        atlas = urchin.atlas.Atlas('cavefish2')
+        areas = atlas.get_areas([area.acronym for area in atlas.data.areas[:2]])
+
+        with patch.object(urchin.client.sio, 'emit') as emit:
+            # renderers without the feature replace their atlas data, so they get every area
+            areas[0].set_color('#ff0000')
+            self.assertEqual(emit.call_args.args[0], 'urchin-atlas-update')
+            self.assertEqual(len(json.loads(emit.call_args.args[1])['Areas']), len(atlas.data.areas))
+
+        with patch.object(urchin.client.sio, 'emit') as emit, \
+             patch.object(urchin.client.current(), 'features', {'atlas-delta'}):
+            areas[0].set_color('#ff0000', push=False)
+            areas[1].set_visibility(True)
+            self.assertEqual(emit.call_args.args[0], 'urchin-atlas-delta')
+            sent = json.loads(emit.call_args.args[1])
+            self.assertEqual([area['Acronym'] for area in sent['Areas']], [areas[0].data.acronym, areas[1].data.acronym])
+
+            atlas.set_alphas([areas[1]], 0.5)
+            self.assertEqual(len(json.loads(emit.call_args.args[1])['Areas']), 1)
+
+            atlas.resync()
+            self.assertEqual(len(json.loads(emit.call_args.args[1])['Areas']), len(atlas.data.areas))
+
+    def test_atlas_arrays(self):
+        atlas = urchin.atlas.Atlas('cavefish2')
+        ids = atlas.ontology['id'][:3]
+
+        np.testing.assert_array_equal(atlas.indexes(ids), [0, 1, 2])
+        np.testing.assert_array_equal(atlas.indexes(atlas.ontology['acronym'][[2, 0]]), [2, 0])
+        # object arrays, like pandas string and int columns
+        np.testing.assert_array_equal(atlas.indexes(np.array(atlas.ontology['acronym'][[2, 0]].tolist(), dtype=object)), [2, 0])
+        np.testing.assert_array_equal(atlas.indexes(np.array(ids.tolist(), dtype=object)), [0, 1, 2])
+        self.assertRaises(KeyError, atlas.indexes, [-1])
+
+        atlas.set_color_intensity_array(ids, np.array([0.1, 0.2, 0.3]), push=False)
+        atlas.set_colors_array(ids, [255, 0, 0], push=False)
+        # kept as float64, so the values sent are the ones that were set
+        self.assertEqual(atlas.data.areas[2].color_intensity, 0.3)
+        self.assertEqual(atlas.data.areas[1].color.r, 1)
+        self.assertEqual(atlas.dirty, {0, 1, 2})
+        # the JSON is written straight from the columns
+        self.assertEqual(atlas._json(atlas._values), atlas.data.to_json_string())
+
+    def test_atlas_hierarchy(self):
+        atlas = urchin.atlas.Atlas('ccf25')
+
+        self.assertEqual([area.data.acronym for area in atlas.ancestors('VISp')][:2], ['root', 'grey'])
+        self.assertEqual(atlas.parent('VISp1').data.acronym, 'VISp')
+        self.assertIsNone(atlas.parent('root'))
+        self.assertEqual(len(atlas.descendants('root')), len(atlas.data.areas) - 1)
+        self.assertTrue(atlas.is_ancestor('CTX', 385))
+        self.assertFalse(atlas.is_ancestor('VISp', 'CTX'))
+        self.assertEqual(atlas.get_area(385), atlas.VISp)
+
+    def test_group_by_area(self):
+        atlas = urchin.atlas.Atlas('ccf25')
+        ids = np.array([atlas.VISp1.data.atlas_id, atlas.VISp1.data.atlas_id, atlas.VISp.data.atlas_id, 0])
+        values = np.array([1.0, 2.0, 6.0, 100.0])
+
+        means = urchin.atlas.group_by_area(atlas, ids, values)
+        self.assertEqual(means[atlas.VISp1.index], 1.5)
+        self.assertEqual(means[atlas.VISp.index], 6.0)
+        self.assertTrue(np.isnan(means[atlas.VISp4.index]))
+
+        rolled = urchin.atlas.group_by_area(atlas, ids, values, rollup=True)
+        self.assertEqual(rolled[atlas.VISp.index], 3.0)
+        self.assertEqual(urchin.atlas.group_by_area(atlas, ids, statistic='count', rollup=True)[atlas.root.index], 3)
+
+    def test_volume_streaming(self):
+        volume = np.random.rand(40, 30, 20).astype(np.float32) * 200
+        volume[0, 0, 0] = np.nan
+        original = volume.copy()
+
+        with patch.object(urchin.client.sio, 'emit') as emit, \
+             patch.object(urchin.volumes, 'streaming', True), \
+             patch.object(urchin.volumes, 'CHUNK_LIMIT', 6000):
+            urchin.volumes.Volume(volume)
+
+        np.testing.assert_array_equal(volume, original)
+
+        received = np.zeros(volume.shape, dtype=np.uint8)
+        slabs = [call.args[1] for call in emit.call_args_list if call.args[0] == 'urchin-volume-slab']
+        self.assertEqual(len(slabs), 4)
+        for header, data in slabs:
+            header = json.loads(header)
+            start, shape = header['Offset'][0], header['Shape']
+            received[start:start + shape[0]] = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(shape)
+
+        np.testing.assert_array_equal(received, np.where(np.isnan(volume), 255, volume).astype(np.uint8))
+
+    def test_volume_update_region(self):
+        with patch.object(urchin.client.sio, 'emit') as emit:
+            volume = urchin.volumes.Volume(np.zeros((10, 8, 6), dtype=np.uint8))
+            volume.update_region(np.s_[2:4, :, 1:3], 7)
+
+        header, data = emit.call_args.args[1]
+        header = json.loads(header)
+        self.assertEqual(header['Offset'], [2, 0, 1])
+        self.assertEqual(header['Shape'], [2, 8, 2])
+        self.assertEqual(zlib.decompress(data), bytes([7]) * 32)
+
+        self.assertRaises(ValueError, volume.update_region, np.s_[::2], 0)
+
+        # replay sends the current data once, not every region that was ever sent
+        with patch.object(urchin.client.sio, 'emit') as emit:
+            volume._replay(False)
+        chunks = [call.args[1] for call in emit.call_args_list if call.args[0] == 'SetVolumeData']
+        self.assertEqual(len(chunks), 1)
+        replayed = np.frombuffer(zlib.decompress(base64.b64decode(json.loads(chunks[0])['Bytes'])), dtype=np.uint8)
+        self.assertEqual(replayed.sum(), 7 * 32)
+
+    def test_compress_volume_and_colormap(self):
+        volume = np.random.default_rng(0).random((20, 10, 5))
+        volume[0, 0, 0] = np.nan
+
+        exact, quantiles = urchin.volumes.compress_volume(volume)
+        valid = volume[~np.isnan(volume)]
+        expected = np.digitize(volume, np.quantile(valid, np.linspace(0, 1, 254)), right=True)
+        np.testing.assert_array_equal(exact, np.where(np.isnan(volume), 255, expected))
+
+        for method in ['sample', 'histogram']:
+            approximate, _ = urchin.volumes.compress_volume(volume, method=method, n_samples=500)
+            self.assertEqual(approximate[0, 0, 0], 255)
+            self.assertLessEqual(np.abs(approximate.astype(int) - exact).max(), 40)
+
+        lut = urchin.volumes.colormap_lut('reds', reserved_colors=['#0000ff'])
+        self.assertEqual(lut.shape, (256, 4))
+        self.assertEqual(lut[252].tolist(), [round(252 / 253 * 255), 0, 0, 255])
+        self.assertEqual(lut[253].tolist(), [0, 0, 255, 255])
+        self.assertEqual(lut[255].tolist(), [0, 0, 0, 0])
+
+        self.assertEqual(urchin.volumes.colormap()[1], '#000100ff')
+        self.assertEqual(len(urchin.volumes.colormap('blues', datapoints=quantiles)), 254)
+        self.assertEqual(urchin.volumes.colormap_lut(['#000000', '#ffffff'])[0].tolist(), [0, 0, 0, 255])
+
+    def test_emit_queue(self):
+        with patch.object(urchin.client.sio, 'emit') as emit:
+            urchin.queue(tick = None)
+            try:
+                mesh = urchin.meshes.Mesh()
+                for x in range(10):
+                    mesh.set_position([x * 1000, 0, 0])
+                urchin.camera.set_brain_rotation(10)
+                self.assertEqual(emit.call_count, 0)
+
+                urchin.flush()
+            finally:
+                urchin.queue(False)
+
+        events = [call.args[0] for call in emit.call_args_list]
+        self.assertEqual(events, ['urchin-meshes-update', 'urchin-brain-yaw'])
+        self.assertEqual(json.loads(emit.call_args_list[0].args[1])['Position']['x'], 9)
+
+        # binary particle buffers are queued as views and sent as bytes
+        with patch.object(urchin.client.sio, 'emit') as emit:
+            psystem = urchin.particles.ParticleSystem(4, binary = True)
+            urchin.queue(tick = None)
+            try:
+                psystem.set_positions(np.ones((4, 3)) * 1000)
+                queued = dict(urchin.client.current()._queue.values())
+                psystem_id, view = queued['urchin-particles-positions-binary']
+                self.assertIsInstance(view, memoryview)
+                urchin.flush()
+            finally:
+                urchin.queue(False)
+        self.assertEqual(emit.call_args.args[1], (psystem.data.id, np.ones((4, 3), dtype=np.float32).tobytes()))
+
+    def test_batch(self):
+        with patch.object(urchin.client.sio, 'emit') as emit:
+            with urchin.batch():
+                meshes = [urchin.meshes.Mesh() for _ in range(3)]
+                with urchin.batch():
+                    urchin.meshes.set_positions(meshes[:2], [[1000, 0, 0], [2000, 0, 0]])
+                urchin.meshes.set_positions(meshes[2:], [[3000, 0, 0]])
+                meshes[0].set_color('#ff0000')
+                self.assertEqual(emit.call_count, 0)
+
+        self.assertFalse(urchin.client.queueing)
+        events = [call.args[0] for call in emit.call_args_list]
+        # meshes[0] was created before the bulk positions, its later update can't move the create past them
+        self.assertEqual(events, ['urchin-meshes-update'] * 3 + ['urchin-meshes-positions', 'urchin-meshes-update'])
+        ids = [json.loads(call.args[1]).get('ID') for call in emit.call_args_list]
+        self.assertEqual(ids[:3], [mesh.data.id for mesh in meshes])
+        self.assertEqual(ids[4], meshes[0].data.id)
+
+        positions = json.loads(emit.call_args_list[3].args[1])
+        self.assertEqual(positions['IDs'], [mesh.data.id for mesh in meshes])
+        self.assertEqual([position['x'] for position in positions['Values']], [1, 2, 3])
+
+        # a later state is replaced in place, the volume's metadata stays ahead of its data
+        with patch.object(urchin.client.sio, 'emit') as emit:
+            with urchin.batch():
+                volume = urchin.volumes.Volume(np.zeros((4, 4, 4), dtype=np.uint8))
+                volume.data.visible = False
+                volume.update()
+                # a delete is a barrier, the mesh is created again after it
+                meshes[0].delete()
+                meshes[0]._update()
+        events = [call.args[0] for call in emit.call_args_list]
+        self.assertEqual(events, ['UpdateVolume', 'SetVolumeData', 'urchin-meshes-delete', 'urchin-meshes-update'])
+        self.assertFalse(json.loads(emit.call_args_list[0].args[1])['Visible'])
+
+        # with batch packets, runs of JSON messages are batched and other payloads are sent between them
+        session = urchin.client.current()
+        session.batch_packets = True
+        try:
+            with patch.object(urchin.client.sio, 'emit') as emit:
+                with urchin.batch():
+                    psystem = urchin.particles.ParticleSystem(2, binary = True)
+                    meshes[1].set_color('#0000ff')
+                    meshes[2].set_color('#0000ff')
+        finally:
+            session.batch_packets = False
+        events = [call.args[0] for call in emit.call_args_list]
+        self.assertEqual(events, ['urchin-particles-update', 'urchin-particles-positions-binary', 'urchin-particles-sizes-binary',
+                                  'urchin-particles-colors-binary', 'urchin-batch'])
+        self.assertEqual(emit.call_args_list[1].args[1][0], psystem.data.id)
+        self.assertEqual([event for event, data in emit.call_args_list[-1].args[1]], ['urchin-meshes-update'] * 2)
+
+    def test_async_client(self):
+        class FakeEngine:
+            def __init__(self):
+                self.queue = asyncio.Queue()
+
+        class FakeAsyncClient:
+            def __init__(self, **kwargs):
+                self.handlers = {}
+                self.eio = FakeEngine()
+                self.connected = True
+                self.sent = []
+
+            def on(self, event, handler):
+                self.handlers.setdefault('/', {})[event] = handler
+
+            async def connect(self, url):
+                pass
+
+            async def disconnect(self):
+                pass
+
+            async def emit(self, event, data = None):
+                self.sent.append(event)
+                await self.eio.queue.put(event)
+
+        async def write(fake):
+            while True:
+                await fake.eio.queue.get()
+                await asyncio.sleep(0)
+                fake.eio.queue.task_done()
+
+        async def run():
+            with patch('socketio.AsyncClient', FakeAsyncClient):
+                await urchin.client.connect_async('http://localhost:5000', max_pending = 4)
+            fake = urchin.client.async_sio
+            writer = asyncio.create_task(write(fake))
+
+            for _ in range(20):
+                urchin.meshes.Mesh()
+            # one sender task, not a task per message
+            self.assertEqual(len(urchin.client.current()._outbox), 20)
+            await urchin.drain()
+            self.assertEqual(fake.sent.count('urchin-meshes-update'), 20)
+            self.assertEqual(fake.eio.queue.qsize(), 0)
+
+            # setters on other threads wait for room in the outbox
+            outbox = urchin.client.current()._outbox
+            sizes = []
+            def produce():
+                for _ in range(20):
+                    urchin.meshes.Mesh()
+                    sizes.append(len(outbox))
+            # run_in_executor doesn't copy the context like asyncio.to_thread (3.9+) does
+            session = urchin.client.current()
+            def produce_in_session():
+                with session:
+                    produce()
+            await asyncio.get_running_loop().run_in_executor(None, produce_in_session)
+            await urchin.drain()
+            self.assertLessEqual(max(sizes), 4)
+            self.assertEqual(fake.sent.count('urchin-meshes-update'), 40)
+
+            reply = urchin.client.expect('urchin-test-reply')
+            fake.handlers['/']['urchin-test-reply']('ok')
+            self.assertEqual(await asyncio.wait_for(reply, 1), 'ok')
+
+            await urchin.client.close_async()
+            writer.cancel()
+
+        try:
+            asyncio.run(run())
+        finally:
+            urchin.client.current().async_sio = None
+
+    def test_sessions(self):
+        first, second = urchin.Session(), urchin.Session()
+        self.assertNotEqual(first.ID, second.ID)
+
+        with patch.object(first.sio, 'emit') as first_emit, patch.object(second.sio, 'emit') as second_emit:
+            with first:
+                mesh = urchin.meshes.Mesh()
+                self.assertIs(urchin.client.current(), first)
+                with second:
+                    urchin.meshes.Mesh()
+                    urchin.meshes.Mesh()
+                    self.assertEqual(len(urchin.meshes.meshes), 2)
+                    # objects keep sending to the session they were created in
+                    mesh.set_position([1000, 0, 0])
+                    # and so do the module-level bulk setters
+                    urchin.meshes.set_colors([mesh], '#ff0000')
+                    self.assertRaises(ValueError, urchin.meshes.set_colors, [mesh] + urchin.meshes.meshes, '#ff0000')
+                self.assertEqual(len(urchin.meshes.meshes), 1)
+
+        self.assertIs(urchin.client.current(), urchin.client.default)
+        self.assertEqual(first_emit.call_count, 3)
+        self.assertEqual(first_emit.call_args.args[0], 'urchin-meshes-colors')
+        self.assertEqual(second_emit.call_count, 2)
+        self.assertEqual([m.data.id for m in second.objects['meshes']], ['0', '1'])
+
+        # atlases are loaded per session
+        atlas = urchin.atlas.cavefish2
+        with patch.object(first.sio, 'emit') as first_emit, patch.object(second.sio, 'emit') as second_emit:
+            with first:
+                atlas.load()
+                self.assertIn(atlas, urchin.atlas.loaded())
+            with second:
+                self.assertNotIn(atlas, urchin.atlas.loaded())
+                atlas.load()
+                second.replay()
+        self.assertEqual([call.args[0] for call in first_emit.call_args_list], ['urchin-atlas-load'])
+        self.assertEqual([call.args[0] for call in second_emit.call_args_list][0], 'urchin-atlas-load')
+        self.assertIn('urchin-atlas-update', [call.args[0] for call in second_emit.call_args_list])
+        self.assertFalse(atlas.loaded)
+
+        # and keep their own area state
+        with patch.object(first.sio, 'emit') as first_emit, patch.object(second.sio, 'emit'):
+            with second:
+                atlas.root.set_color('#ff0000')
+                self.assertEqual(atlas.root.data.color.g, 0)
+            with first:
+                atlas.root.set_visibility(True)
+                self.assertEqual(atlas.root.data.color.g, 1)
+        sent = json.loads(first_emit.call_args.args[1])['Areas']
+        self.assertEqual([area['Color']['g'] for area in sent if area['Acronym'] == 'root'], [1])
+
+    def test_local_server(self):
+        from oursin.server import Server
+
+        async def run():
+            urchin.camera.setup()
+            for _ in range(5):
+                urchin.meshes.Mesh()
+            return await urchin.camera.main.screenshot(size = [64, 32], filename = 'return')
+
+        server = Server(screenshots = True, record = True)
+        url = server.start(port = 0)
+        session = urchin.Session()
+        try:
+            with session:
+                session.sio.connect(url, wait_timeout = 5)
+                image = asyncio.run(run())
+                session.close()
+        finally:
+            server.stop()
+
+        self.assertEqual(image.size, (64, 32))
+        self.assertEqual(server.stats['urchin-meshes-update']['count'], 5)
+        self.assertEqual(server.stats['ID']['count'], 1)
+        self.assertGreater(len(server.records), 6)
+
+    def test_metrics(self):
+        exported = []
+        urchin.metrics.reset()
+        urchin.metrics.enable()
+        urchin.metrics.add_callback(lambda *args: exported.append(args))
+        try:
+            with patch.object(urchin.client.sio, 'emit'):
+                for _ in range(3):
+                    urchin.meshes.Mesh()
+                with patch.object(urchin.volumes, 'streaming', True):
+                    urchin.volumes.Volume(np.zeros((4, 4, 4), dtype=np.uint8))
+            stats = urchin.stats(clear = True)
+        finally:
+            urchin.metrics.enable(False)
+            urchin.metrics._callbacks.clear()
+
+        self.assertEqual(stats['urchin-meshes-update']['count'], 3)
+        self.assertGreater(stats['urchin-meshes-update']['bytes'], 0)
+        self.assertEqual(stats['urchin-meshes-update']['serialize']['histogram'][-1], 0)
+        self.assertEqual(sum(stats['urchin-meshes-update']['emit']['histogram']), 3)
+        self.assertEqual(stats['stages']['volume-compress']['histogram'].count(0), len(urchin.metrics.BUCKETS))
+        self.assertEqual(len(exported), 3 + 2)
+        self.assertEqual(urchin.stats(), {'stages': {}})
+
+        # sizes are in encoded bytes
+        self.assertEqual(urchin.metrics.payload_size(('µm', memoryview(np.zeros(3, dtype=np.float32)))), 3 + 12)
+
+    def test_serializers(self):
+        from oursin.server import Server
+        from vbl_aquarium.models.generic import IDListVector3List, Vector3
+
+        model = IDListVector3List(ids = ['a', 'b'], values = [Vector3(x = 1, y = 2, z = 3), Vector3(x = 4, y = 5, z = 6)])
+        self.assertIsInstance(urchin.serializers.encode(model), str)
+        ids, values = urchin.serializers.unpack(urchin.serializers.encode(model, 'packed'))
+        self.assertEqual(ids, ['a', 'b'])
+        np.testing.assert_array_equal(values, [[1, 2, 3], [4, 5, 6]])
+
+        server = Server(formats = ['packed', 'json'])
+        url = server.start(port = 0)
+        session = urchin.Session()
+        try:
+            with session:
+                session.sio.connect(url, wait_timeout = 5)
+                for _ in range(100):
+                    if session.format == 'packed':
+                        break
+                    time.sleep(0.01)
+                self.assertEqual(session.format, 'packed')
+
+                meshes = urchin.meshes.create(2)
+                with patch.object(session.sio, 'emit') as emit:
+                    urchin.meshes.set_positions(meshes, [[1, 2, 3], [4, 5, 6]])
+                    # other models stay JSON
+                    meshes[0].set_position([1, 2, 3])
+                session.close()
+        finally:
+            server.stop()
+
+        ids, values = urchin.serializers.unpack(emit.call_args_list[0].args[1])
+        self.assertEqual(ids, [mesh.data.id for mesh in meshes])
+        self.assertEqual(values.shape, (2, 3))
+        self.assertIsInstance(emit.call_args_list[1].args[1], str)
+        # a client that never hears from a renderer keeps sending JSON
+        self.assertEqual(urchin.Session().format, 'json')
+
+    def test_bulk_array_payloads(self):
+        from vbl_aquarium.models.generic import IDListVector3List, IDListColorList
+
+        positions = [[1000, 2000, 3000], [4000, 5000, 6000], [7, 8, 9]]
+        colors = ['#ff0000', [0, 0.5, 1], [0.2, 0.2, 0.2, 0.5]]
+
+        with patch.object(urchin.client.sio, 'emit') as emit:
+            meshes = urchin.meshes.create(3)
+            ids = [mesh.data.id for mesh in meshes]
+            emit.reset_mock()
+            urchin.meshes.set_positions(meshes, np.array(positions))
+            urchin.meshes.set_colors(meshes, colors)
+            with urchin.batch():
+                urchin.meshes.set_positions(meshes[:1], positions[:1])
+                urchin.meshes.set_positions(meshes[1:], positions[1:])
+
+        # same JSON as the validated models
+        expected = IDListVector3List(ids = ids, values = [urchin.utils.formatted_vector3([x / 1000 for x in pos]) for pos in positions])
+        self.assertEqual(emit.call_args_list[0].args[1], expected.to_json_string())
+        expected = IDListColorList(ids = ids, values = [urchin.utils.formatted_color(color) for color in colors])
+        self.assertEqual(emit.call_args_list[1].args[1], expected.to_json_string())
+        # queued bulk messages still merge
+        self.assertEqual(emit.call_count, 3)
+        self.assertEqual(json.loads(emit.call_args_list[2].args[1])['IDs'], ids)
+
+        with self.assertRaises(ValueError):
+            urchin.meshes.set_positions(meshes, [[1, 2], [3, 4], [5, 6]])
+        with self.assertRaises(ValueError):
+            urchin.meshes.set_colors(meshes, [[0, 0, -1]] * 3)
+
+    def test_reconnect_replay(self):
+        from oursin.server import Server
+
+        server = Server()
+        url = server.start(port = 0)
+        session = urchin.Session()
+        session.sio.reconnection_delay = 0.05
+        session.sio.reconnection_delay_max = 0.2
+        restarted = Server()
+        try:
+            with session:
+                session.sio.connect(url, wait_timeout = 5)
+                meshes = urchin.meshes.create(4)
+                meshes[2].delete()
+                urchin.meshes.delete([meshes[3]])
+                # bulk setters keep each mesh's data, so the replay sends the new position
+                urchin.meshes.set_positions([meshes[1]], [[2000, 0, 0]])
+                self.assertEqual(meshes[1].data.position.x, 2)
+                self.assertNotIn(meshes[3], urchin.meshes.meshes)
+                urchin.camera.set_light_rotation([0, 90, 0])
+                texture = urchin.texture.Texture(offset = 1)
+
+                server.stop()
+                for _ in range(100):
+                    if session._reconnecting:
+                        break
+                    time.sleep(0.01)
+                # dropped while the connection is down, then replayed
+                meshes[0].set_position([1000, 0, 0])
+
+                restarted.start(port = int(url.rsplit(':', 1)[1]))
+                for _ in range(200):
+                    if restarted.stats['SetFOVOffset']['count'] > 0:
+                        break
+                    time.sleep(0.02)
+
+                # the renderer reloaded, textures are created again
+                with patch.object(session.sio, 'emit') as emit:
+                    session.sio.handlers['/']['urchin-loaded-callback']('')
+                session.close()
+        finally:
+            restarted.stop()
+
+        self.assertEqual(restarted.stats['urchin-meshes-update']['count'], 2)
+        self.assertEqual(restarted.stats['SetLightRotation']['count'], 1)
+        self.assertEqual(restarted.stats['SetFOVOffset']['count'], 1)
+        self.assertNotIn('CreateFOV', restarted.stats)
+        self.assertIn(('CreateFOV', [texture.id]), [call.args for call in emit.call_args_list])
+
+    def test_screenshot_chunks(self):
+        from oursin.server import Server
+
+        async def run():
+            urchin.camera.setup()
+            # several requests in flight on one camera are matched by request id
+            images = await asyncio.gather(*[urchin.camera.main.screenshot(size = [300 + i, 20], filename = 'return')
+                                            for i in range(3)])
+            side = urchin.camera.Camera()
+            many = await urchin.camera.screenshot_many([urchin.camera.main, side], size = [40, 10])
+            # raw pixels skip PNG encoding
+            pixels = await side.screenshot(size = [50, 4], format = 'rgba')
+            return images, many, pixels
+
+        server = Server(screenshots = True, binary_images = True)
+        url = server.start(port = 0)
+        session = urchin.Session()
+        try:
+            with session:
+                session.sio.connect(url, wait_timeout = 5)
+                images, many, pixels = asyncio.run(run())
+                session.close()
+        finally:
+            server.stop()
+
+        self.assertEqual([image.size for image in images], [(300, 20), (301, 20), (302, 20)])
+        self.assertEqual(np.array(images[0])[0, -1], 255)
+        self.assertEqual([image.size for image in many], [(40, 10), (40, 10)])
+        self.assertEqual(pixels.shape, (4, 50, 4))
+        self.assertEqual(pixels.dtype, np.uint8)
+        self.assertEqual(pixels[0, -1].tolist(), [255, 255, 255, 255])
+        # a renderer that ignores the format sends a PNG, which is decoded instead
+        png = io.BytesIO()
+        Image.fromarray(np.zeros((2, 3), dtype = np.uint8)).save(png, format = 'PNG')
+        self.assertEqual(urchin.camera._pixels(png.getvalue(), 'rgb').shape, (2, 3, 3))
+
+        # binary chunks are written at their offsets, in any order
+        session = urchin.client.current()
+        key = (session, 'CameraTest', None)
+        urchin.camera.on_camera_img_meta(json.dumps({'name': 'CameraTest', 'totalBytes': 6}))
+        urchin.camera.on_camera_img(json.dumps({'name': 'CameraTest', 'offset': 3}), b'def')
+        self.assertEqual(urchin.camera.receive_count[key], 3)
+        first, second = Mock(), Mock()
+        urchin.camera.receive_camera[(session, 'CameraTest')] = collections.deque([(Mock(), 1, first), (Mock(), 2, second)])
+        urchin.camera.on_camera_img(json.dumps({'name': 'CameraTest', 'data': list(b'abc'), 'offset': 0}))
+        # without a request id, the oldest request gets the image
+        self.assertEqual(bytes(first.get_loop().call_soon_threadsafe.call_args.args[2]), b'abcdef')
+        self.assertNotIn(key, urchin.camera.receive_bytes)
+
+        # with one, the matching request does
+        urchin.camera.receive_camera[(session, 'CameraTest')].appendleft((Mock(), 3, first))
+        urchin.camera.on_camera_img_meta(json.dumps({'name': 'CameraTest', 'totalBytes': 2, 'request': 2}))
+        urchin.camera.on_camera_img(json.dumps({'name': 'CameraTest', 'data': [1, 2], 'request': 2}))
+        self.assertEqual(bytes(second.get_loop().call_soon_threadsafe.call_args.args[2]), b'\x01\x02')
+        self.assertEqual([entry[1] for entry in urchin.camera.receive_camera.pop((session, 'CameraTest'))], [3])
+
+        # images nobody waits for are dropped
+        urchin.camera.on_camera_img_meta(json.dumps({'name': 'CameraTest', 'totalBytes': 1, 'request': 4}))
+        urchin.camera.on_camera_img(json.dumps({'name': 'CameraTest', 'data': [1], 'request': 4}))
+        self.assertNotIn((session, 'CameraTest', 4), urchin.camera.receive_bytes)
+
+        # a cancelled request stops waiting, so the next image goes to the next request
+        async def cancel():
+            with patch.object(urchin.client.sio, 'emit'):
+                camera = urchin.camera.Camera()
+                camera._request([10, 10]).cancel()
+            await asyncio.sleep(0)
+            return (session, camera.data.id) in urchin.camera.receive_camera
+        self.assertFalse(asyncio.run(cancel()))
+
+        # a lost connection fails the requests in flight, and new ones until it is back
+        async def disconnected():
+            with patch.object(urchin.client.sio, 'emit'):
+                camera = urchin.camera.Camera()
+                future = camera._request([10, 10])
+                urchin.client.disconnect()
+                try:
+                    with self.assertRaises(ConnectionError):
+                        await future
+                    with self.assertRaises(ConnectionError):
+                        camera._request([10, 10])
+                finally:
+                    session._reconnecting = False
+            await asyncio.sleep(0)
+            return (session, camera.data.id) in urchin.camera.receive_camera
+        self.assertFalse(asyncio.run(disconnected()))
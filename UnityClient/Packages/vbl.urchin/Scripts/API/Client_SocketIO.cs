@@ -25,6 +25,10 @@ namespace Urchin.API
 
         #region variables
         private const string ID_SAVE_KEY = "id";
+
+        // Wire formats and optional features reported to clients on urchin-capabilities
+        private static List<string> _formats = new() { "json" };
+        private static readonly List<string> FEATURES = new() { "atlas-delta" };
         private string _ID;
         public string ID
         {
@@ -34,11 +38,15 @@ namespace Urchin.API
                 _ID = value;
                 PlayerPrefs.SetString(ID_SAVE_KEY, ID);
                 manager.Socket.Emit("ID", new List<string>() { ID, "receive" });
+                // clients that logged in first are waiting for our capabilities
+                EmitCapabilities();
                 IDChangedEvent.Invoke(ID);
             }
         }
 
         [SerializeField] private bool localhost;
+        [Tooltip("Receive bulk lists (positions, colors, ...) in the packed binary format. Clients that don't negotiate formats keep sending JSON, which is then not understood")]
+        [SerializeField] private bool _packedLists;
 
         private static SocketManager manager;
         #endregion
@@ -60,8 +68,13 @@ namespace Urchin.API
         manager.Socket.On("reconnect", () => { Debug.Log("(Client) client reconnected -- could be sign of a timeout issue"); });
 #endif
 
+            if (_packedLists && !_formats.Contains("packed"))
+                _formats.Insert(0, "packed");
+
             // Call the startup functions, these bind all the Socket.on events and setup the static Actions, which
             // other scripts can then listen to
+            Start_Capabilities();
+            Start_Batch();
             Start_Atlas();
             Start_Volume();
             Start_Particles();
@@ -77,7 +90,70 @@ namespace Urchin.API
         }
 
         #region Socket setup by action group
+        // JSON handlers by event, also used for the messages of an urchin-batch
+        private static Dictionary<string, Action<string>> _handlers = new();
+
+        private static void On(string header, Action<string> handler)
+        {
+            _handlers[header] = handler;
+            manager.Socket.On<string>(header, handler);
+        }
+
+        /// <summary>
+        /// Bulk list events arrive as JSON, or in the packed format when this renderer reports it
+        /// </summary>
+        private void OnList(string header, Action<string> json, Action<PackedList> packed)
+        {
+            if (_packedLists)
+                manager.Socket.On<byte[]>(header, x => packed.Invoke(new PackedList(x)));
+            else
+                On(header, json);
+        }
+
+        private void Start_Batch()
+        {
+            // [[event, JSON data], ...] sent together by the Python queue, handled in order
+            manager.Socket.On<List<List<string>>>("urchin-batch", messages =>
+            {
+                foreach (List<string> message in messages)
+                {
+                    if (_handlers.ContainsKey(message[0]))
+                        _handlers[message[0]].Invoke(message[1]);
+                    else
+                        LogWarning($"(Client) Message {message[0]} can't be sent in a batch");
+                }
+            });
+        }
+
+        private void Start_Capabilities()
+        {
+            // Clients announce the formats they can send when they connect, answer with ours
+            manager.Socket.On<string>("urchin-capabilities", x =>
+            {
+                if (JsonUtility.FromJson<CapabilitiesModel>(x).role == "client")
+                    EmitCapabilities();
+            });
+        }
+
+        private static void EmitCapabilities()
+        {
+            CapabilitiesModel capabilities = new();
+            capabilities.role = "renderer";
+            capabilities.formats = _formats.ToArray();
+            capabilities.features = FEATURES.ToArray();
+            manager.Socket.Emit("urchin-capabilities", JsonUtility.ToJson(capabilities));
+        }
+
+        [Serializable]
+        private struct CapabilitiesModel
+        {
+            public string role;
+            public string[] formats;
+            public string[] features;
+        }
+
         public static Action<AtlasModel> AtlasUpdate;
+        public static Action<AtlasModel> AtlasDelta;
         public static Action<AtlasModel> AtlasLoad;
         public static Action AtlasLoadDefaults;
 
@@ -89,14 +165,15 @@ namespace Urchin.API
 
         private void Start_Atlas()
         {
-            manager.Socket.On<string>("urchin-atlas-update", x => AtlasUpdate.Invoke(JsonUtility.FromJson<AtlasModel>(x)));
-            manager.Socket.On<string>("urchin-atlas-load", x => AtlasLoad.Invoke(JsonUtility.FromJson<AtlasModel>(x)));
-            manager.Socket.On<string>("urchin-atlas-defaults", x => AtlasLoadDefaults.Invoke());
+            On("urchin-atlas-update", x => AtlasUpdate.Invoke(JsonUtility.FromJson<AtlasModel>(x)));
+            On("urchin-atlas-delta", x => AtlasDelta.Invoke(JsonUtility.FromJson<AtlasModel>(x)));
+            On("urchin-atlas-load", x => AtlasLoad.Invoke(JsonUtility.FromJson<AtlasModel>(x)));
+            On("urchin-atlas-defaults", x => AtlasLoadDefaults.Invoke());
 
 
             // CCF Areas
             //manager.Socket.On<string>("LoadAtlas", x => AtlasLoad.Invoke(x));
-            manager.Socket.On<string>("CustomAtlas", x => AtlasCreateCustom.Invoke(JsonUtility.FromJson<CustomAtlasModel>(x)));
+            On("CustomAtlas", x => AtlasCreateCustom.Invoke(JsonUtility.FromJson<CustomAtlasModel>(x)));
             ////manager.Socket.On<string>("AtlasSetReferenceCoord", x => AtlasSetReferenceCoord.Invoke(JsonUtility.FromJson<Vector3Data>(x)));
             //manager.Socket.On<string>("SetAreaVisibility", x => AtlasSetAreaVisibility.Invoke(JsonUtility.FromJson<AreaGroupData>(x)));
             //manager.Socket.On<Dictionary<string, string>>("SetAreaColors", x => AtlasSetAreaColors.Invoke(x));
@@ -110,15 +187,17 @@ namespace Urchin.API
         }
 
         public static Action<VolumeDataChunk> SetVolumeData;
+        public static Action<VolumeSlabModel, byte[]> SetVolumeSlab;
         public static Action<VolumeMetaModel> UpdateVolume;
         public static Action<string[]> SetVolumeColormap;
         public static Action<string> DeleteVolume;
 
         private void Start_Volume()
         {
-            manager.Socket.On<string>("UpdateVolume", x => UpdateVolume.Invoke(JsonUtility.FromJson<VolumeMetaModel>(x)));
-            manager.Socket.On<string>("SetVolumeData", x => SetVolumeData.Invoke(JsonUtility.FromJson<VolumeDataChunk>(x)));
-            manager.Socket.On<string>("DeleteVolume", x => DeleteVolume.Invoke(x));
+            On("UpdateVolume", x => UpdateVolume.Invoke(JsonUtility.FromJson<VolumeMetaModel>(x)));
+            On("SetVolumeData", x => SetVolumeData.Invoke(JsonUtility.FromJson<VolumeDataChunk>(x)));
+            manager.Socket.On<string, byte[]>("urchin-volume-slab", (header, x) => SetVolumeSlab.Invoke(JsonUtility.FromJson<VolumeSlabModel>(header), x));
+            On("DeleteVolume", x => DeleteVolume.Invoke(x));
         }
 
 
@@ -130,11 +209,19 @@ namespace Urchin.API
 
         private void Start_Particles()
         {
-            manager.Socket.On<string>("urchin-particles-update", x => ParticlesUpdate.Invoke(JsonUtility.FromJson<ParticleSystemModel>(x)));
-            manager.Socket.On<string>("urchin-particles-delete", x => ParticlesDelete.Invoke(JsonUtility.FromJson<IDData>(x)));
-            manager.Socket.On<string>("urchin-particles-positions", x => ParticlesSetPositions.Invoke(JsonUtility.FromJson<Vector3List>(x)));
-            manager.Socket.On<string>("urchin-particles-sizes", x => ParticlesSetSizes.Invoke(JsonUtility.FromJson<FloatList>(x)));
-            manager.Socket.On<string>("urchin-particles-colors", x => ParticlesSetColors.Invoke(JsonUtility.FromJson<ColorList>(x)));
+            On("urchin-particles-update", x => ParticlesUpdate.Invoke(JsonUtility.FromJson<ParticleSystemModel>(x)));
+            On("urchin-particles-delete", x => ParticlesDelete.Invoke(JsonUtility.FromJson<IDData>(x)));
+            OnList("urchin-particles-positions", x => ParticlesSetPositions.Invoke(JsonUtility.FromJson<Vector3List>(x)),
+                x => ParticlesSetPositions.Invoke(new Vector3List(x.IDs[0], x.Values<Vector3>())));
+            OnList("urchin-particles-sizes", x => ParticlesSetSizes.Invoke(JsonUtility.FromJson<FloatList>(x)),
+                x => ParticlesSetSizes.Invoke(new FloatList(x.IDs[0], x.Values<float>())));
+            OnList("urchin-particles-colors", x => ParticlesSetColors.Invoke(JsonUtility.FromJson<ColorList>(x)),
+                x => ParticlesSetColors.Invoke(new ColorList(x.IDs[0], x.Values<Color>())));
+
+            // Binary systems send (ID, float32 buffer) instead of JSON lists
+            manager.Socket.On<string, byte[]>("urchin-particles-positions-binary", (id, x) => ParticlesSetPositions.Invoke(new Vector3List(id, Utils.Utils.FromFloatBytes<Vector3>(x))));
+            manager.Socket.On<string, byte[]>("urchin-particles-sizes-binary", (id, x) => ParticlesSetSizes.Invoke(new FloatList(id, Utils.Utils.FromFloatBytes<float>(x))));
+            manager.Socket.On<string, byte[]>("urchin-particles-colors-binary", (id, x) => ParticlesSetColors.Invoke(new ColorList(id, Utils.Utils.FromFloatBytes<Color>(x))));
         }
 
 
@@ -148,20 +235,24 @@ namespace Urchin.API
 
         private void Start_Probes()
         {
-            manager.Socket.On<string>("urchin-probe-update", x => ProbeUpdate.Invoke(JsonUtility.FromJson<ProbeModel>(x)));
-            manager.Socket.On<string>("urchin-probe-delete", x => ProbeDelete.Invoke(JsonUtility.FromJson<IDData>(x)));
-
-            manager.Socket.On<string>("urchin-probe-colors", x => ProbeSetColors.Invoke(JsonUtility.FromJson<IDListColorList>(x)));
-            manager.Socket.On<string>("urchin-probe-positions", x => ProbeSetPositions.Invoke(JsonUtility.FromJson<IDListVector3List>(x)));
-            manager.Socket.On<string>("urchin-probe-angles", x => ProbeSetAngles.Invoke(JsonUtility.FromJson<IDListVector3List>(x)));
-            manager.Socket.On<string>("urchin-probe-scales", x => ProbeSetScales.Invoke(JsonUtility.FromJson<IDListVector3List>(x)));
+            On("urchin-probe-update", x => ProbeUpdate.Invoke(JsonUtility.FromJson<ProbeModel>(x)));
+            On("urchin-probe-delete", x => ProbeDelete.Invoke(JsonUtility.FromJson<IDData>(x)));
+
+            OnList("urchin-probe-colors", x => ProbeSetColors.Invoke(JsonUtility.FromJson<IDListColorList>(x)),
+                x => ProbeSetColors.Invoke(new IDListColorList(x.IDs, x.Values<Color>())));
+            OnList("urchin-probe-positions", x => ProbeSetPositions.Invoke(JsonUtility.FromJson<IDListVector3List>(x)),
+                x => ProbeSetPositions.Invoke(new IDListVector3List(x.IDs, x.Values<Vector3>())));
+            OnList("urchin-probe-angles", x => ProbeSetAngles.Invoke(JsonUtility.FromJson<IDListVector3List>(x)),
+                x => ProbeSetAngles.Invoke(new IDListVector3List(x.IDs, x.Values<Vector3>())));
+            OnList("urchin-probe-scales", x => ProbeSetScales.Invoke(JsonUtility.FromJson<IDListVector3List>(x)),
+                x => ProbeSetScales.Invoke(new IDListVector3List(x.IDs, x.Values<Vector3>())));
         }
 
         // New Camera
         public static Action<CameraRotationModel> SetCameraLerpRotation;
         public static Action<FloatData> SetCameraLerp;
         public static Action<FloatData> CameraBrainYaw;
-        public static Action<Vector2Data> RequestScreenshot;
+        public static Action<ScreenshotRequestModel> RequestScreenshot;
 
         public static Action<CameraModel> UpdateCamera;
         public static Action<IDData> DeleteCamera;
@@ -169,15 +260,15 @@ namespace Urchin.API
         private void Start_Camera()
         {
             //New
-            manager.Socket.On<string>("urchin-camera-update", x => UpdateCamera.Invoke(JsonUtility.FromJson<CameraModel>(x)));
-            manager.Socket.On<string>("urchin-camera-delete", x => DeleteCamera.Invoke(JsonUtility.FromJson<IDData>(x)));
+            On("urchin-camera-update", x => UpdateCamera.Invoke(JsonUtility.FromJson<CameraModel>(x)));
+            On("urchin-camera-delete", x => DeleteCamera.Invoke(JsonUtility.FromJson<IDData>(x)));
 
-            manager.Socket.On<string>("urchin-camera-lerp-set", x => SetCameraLerpRotation.Invoke(JsonUtility.FromJson<CameraRotationModel>(x)));
-            manager.Socket.On<string>("urchin-camera-lerp", x => SetCameraLerp.Invoke(JsonUtility.FromJson<FloatData>(x)));
-            manager.Socket.On<string>("urchin-camera-screenshot-request", x => RequestScreenshot.Invoke(JsonUtility.FromJson<Vector2Data>(x)));
+            On("urchin-camera-lerp-set", x => SetCameraLerpRotation.Invoke(JsonUtility.FromJson<CameraRotationModel>(x)));
+            On("urchin-camera-lerp", x => SetCameraLerp.Invoke(JsonUtility.FromJson<FloatData>(x)));
+            On("urchin-camera-screenshot-request", x => RequestScreenshot.Invoke(JsonUtility.FromJson<ScreenshotRequestModel>(x)));
 
 
-            manager.Socket.On<string>("urchin-brain-yaw", x => CameraBrainYaw.Invoke(JsonUtility.FromJson<FloatData>(x)));
+            On("urchin-brain-yaw", x => CameraBrainYaw.Invoke(JsonUtility.FromJson<FloatData>(x)));
 
         }
 
@@ -188,7 +279,7 @@ namespace Urchin.API
         private void Start_Light()
         {
             manager.Socket.On("ResetLightLink", () => ResetLightLink.Invoke());
-            manager.Socket.On<string>("SetLightLink", x => SetLightLink.Invoke(x));
+            On("SetLightLink", x => SetLightLink.Invoke(x));
             manager.Socket.On<List<float>>("SetLightRotation", x => SetLightRotation.Invoke(x));
         }
 
@@ -203,12 +294,15 @@ namespace Urchin.API
 
         private void Start_Text()
         {
-            manager.Socket.On<string>("urchin-text-update", x => TextUpdate.Invoke(JsonUtility.FromJson<TextModel>(x)));
-            manager.Socket.On<string>("urchin-text-delete", x => TextDelete.Invoke(JsonUtility.FromJson<IDData>(x)));
-            manager.Socket.On<string>("urchin-text-texts", x => TextSetTexts.Invoke(JsonUtility.FromJson<IDListStringList>(x)));
-            manager.Socket.On<string>("urchin-text-colors", x => TextSetColors.Invoke(JsonUtility.FromJson<IDListColorList>(x)));
-            manager.Socket.On<string>("urchin-text-sizes", x => TextSetSizes.Invoke(JsonUtility.FromJson<IDListFloatList>(x)));
-            manager.Socket.On<string>("urchin-text-positions", x => TextSetPositions.Invoke(JsonUtility.FromJson<IDListVector2List>(x)));
+            On("urchin-text-update", x => TextUpdate.Invoke(JsonUtility.FromJson<TextModel>(x)));
+            On("urchin-text-delete", x => TextDelete.Invoke(JsonUtility.FromJson<IDData>(x)));
+            On("urchin-text-texts", x => TextSetTexts.Invoke(JsonUtility.FromJson<IDListStringList>(x)));
+            OnList("urchin-text-colors", x => TextSetColors.Invoke(JsonUtility.FromJson<IDListColorList>(x)),
+                x => TextSetColors.Invoke(new IDListColorList(x.IDs, x.Values<Color>())));
+            OnList("urchin-text-sizes", x => TextSetSizes.Invoke(JsonUtility.FromJson<IDListFloatList>(x)),
+                x => TextSetSizes.Invoke(new IDListFloatList(x.IDs, x.Values<float>())));
+            OnList("urchin-text-positions", x => TextSetPositions.Invoke(JsonUtility.FromJson<IDListVector2List>(x)),
+                x => TextSetPositions.Invoke(new IDListVector2List(x.IDs, x.Values<Vector2>())));
         }
 
         public static Action<LineModel> UpdateLine;
@@ -216,8 +310,8 @@ namespace Urchin.API
 
         private void Start_LineRenderer()
         {
-            manager.Socket.On<string>("urchin-line-update", x => UpdateLine.Invoke(JsonUtility.FromJson<LineModel>(x)));
-            manager.Socket.On<string>("urchin-line-delete", x => DeleteLine.Invoke(JsonUtility.FromJson<IDData>(x)));
+            On("urchin-line-update", x => UpdateLine.Invoke(JsonUtility.FromJson<LineModel>(x)));
+            On("urchin-line-delete", x => DeleteLine.Invoke(JsonUtility.FromJson<IDData>(x)));
         }
 
         #region Mesh
@@ -235,15 +329,18 @@ namespace Urchin.API
         private void Start_Mesh()
         {
             // Singular
-            manager.Socket.On<string>("urchin-meshes-update", x => MeshUpdate.Invoke(JsonUtility.FromJson<MeshModel>(x)));
-            manager.Socket.On<string>("urchin-meshes-delete", x => MeshDelete.Invoke(JsonUtility.FromJson<IDData>(x)));
+            On("urchin-meshes-update", x => MeshUpdate.Invoke(JsonUtility.FromJson<MeshModel>(x)));
+            On("urchin-meshes-delete", x => MeshDelete.Invoke(JsonUtility.FromJson<IDData>(x)));
 
             // Plural
-            manager.Socket.On<string>("urchin-meshes-deletes", x => MeshDeletes.Invoke(JsonUtility.FromJson<IDList>(x)));
-            manager.Socket.On<string>("urchin-meshes-positions", x => MeshSetPositions.Invoke(JsonUtility.FromJson<IDListVector3List>(x)));
-            manager.Socket.On<string>("urchin-meshes-scales", x => MeshSetScales.Invoke(JsonUtility.FromJson<IDListVector3List>(x)));
-            manager.Socket.On<string>("urchin-meshes-colors", x => MeshSetColors.Invoke(JsonUtility.FromJson<IDListColorList>(x)));
-            manager.Socket.On<string>("urchin-meshes-materials", x => MeshSetMaterials.Invoke(JsonUtility.FromJson<IDListStringList>(x)));
+            On("urchin-meshes-deletes", x => MeshDeletes.Invoke(JsonUtility.FromJson<IDList>(x)));
+            OnList("urchin-meshes-positions", x => MeshSetPositions.Invoke(JsonUtility.FromJson<IDListVector3List>(x)),
+                x => MeshSetPositions.Invoke(new IDListVector3List(x.IDs, x.Values<Vector3>())));
+            OnList("urchin-meshes-scales", x => MeshSetScales.Invoke(JsonUtility.FromJson<IDListVector3List>(x)),
+                x => MeshSetScales.Invoke(new IDListVector3List(x.IDs, x.Values<Vector3>())));
+            OnList("urchin-meshes-colors", x => MeshSetColors.Invoke(JsonUtility.FromJson<IDListColorList>(x)),
+                x => MeshSetColors.Invoke(new IDListColorList(x.IDs, x.Values<Color>())));
+            On("urchin-meshes-materials", x => MeshSetMaterials.Invoke(JsonUtility.FromJson<IDListStringList>(x)));
         }
 
         #endregion
@@ -274,8 +371,8 @@ namespace Urchin.API
 
         private void Start_CustomMesh()
         {
-            manager.Socket.On<string>("urchin-custommesh-update", x => CustomMeshUpdate.Invoke(JsonUtility.FromJson<CustomMeshModel>(x)));
-            manager.Socket.On<string>("urchin-custommesh-delete", x => CustomMeshDelete.Invoke(JsonUtility.FromJson<IDData>(x)));
+            On("urchin-custommesh-update", x => CustomMeshUpdate.Invoke(JsonUtility.FromJson<CustomMeshModel>(x)));
+            On("urchin-custommesh-delete", x => CustomMeshDelete.Invoke(JsonUtility.FromJson<IDData>(x)));
         }
 
         public static Action<SaveRequest> Save;
@@ -285,10 +382,10 @@ namespace Urchin.API
 
         private void Start_Dock()
         {
-            manager.Socket.On<string>("urchin-save", x => Save.Invoke(JsonUtility.FromJson<SaveRequest>(x)));
-            manager.Socket.On<string>("urchin-load", x => Load.Invoke(JsonUtility.FromJson<LoadRequest>(x)));
-            manager.Socket.On<string>("urchin-load-data", x => LoadData.Invoke(JsonUtility.FromJson<LoadModel>(x)));
-            manager.Socket.On<string>("urchin-dock-data", x => DockData.Invoke(JsonUtility.FromJson<DockModel>(x)));
+            On("urchin-save", x => Save.Invoke(JsonUtility.FromJson<SaveRequest>(x)));
+            On("urchin-load", x => Load.Invoke(JsonUtility.FromJson<LoadRequest>(x)));
+            On("urchin-load-data", x => LoadData.Invoke(JsonUtility.FromJson<LoadModel>(x)));
+            On("urchin-dock-data", x => DockData.Invoke(JsonUtility.FromJson<DockModel>(x)));
         }
 
         #endregion
@@ -305,6 +402,17 @@ namespace Urchin.API
             manager.Socket.Emit(header, data);
         }
 
+        /// <summary>
+        /// Send a message with a binary attachment
+        /// </summary>
+        public static void Emit(string header, string data, byte[] binary)
+        {
+#if UNITY_EDITOR
+            Debug.Log($"Sending event: {header} with data {data} and {binary.Length} bytes");
+#endif
+            manager.Socket.Emit(header, data, binary);
+        }
+
         public void UpdateID(string newID)
         {
             ID = newID;
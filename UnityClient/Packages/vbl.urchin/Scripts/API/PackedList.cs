@@ -0,0 +1,47 @@
+using System;
+using System.Runtime.InteropServices;
+using System.Text;
+
+namespace Urchin.API
+{
+    /// <summary>
+    /// Bulk list message in the 'packed' wire format of the Python API (oursin.serializers.pack)
+    /// </summary>
+    /// <remarks>
+    /// Layout, little-endian: magic "URNP", uint32 number of IDs, uint32 floats per value,
+    /// uint32 length of the IDs block, IDs as UTF-8 separated by newlines, float32 values
+    /// </remarks>
+    public class PackedList
+    {
+        private const int HEADER_BYTES = 16;
+
+        public string[] IDs { get; private set; }
+        public int Width { get; private set; }
+
+        private byte[] _data;
+        private int _valuesOffset;
+
+        public PackedList(byte[] data)
+        {
+            if (data.Length < HEADER_BYTES || Encoding.ASCII.GetString(data, 0, 4) != "URNP")
+                throw new ArgumentException("Not a packed message");
+
+            int nIDs = (int)BitConverter.ToUInt32(data, 4);
+            Width = (int)BitConverter.ToUInt32(data, 8);
+            int idBytes = (int)BitConverter.ToUInt32(data, 12);
+
+            IDs = nIDs > 0 ? Encoding.UTF8.GetString(data, HEADER_BYTES, idBytes).Split('\n') : new string[0];
+
+            _data = data;
+            _valuesOffset = HEADER_BYTES + idBytes;
+        }
+
+        /// <summary>
+        /// The values as an array of structs made of Width floats, e.g. Vector3 for a width of 3
+        /// </summary>
+        public T[] Values<T>() where T : struct
+        {
+            return MemoryMarshal.Cast<byte, T>(new ReadOnlySpan<byte>(_data, _valuesOffset, _data.Length - _valuesOffset)).ToArray();
+        }
+    }
+}
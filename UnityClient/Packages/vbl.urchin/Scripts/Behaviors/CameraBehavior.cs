@@ -124,18 +124,19 @@ namespace Urchin.Behaviors
         /// <summary>
         /// Take a screenshot and send it back via the ReceiveCameraImgMeta and ReceiveCameraImg messages
         /// </summary>
-        /// <param name="size"></param>
-        public void Screenshot(Vector2 size)
+        /// <param name="request">Size in pixels, and the request ID to echo when the client sent one</param>
+        public void Screenshot(ScreenshotRequestModel request)
         {
-            StartCoroutine(ScreenshotHelper(size));
+            StartCoroutine(ScreenshotHelper(request));
         }
 
         /// <summary>
         /// Capture the output from this camera into a texture
         /// </summary>
         /// <returns></returns>
-        private IEnumerator ScreenshotHelper(Vector2 size)
+        private IEnumerator ScreenshotHelper(ScreenshotRequestModel request)
         {
+            Vector2 size = request.Value;
             RenderTexture originalTexture = ActiveCamera.targetTexture;
             int originalCullingMask = ActiveCamera.cullingMask;
 
@@ -151,8 +152,10 @@ namespace Urchin.Behaviors
 
             yield return new WaitForEndOfFrame();
 
-            // Save to Texture2D
-            Texture2D screenshotTexture = new Texture2D(width, height, TextureFormat.RGB24, false);
+            // Save to Texture2D, raw pixels skip PNG encoding for the clients that ask for them
+            bool rgba = request.Format == "rgba";
+            bool raw = request.Request > 0 && (rgba || request.Format == "rgb");
+            Texture2D screenshotTexture = new Texture2D(width, height, rgba ? TextureFormat.RGBA32 : TextureFormat.RGB24, false);
             RenderTexture.active = captureTexture;
             screenshotTexture.ReadPixels(new Rect(0, 0, width, height), 0, 0);
             screenshotTexture.Apply();
@@ -163,10 +166,16 @@ namespace Urchin.Behaviors
             RenderTexture.active = null;
             captureTexture.Release();
 
-            // Convert to PNG
-            byte[] bytes = screenshotTexture.EncodeToPNG();
+            // Convert to PNG, unless raw pixels were requested
+            byte[] bytes = raw ? FlipRows(screenshotTexture.GetRawTextureData(), width * (rgba ? 4 : 3)) : screenshotTexture.EncodeToPNG();
 
             // Build the messages and send them
+            if (request.Request > 0)
+            {
+                SendImage(bytes, request.Request, raw ? request.Format : null, width, height);
+                yield break;
+            }
+
             ScreenshotReturnMeta meta = new();
             meta.name = Name;
             meta.totalBytes = bytes.Length;
@@ -186,6 +195,47 @@ namespace Urchin.Behaviors
             }
         }
 
+        /// <summary>
+        /// Send an image to a client that tags its requests, the request ID is echoed so that concurrent
+        /// screenshots can be told apart. Such clients write binary chunks at their offset.
+        /// </summary>
+        /// <param name="format">Pixel format of raw images, null for PNG</param>
+        private void SendImage(byte[] bytes, int request, string format, int width, int height)
+        {
+            if (format == null)
+            {
+                ScreenshotRequestMeta meta = new();
+                meta.name = Name;
+                meta.request = request;
+                meta.totalBytes = bytes.Length;
+                Client_SocketIO.Emit("CameraImgMeta", JsonUtility.ToJson(meta));
+            }
+            else
+            {
+                ScreenshotPixelsMeta meta = new();
+                meta.name = Name;
+                meta.request = request;
+                meta.totalBytes = bytes.Length;
+                meta.width = width;
+                meta.height = height;
+                meta.format = format;
+                Client_SocketIO.Emit("CameraImgMeta", JsonUtility.ToJson(meta));
+            }
+
+            for (int offset = 0; offset < bytes.Length; offset += Client_SocketIO.SOCKET_IO_MAX_CHUNK_BYTES)
+            {
+                int cChunkSize = Mathf.Min(Client_SocketIO.SOCKET_IO_MAX_CHUNK_BYTES, bytes.Length - offset);
+                byte[] data = new byte[cChunkSize];
+                Buffer.BlockCopy(bytes, offset, data, 0, cChunkSize);
+
+                ScreenshotChunkHeader chunk = new();
+                chunk.name = Name;
+                chunk.request = request;
+                chunk.offset = offset;
+                Client_SocketIO.Emit("CameraImg", JsonUtility.ToJson(chunk), data);
+            }
+        }
+
         [Serializable]
         private struct ScreenshotReturnMeta
         {
@@ -193,6 +243,45 @@ namespace Urchin.Behaviors
             public int totalBytes;
         }
 
+        [Serializable]
+        private struct ScreenshotRequestMeta
+        {
+            public string name;
+            public int request;
+            public int totalBytes;
+        }
+
+        /// <summary>
+        /// Raw texture rows go bottom to top, images are sent top to bottom
+        /// </summary>
+        private static byte[] FlipRows(byte[] pixels, int rowBytes)
+        {
+            byte[] flipped = new byte[pixels.Length];
+            int rows = pixels.Length / rowBytes;
+            for (int row = 0; row < rows; row++)
+                Buffer.BlockCopy(pixels, (rows - 1 - row) * rowBytes, flipped, row * rowBytes, rowBytes);
+            return flipped;
+        }
+
+        [Serializable]
+        private struct ScreenshotPixelsMeta
+        {
+            public string name;
+            public int request;
+            public int totalBytes;
+            public int width;
+            public int height;
+            public string format;
+        }
+
+        [Serializable]
+        private struct ScreenshotChunkHeader
+        {
+            public string name;
+            public int request;
+            public int offset;
+        }
+
         [Serializable, PreferBinarySerialization]
         private class ScreenshotChunk
         {
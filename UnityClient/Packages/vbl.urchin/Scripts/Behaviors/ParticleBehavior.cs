@@ -36,9 +36,13 @@ public class ParticleBehavior : MonoBehaviour
         Debug.Log(data.Positions.Length);
         Debug.Log(data.Sizes.Length);
         Debug.Log(data.Colors.Length);
-        SetPositions(data.Positions);
-        SetSizes(data.Sizes);
-        SetColors(data.Colors);
+        // binary systems send an empty model and their lists as separate buffers
+        if (data.Positions.Length > 0)
+            SetPositions(data.Positions);
+        if (data.Sizes.Length > 0)
+            SetSizes(data.Sizes);
+        if (data.Colors.Length > 0)
+            SetColors(data.Colors);
     }
 
     public void SetSizes(float[] sizes)
@@ -2,6 +2,7 @@ using BrainAtlas;
 using System;
 using UnityEngine;
 using Urchin.Utils;
+using Urchin.API;
 using System.IO;
 using BestHTTP.Decompression.Zlib;
 using System.Collections.Generic;
@@ -118,8 +119,49 @@ public class VolumeRenderer : MonoBehaviour
         Debug.Log("(VolumeRenderer) Applying texture");
 #endif
 
-        byte[] compressedData = Convert.FromBase64String(_compressedString);
+        byte[] volumeData = Inflate(Convert.FromBase64String(_compressedString));
 
+        int i = 0;
+        for (int x = 0; x < width; x++)
+            for (int y = 0; y < height; y++)
+                for (int z = 0; z < depth; z++)
+                    _volumeTexture.SetPixel(x, y, z, _colormap[volumeData[i++]]);
+
+        _volumeTexture.Apply();
+    }
+
+    /// <summary>
+    /// Write a box of uint8 data sent as a streamed slab, in (AP, ML, DV) order
+    /// </summary>
+    /// <param name="slab"></param>
+    /// <param name="data">Slab data, compressed with slab.Codec</param>
+    public void SetSlab(VolumeSlabModel slab, byte[] data)
+    {
+        byte[] volumeData;
+        if (slab.Codec == "zlib")
+            volumeData = Inflate(data);
+        else if (slab.Codec == "none")
+            volumeData = data;
+        else
+        {
+            Client_SocketIO.LogError($"Volume codec {slab.Codec} is not supported by this renderer, use zlib or none");
+            return;
+        }
+
+        int i = 0;
+        for (int x = 0; x < slab.Shape[0]; x++)
+            for (int y = 0; y < slab.Shape[1]; y++)
+                for (int z = 0; z < slab.Shape[2]; z++)
+                    _volumeTexture.SetPixel(slab.Offset[0] + x, slab.Offset[1] + y, slab.Offset[2] + z, _colormap[volumeData[i++]]);
+
+        // the first upload is sent to the GPU once, when all of its slabs arrived
+        _streamedBytes += volumeData.Length;
+        if (_streamedBytes >= _compressedStringLength)
+            _volumeTexture.Apply();
+    }
+
+    private static byte[] Inflate(byte[] compressedData)
+    {
         using (MemoryStream compressedStream = new MemoryStream(compressedData))
         using (MemoryStream decompressedStream = new MemoryStream())
         using (DeflateStream decompressor = new DeflateStream(compressedStream, CompressionMode.Decompress))
@@ -128,17 +170,9 @@ public class VolumeRenderer : MonoBehaviour
             compressedStream.Seek(2, SeekOrigin.Begin);
             decompressor.CopyTo(decompressedStream);
 
-            decompressedStream.Position = 0;
-
-            using (BinaryReader reader = new BinaryReader(decompressedStream))
-            for (int x = 0; x < width; x++)
-                for (int y = 0; y < height; y++)
-                    for (int z = 0; z < depth; z++)
-                        _volumeTexture.SetPixel(x, y, z, _colormap[reader.ReadByte()]);
-        }
-
-        _volumeTexture.Apply();
+            return decompressedStream.ToArray();
         }
+    }
 
     public void SetColormap(Color[] colors)
     {
@@ -159,12 +193,18 @@ public class VolumeRenderer : MonoBehaviour
     }
 
     private int _nextOffset;
+    private int _streamedBytes;
 
+    /// <summary>
+    /// Start a new upload
+    /// </summary>
+    /// <param name="nCompressedBytes">Length of the base64 data, or of the uncompressed data for streamed volumes</param>
     public void SetMetadata(int nCompressedBytes)
     {
         _compressedString = "";
         _compressedStringLength = nCompressedBytes;
         _nextOffset = 0;
+        _streamedBytes = 0;
 
         Debug.Log($"Waiting to receive {_compressedStringLength} bytes");
     }
@@ -0,0 +1,36 @@
+using System;
+using UnityEngine;
+[Serializable]
+public struct VolumeSlabModel
+{
+    public string Name;
+    public int[] Offset;
+    public int[] Shape;
+    public string Codec;
+
+    public VolumeSlabModel(string name, int[] offset, int[] shape, string codec)
+    {
+        Name = name;
+        Offset = offset;
+        Shape = shape;
+        Codec = codec;
+    }
+}
+
+[Serializable]
+public struct ScreenshotRequestModel
+{
+    public string ID;
+    public Vector2 Value;
+    public int Request;
+    public string Format;
+
+    public ScreenshotRequestModel(string id, Vector2 value, int request, string format)
+    {
+        ID = id;
+        Value = value;
+        Request = request;
+        Format = format;
+    }
+}
+
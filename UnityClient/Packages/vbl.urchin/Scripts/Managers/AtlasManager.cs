@@ -27,6 +27,8 @@ namespace Urchin.Managers
 
         #region Data
         private AtlasModel Data;
+        // index of each area in Data.Areas by atlas ID, built on the first delta
+        private Dictionary<int, int> _areaIndexes;
 
         private Dictionary<string, (string name, bool webgl)> _apiNameMapping;
 
@@ -76,6 +78,7 @@ namespace Urchin.Managers
             _localColormap = Colormaps.MainColormap;
 
             Client_SocketIO.AtlasUpdate += UpdateData;
+            Client_SocketIO.AtlasDelta += UpdateDelta;
 
             Client_SocketIO.AtlasLoad += LoadAtlas;
             Client_SocketIO.AtlasLoadDefaults += LoadDefaultAreasVoid;
@@ -106,13 +109,42 @@ namespace Urchin.Managers
             BrainAtlasManager.CustomAtlas(data.Name, data.Dimensions, data.Resolution);
         }
 
-        public async void UpdateData(AtlasModel data)
+        public void UpdateData(AtlasModel data)
         {
 #if UNITY_EDITOR
             Debug.Log("(AtlasManager) Area update called");
 #endif
             Data = data;
+            _areaIndexes = null;
 
+            ApplyData(data);
+        }
+
+        /// <summary>
+        /// Merge the areas that changed into the atlas data, then update only those areas
+        /// </summary>
+        /// <param name="delta">Atlas with only the changed areas</param>
+        public void UpdateDelta(AtlasModel delta)
+        {
+#if UNITY_EDITOR
+            Debug.Log("(AtlasManager) Area delta called");
+#endif
+            if (Data.Areas == null || Data.Name != delta.Name)
+            {
+                // nothing to merge into yet
+                UpdateData(delta);
+                return;
+            }
+
+            MergeAreas(delta.Areas);
+            Data.ReferenceCoord = delta.ReferenceCoord;
+            Data.Colormap = delta.Colormap;
+
+            ApplyData(delta);
+        }
+
+        private async void ApplyData(AtlasModel data)
+        {
             if (BrainAtlasManager.ActiveReferenceAtlas != null &&
                 BrainAtlasManager.ActiveReferenceAtlas.Name != _apiNameMapping[data.Name].name)
             {
@@ -149,6 +181,7 @@ namespace Urchin.Managers
             }
 
             Data = data;
+            _areaIndexes = null;
 
             (string atlasName, bool availableOnWebGL) = _apiNameMapping[data.Name];
 
@@ -414,6 +447,39 @@ namespace Urchin.Managers
 
         #region Private helpers
 
+        /// <summary>
+        /// Replace areas in Data by atlas ID, so that saved scenes keep the merged state
+        /// </summary>
+        private void MergeAreas(StructureModel[] areas)
+        {
+            if (_areaIndexes == null)
+            {
+                _areaIndexes = new();
+                for (int i = 0; i < Data.Areas.Length; i++)
+                    _areaIndexes[Data.Areas[i].AtlasId] = i;
+            }
+
+            List<StructureModel> added = new();
+            foreach (StructureModel area in areas)
+            {
+                if (_areaIndexes.TryGetValue(area.AtlasId, out int index))
+                    Data.Areas[index] = area;
+                else
+                    added.Add(area);
+            }
+
+            if (added.Count > 0)
+            {
+                int start = Data.Areas.Length;
+                Array.Resize(ref Data.Areas, start + added.Count);
+                for (int i = 0; i < added.Count; i++)
+                {
+                    Data.Areas[start + i] = added[i];
+                    _areaIndexes[added[i].AtlasId] = start + i;
+                }
+            }
+        }
+
         private async void LoadIndividualArea(OntologyNode node, bool full, bool leftSide, bool rightSide, bool visibility)
         {
 #if UNITY_EDITOR
@@ -206,9 +206,9 @@ namespace Urchin.Managers
             }
         }
 
-        public void RequestScreenshot(Vector2Data data)
+        public void RequestScreenshot(ScreenshotRequestModel data)
         {
-            _cameras[data.ID].Screenshot(data.Value);
+            _cameras[data.ID].Screenshot(data);
         }
 
         public void SetCameraYAngle(Dictionary<string, float> cameraYAngle)
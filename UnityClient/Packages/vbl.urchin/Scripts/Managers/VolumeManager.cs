@@ -65,6 +65,7 @@ namespace Urchin.Managers
         private void Start()
         {
             Client_SocketIO.SetVolumeData += SetData;
+            Client_SocketIO.SetVolumeSlab += SetSlab;
             Client_SocketIO.UpdateVolume += UpdateOrCreate;
             Client_SocketIO.DeleteVolume += Delete;
         }
@@ -117,6 +118,11 @@ namespace Urchin.Managers
             _volumes[chunk.Name].SetData(chunk.Bytes);
         }
 
+        public void SetSlab(VolumeSlabModel slab, byte[] data)
+        {
+            _volumes[slab.Name].SetSlab(slab, data);
+        }
+
         public void SetAnnotationColor(Dictionary<string, string> data)
         {
             throw new NotImplementedException();
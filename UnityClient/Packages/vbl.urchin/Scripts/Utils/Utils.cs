@@ -2,6 +2,7 @@ using System;
 using System.Collections.Generic;
 using System.IO;
 using System.Linq;
+using System.Runtime.InteropServices;
 using Unity.Mathematics;
 using UnityEngine;
 
@@ -129,6 +130,17 @@ namespace Urchin.Utils
             return color;
         }
 
+        /// <summary>
+        /// Reinterpret a float32 buffer sent by the Python API, e.g. (n, 3) positions as Vector3[]
+        /// </summary>
+        /// <typeparam name="T">struct made of floats only, e.g. float, Vector3 or Color</typeparam>
+        /// <param name="data">little-endian float32 values</param>
+        /// <returns></returns>
+        public static T[] FromFloatBytes<T>(byte[] data) where T : struct
+        {
+            return MemoryMarshal.Cast<byte, T>(new ReadOnlySpan<byte>(data)).ToArray();
+        }
+
         // From Math3d: http://wiki.unity3d.com/index.php/3d_Math_functions
         //Two non-parallel lines which may or may not touch each other have a point on each line which are closest
         //to each other. This function finds those two points. If the lines are not parallel, the function 